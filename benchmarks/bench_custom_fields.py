@@ -0,0 +1,50 @@
+"""
+Micro-benchmark of custom field name/option lookups: the precomputed per class index vs the old linear scans
+over custom_fields.  Run from the repository root: python benchmarks/bench_custom_fields.py [num_fields]
+"""
+import sys
+import timeit
+sys.path.append('.')
+from pipedrive.client import *
+
+
+def linear_custom_field_name(entity, key):
+    names = [k for k, v in entity.custom_fields.items() if v["key"] == key]
+    return names[0] if names else key
+
+
+def linear_option_id(entity, name, label):
+    return [k for k, v in entity.custom_fields[name]["fields"].items() if v == label][0]
+
+
+def main(num_fields=150, num_options=10, repeat=200):
+    Entity.initialised = True
+    Deal.custom_fields = {}
+    data = {"id": 1, "title": "Deal", "value": 100, "status": "open"}
+    for i in range(num_fields):
+        key = "%040x" % (i + 1)
+        fields = {None: ""}
+        for o in range(num_options):
+            fields[str(i * num_options + o)] = "Option %s" % o
+        Deal.custom_fields["field_%s" % i] = {"key": key, "fields": fields}
+        data[key] = str(i * num_options)
+    deal = Deal(data, is_stub=False)
+    last = "field_%s" % (num_fields - 1)
+
+    timings = [
+        ("get_field_names", lambda: [linear_custom_field_name(deal, k) for k in deal.data], deal.get_field_names),
+        ("repr", lambda: str([{linear_custom_field_name(deal, k): v} for k, v in deal.data.items()]), deal.__repr__),
+        ("label -> option id", lambda: linear_option_id(deal, last, "Option 9"),
+         lambda: Deal._custom_field_index()[3][last]["Option 9"]),
+    ]
+    print("{} custom fields with {} options each, {} calls".format(num_fields, num_options, repeat))
+    print("{0:<20} {1:>12} {2:>12} {3:>8}".format("Operation", "Linear (ms)", "Indexed (ms)", "Speedup"))
+    for name, linear, indexed in timings:
+        assert linear() == indexed()
+        linear_time = timeit.timeit(linear, number=repeat) * 1000
+        indexed_time = timeit.timeit(indexed, number=repeat) * 1000
+        print("{0:<20} {1:>12.2f} {2:>12.2f} {3:>7.1f}x".format(name, linear_time, indexed_time, linear_time / indexed_time))
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
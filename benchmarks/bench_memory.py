@@ -0,0 +1,46 @@
+"""
+Memory per entity with plain dict data vs Entity.compact (CompactData over a shared KeyTable).
+Run from the repository root: python benchmarks/bench_memory.py [num_persons] [num_fields]
+"""
+import sys
+import tracemalloc
+sys.path.append('.')
+from pipedrive.client import *
+
+
+def person_data(i, num_fields):
+    data = {"id": i, "name": "Person %s" % i, "org_id": {"value": i % 100, "name": "Org %s" % (i % 100)},
+            "owner_id": {"id": 1, "name": "Owner"}, "email": [{"value": "p%s@example.com" % i, "primary": True}],
+            "active_flag": True, "add_time": "2024-01-01 00:00:00", "update_time": "2024-01-02 00:00:00"}
+    for f in range(num_fields):
+        data["%040x" % f] = None if f % 3 else f
+    return data
+
+
+def measure(compact, num_persons, num_fields):
+    Entity.initialised = True
+    Entity.compact = compact
+    Person.clear_cache()
+    Organization.clear_cache()
+    User.clear_cache()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(num_persons):
+        Person.refresh_or_construct(person_data(i, num_fields)) # In compact mode the parsed dict is garbage afterwards
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return (after - before) / num_persons
+
+
+def main(num_persons=20000, num_fields=40):
+    print("{} persons with {} custom fields".format(num_persons, num_fields))
+    plain = measure(False, num_persons, num_fields)
+    compact = measure(True, num_persons, num_fields)
+    print("{0:<10} {1:>16}".format("Mode", "Bytes per entity"))
+    print("{0:<10} {1:>16.0f}".format("dict", plain))
+    print("{0:<10} {1:>16.0f}".format("compact", compact))
+    print("compact uses {:.0%} of the memory".format(compact / plain))
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,247 @@
+"""
+Benchmark suite against a local mock Pipedrive (benchmarks/mock_server.py) serving a synthetic account.
+Scenarios:
+ - startup: a short deals only job from cold custom fields, the field requests it costs
+ - sync: full download of organizations, persons, deals and notes, then a recents sync of touched entities
+ - construct: refresh_or_construct rate from parsed json, no HTTP
+ - getattr: cost of standard, custom and option custom field attribute access
+ - memory: bytes per cached person, plain dict and compact data
+ - save: save_changes and save_all_changes throughput
+ - export: Exporter rows per second, per format
+ - funnel: per stage deal totals of every pipeline, from the aggregates and by walking stage.deals
+
+Run from the repository root, e.g.
+python benchmarks/bench_suite.py --persons 20000 --latency 0.01 --rate-limit-every 50 --json results.json
+and compare the json between versions to spot regressions.
+"""
+import argparse
+import copy
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+sys.path.append(os.path.abspath('.'))
+sys.path.append(os.path.abspath('benchmarks'))
+from pipedrive.client import *
+from pipedrive.export import Exporter, pyarrow
+from pipedrive.sync import RecentsSync
+from mock_server import MockPipedrive, SyntheticAccount
+
+
+def reset_caches():
+    for cls in (Person, Organization, Deal, Note, Pipeline, Stage, User, Activity, Product):
+        cls.clear_cache()
+
+
+def make_client(server, args):
+    client = Client(api_base_url=server.base_url, page_workers=args.page_workers, max_retries=10,
+                    decoder=args.decoder, incremental_parsing=args.incremental,
+                    custom_fields_cache=CustomFieldsCache(directory=None)) # Kept in memory only
+    client.set_token("benchmark")
+    return client
+
+
+def bench_startup(server, args):
+    reset_caches()
+    for cls in EntityWithCustomFields.__subclasses__():
+        if "custom_fields" in cls.__dict__:
+            del cls.custom_fields # Back to loading on first use
+        if "standard_fields" in cls.__dict__:
+            del cls.standard_fields
+    Entity.fields_loader = None
+    server.reset_counts()
+    client = make_client(server, args)
+    t = time.perf_counter()
+    client.get_deals(limit=100)
+    results = {"seconds": time.perf_counter() - t, "requests": sum(server.requests.values()),
+               "field_requests": sum(n for endpoint, n in server.requests.items() if endpoint.endswith("Fields"))}
+    client.load_custom_fields() # For the other scenarios
+    return results
+
+
+def bench_sync(server, args):
+    reset_caches()
+    server.reset_counts()
+    client = make_client(server, args)
+    results = {}
+    total = 0
+    start = time.perf_counter()
+    for name, method in (("organizations", client.get_organizations), ("persons", client.get_persons),
+                         ("deals", client.get_deals), ("notes", client.get_notes)):
+        t = time.perf_counter()
+        count = len(method(limit=10 ** 9))
+        results[name + "_per_second"] = count / (time.perf_counter() - t)
+        total += count
+    elapsed = time.perf_counter() - start
+    results.update({"entities": total, "seconds": elapsed, "entities_per_second": total / elapsed,
+                    "requests": sum(server.requests.values()), "rate_limited": server.rate_limited})
+
+    sync = RecentsSync(client, since_timestamp=server.account.timestamp(), items=["deal", "person"])
+    server.account.touch("deals", args.touched)
+    server.account.touch("persons", args.touched)
+    t = time.perf_counter()
+    changes = sync.run()
+    results["recents_changes"] = sum(changes.values())
+    results["recents_seconds"] = time.perf_counter() - t
+    return results
+
+
+def bench_construct(server, args):
+    reset_caches()
+    persons = list(server.account.entities["persons"].values())
+    deals = list(server.account.entities["deals"].values())
+    results = {}
+    for name, cls, data in (("persons", Person, persons), ("deals", Deal, deals)):
+        data = copy.deepcopy(data) # Entities keep (and may convert) their data
+        t = time.perf_counter()
+        for d in data:
+            cls.refresh_or_construct(d)
+        results[name + "_constructed_per_second"] = len(data) / (time.perf_counter() - t)
+        t = time.perf_counter()
+        for d in data:
+            cls.refresh_or_construct(d)
+        results[name + "_refreshed_per_second"] = len(data) / (time.perf_counter() - t)
+    return results
+
+
+def bench_getattr(server, args):
+    reset_caches()
+    deal = Deal.refresh_or_construct(copy.deepcopy(server.account.entities["deals"][1]))
+    option_field = [n for n, f in Deal.custom_fields.items() if "fields" in f][0]
+    text_field = [n for n, f in Deal.custom_fields.items() if "fields" not in f][0]
+    number = args.repeat
+    results = {}
+    for name, stmt in (("standard_field", lambda: deal.title), ("custom_field", lambda: getattr(deal, text_field)),
+                       ("option_field", lambda: getattr(deal, option_field)), ("relationship", lambda: deal.org)):
+        results[name + "_ns"] = timeit.timeit(stmt, number=number) / number * 1e9
+    return results
+
+
+def bench_memory(server, args):
+    results = {}
+    persons = list(server.account.entities["persons"].values())
+    for compact in (False, True):
+        reset_caches()
+        Entity.compact = compact
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        for data in persons:
+            Person.refresh_or_construct(json.loads(json.dumps(data))) # Allocated inside the window, as a response would be
+        after = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        results[("compact" if compact else "dict") + "_bytes_per_person"] = (after - before) / len(persons)
+    Entity.compact = False
+    reset_caches()
+    return results
+
+
+def bench_save(server, args):
+    reset_caches()
+    server.reset_counts()
+    client = make_client(server, args)
+    deals = client.get_deals(limit=args.saves)[:args.saves]
+    results = {}
+    t = time.perf_counter()
+    for deal in deals:
+        deal.value = deal.value + 1
+        client.save_changes(deal)
+    results["save_changes_per_second"] = len(deals) / (time.perf_counter() - t)
+    for deal in deals:
+        deal.value = deal.value + 1
+    t = time.perf_counter()
+    result = client.save_all_changes(deals, workers=args.workers)
+    results["save_all_changes_per_second"] = len(deals) / (time.perf_counter() - t)
+    results["save_all_changes_failed"] = len(result.failed)
+    return results
+
+
+def bench_export(server, args):
+    client = make_client(server, args)
+    option_field = [n for n, f in Deal.custom_fields.items() if "fields" in f][0]
+    columns = ["id", "title", "value", "currency", "stage_id", "org_id", "org_id.name", option_field]
+    results = {}
+    directory = tempfile.mkdtemp()
+    try:
+        for format, compression in (("ndjson", None), ("csv", "gzip")) + ((("parquet", None),) if pyarrow else ()):
+            name = format + ("_" + compression if compression else "")
+            result = Exporter(client, format, compression).export(Deal, os.path.join(directory, name), columns)
+            results[name + "_rows_per_second"] = result["rows"] / result["seconds"]
+    finally:
+        shutil.rmtree(directory)
+    return results
+
+
+def bench_funnel(server, args):
+    reset_caches()
+    for data in server.account.stages:
+        Stage.refresh_or_construct(copy.deepcopy(data))
+    for data in server.account.entities["deals"].values():
+        Deal.refresh_or_construct(copy.deepcopy(data))
+    pipelines = [Pipeline.get_or_construct(copy.deepcopy(data)) for data in server.account.pipelines]
+    number = 100
+
+    def walk():
+        for pipeline in pipelines:
+            for stage in pipeline.stages:
+                deals = [d for d in stage.deals if d.status == "open"]
+                len(deals), sum(d.value for d in deals)
+
+    results = {"aggregates_ms": timeit.timeit(lambda: [p.stage_totals() for p in pipelines], number=number) / number * 1e3,
+               "walk_ms": timeit.timeit(walk, number=number) / number * 1e3}
+    t = time.perf_counter()
+    for data in list(server.account.entities["deals"].values())[:1000]:
+        Deal.refresh_or_construct(copy.deepcopy(data))
+    results["refreshed_per_second"] = min(1000, len(server.account.entities["deals"])) / (time.perf_counter() - t)
+    return results
+
+
+SCENARIOS = {"startup": bench_startup, "sync": bench_sync, "construct": bench_construct, "getattr": bench_getattr, "memory": bench_memory,
+             "save": bench_save, "export": bench_export, "funnel": bench_funnel}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("scenarios", nargs="*", help="any of " + ", ".join(SCENARIOS) + " (default all)")
+    parser.add_argument("--persons", type=int, default=5000, help="synthetic account size (deals = persons, organizations = persons / 10, notes = persons / 2)")
+    parser.add_argument("--custom-fields", type=int, default=30)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to each mock response")
+    parser.add_argument("--rate-limit-every", type=int, default=0, help="answer every n'th request with a 429")
+    parser.add_argument("--page-workers", type=int, default=1)
+    parser.add_argument("--decoder", help="orjson or json, defaults to orjson if it's installed")
+    parser.add_argument("--incremental", action="store_true", help="use incremental_parsing")
+    parser.add_argument("--touched", type=int, default=200, help="deals and persons changed before the recents sync")
+    parser.add_argument("--saves", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=8, help="save_all_changes concurrency")
+    parser.add_argument("--repeat", type=int, default=100000, help="attribute accesses timed")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+    args.scenarios = args.scenarios or list(SCENARIOS)
+    for name in args.scenarios:
+        if name not in SCENARIOS:
+            parser.error("unknown scenario " + name)
+
+    account = SyntheticAccount(persons=args.persons, custom_fields=args.custom_fields, seed=args.seed)
+    server = MockPipedrive(account, latency=args.latency, rate_limit_every=args.rate_limit_every).start()
+    make_client(server, args).load_custom_fields() # All of them up front, concurrently
+    results = {"parameters": vars(args)}
+    try:
+        for name in args.scenarios:
+            results[name] = SCENARIOS[name](server, args)
+            print(name)
+            for metric, value in results[name].items():
+                print("  {0:<34} {1:>14.1f}".format(metric, value))
+    finally:
+        server.stop()
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+"""
+A local mock of the Pipedrive endpoints Client uses, serving a synthetic account, for the benchmarks.
+Paginated persons, deals, organizations and notes (and single entities by id, PUT and bulk DELETE),
+personFields/dealFields/organizationFields, stages, pipelines and users (and by id), pipelines/{id}/deals and recents,
+and field selectors (persons:(id,name)).
+latency is added to every response and every rate_limit_every'th request gets a 429 with Retry-After.
+GETs have an ETag, and a matching If-None-Match gets a 304.
+
+Run it standalone: python benchmarks/mock_server.py [port] [persons] [custom_fields]
+then Client(api_base_url="http://127.0.0.1:8080/") with any token.
+"""
+import hashlib
+import json
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, unquote, urlparse
+
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+class SyntheticAccount:
+    """
+    A deterministic (seeded) account of organizations, persons, deals, notes, pipelines and stages,
+    with custom_fields custom fields (every third one an option field) on persons, deals and organizations.
+    """
+
+    entity_fields = {"person": "persons", "deal": "deals", "organization": "organizations"}
+    standard_fields = { # The keys of the records below, served by the *Fields endpoints before the custom fields
+        "person": ("id", "name", "org_id", "owner_id", "active_flag", "email", "phone", "add_time", "update_time"),
+        "deal": ("id", "title", "value", "currency", "status", "stage_id", "pipeline_id", "org_id", "user_id",
+                 "creator_user_id", "person_id", "active", "deleted", "add_time", "update_time"),
+        "organization": ("id", "name", "owner_id", "active_flag", "address", "add_time", "update_time"),
+    }
+
+    def __init__(self, persons=1000, organizations=None, deals=None, notes=None, pipelines=2, stages=5,
+                 custom_fields=20, options=5, users=5, seed=1):
+        self.random = random.Random(seed)
+        self.start_time = datetime(2024, 1, 1)
+        self.clock = 0 # Seconds after start_time of the last change, for update_time and recents
+        organizations = persons // 10 if organizations is None else organizations
+        deals = persons if deals is None else deals
+        notes = persons // 2 if notes is None else notes
+        self.fields = {name: self._make_fields(name, custom_fields, options) for name in self.entity_fields}
+        self.users = [{"id": i, "name": "User %s" % i, "email": "user%s@example.com" % i, "value": i}
+                      for i in range(1, users + 1)]
+        self.pipelines = [{"id": p, "name": "Pipeline %s" % p, "active": True, "order_nr": p}
+                          for p in range(1, pipelines + 1)]
+        self.stages = [{"id": (p - 1) * stages + s, "name": "Stage %s.%s" % (p, s), "pipeline_id": p, "order_nr": s,
+                        "active_flag": True, "deal_probability": 100 * s // stages}
+                       for p in range(1, pipelines + 1) for s in range(1, stages + 1)]
+        self.entities = {"organizations": {}, "persons": {}, "deals": {}, "notes": {}}
+        for i in range(1, organizations + 1):
+            self._add("organizations", self._custom_values("organization", {
+                "id": i, "name": "Organization %s" % i, "owner_id": self._user(), "active_flag": True,
+                "address": "%s Main Street" % i}))
+        for i in range(1, persons + 1):
+            org = self._org()
+            self._add("persons", self._custom_values("person", {
+                "id": i, "name": "Person %s" % i, "org_id": org, "owner_id": self._user(), "active_flag": True,
+                "email": [{"label": "work", "value": "person%s@example.com" % i, "primary": True}],
+                "phone": [{"label": "work", "value": "+1555%07d" % i, "primary": True}]}))
+        for i in range(1, deals + 1):
+            stage = self.random.choice(self.stages)
+            person = self.random.randint(1, max(persons, 1))
+            self._add("deals", self._custom_values("deal", {
+                "id": i, "title": "Deal %s" % i, "value": self.random.randint(100, 100000), "currency": "EUR",
+                "status": self.random.choice(["open", "open", "open", "won", "lost"]), "stage_id": stage["id"],
+                "pipeline_id": stage["pipeline_id"], "org_id": self._org(), "user_id": self._user(),
+                "creator_user_id": self._user(), "person_id": {"value": person, "name": "Person %s" % person},
+                "active": True, "deleted": False}))
+        for i in range(1, notes + 1):
+            deal = self.random.randint(1, max(deals, 1))
+            self._add("notes", {"id": i, "content": "Note %s" % i, "deal_id": deal, "person_id": None, "org_id": None,
+                                "user_id": self.random.choice(self.users)["id"], "active_flag": True,
+                                "deal": {"title": "Deal %s" % deal}, "user": None, "person": None, "organization": None})
+
+    def _make_fields(self, name, custom_fields, options):
+        fields = [{"key": key, "name": key.replace("_", " ").capitalize()} for key in self.standard_fields[name]]
+        for f in range(custom_fields):
+            field = {"key": "%08x%032x" % (len(name), f), "name": "%s field %s" % (name.capitalize(), f)}
+            if f % 3 == 0:
+                field["options"] = [{"id": f * 100 + o, "label": "Option %s" % o} for o in range(options)]
+            fields.append(field)
+        return fields
+
+    def _custom_values(self, name, data):
+        for field in self.fields[name][len(self.standard_fields[name]):]:
+            if "options" in field:
+                data[field["key"]] = str(self.random.choice(field["options"])["id"])
+            else:
+                data[field["key"]] = self.random.choice([None, "value %s" % self.random.randint(1, 1000)])
+        return data
+
+    def _user(self):
+        user = self.random.choice(self.users)
+        return dict(user)
+
+    def _org(self):
+        if not self.entities["organizations"]:
+            return None
+        org = self.random.randint(1, len(self.entities["organizations"]))
+        return {"value": org, "name": "Organization %s" % org}
+
+    def timestamp(self):
+        return (self.start_time + timedelta(seconds=self.clock)).strftime(TIMESTAMP_FORMAT)
+
+    def _add(self, collection, data):
+        data.setdefault("add_time", self.timestamp())
+        data["update_time"] = self.timestamp()
+        self.entities[collection][data["id"]] = data
+
+    def update(self, collection, theId, changes):
+        """
+        Apply changes as a PUT would, moving the clock on so it shows up in recents
+        :return: the updated entity, or None if there's no such entity
+        """
+        entity = self.entities[collection].get(theId)
+        if entity is None:
+            return None
+        self.clock += 1
+        entity.update(changes)
+        entity["update_time"] = self.timestamp()
+        return entity
+
+    def touch(self, collection, count):
+        """
+        Change count random entities (e.g. before a recents sync)
+        """
+        ids = self.random.sample(sorted(self.entities[collection]), min(count, len(self.entities[collection])))
+        for theId in ids:
+            self.update(collection, theId, {})
+        return ids
+
+    def recents(self, since_timestamp, items):
+        """
+        :return: the recents items changed after since_timestamp, oldest first
+        """
+        kinds = {"deal": "deals", "person": "persons", "organization": "organizations", "note": "notes"}
+        changed = []
+        for item in items:
+            if item in kinds:
+                changed.extend((e["update_time"], item, e) for e in self.entities[kinds[item]].values()
+                               if e["update_time"] > since_timestamp)
+        changed.sort(key=lambda c: (c[0], c[1], c[2]["id"]))
+        return [{"item": item, "id": e["id"], "data": e} for _, item, e in changed]
+
+
+class MockPipedrive:
+    """
+    Serves a SyntheticAccount over HTTP in a background thread
+    server = MockPipedrive(SyntheticAccount(persons=10000), latency=0.02).start()
+    client = Client(api_base_url=server.base_url)
+    """
+
+    def __init__(self, account, latency=0.0, rate_limit_every=0, retry_after=0.05, max_page=500, port=0):
+        """
+        :param latency: seconds added to each response
+        :param rate_limit_every: answer every n'th request with a 429 (0 for never)
+        :param retry_after: the 429s' Retry-After header, in seconds
+        :param max_page: largest page served, whatever limit is asked for (Pipedrive's is 500)
+        """
+        self.account = account
+        self.latency = latency
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.max_page = max_page
+        self.requests = Counter()
+        self.rate_limited = 0
+        self.not_modified = 0 # 304s answered to If-None-Match
+        self.failures = Counter() # first path segment -> requests still to answer with a 500, see fail
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", port), self._handler())
+        self._server.daemon_threads = True
+        self.base_url = "http://127.0.0.1:%s/" % self._server.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def reset_counts(self):
+        with self._lock:
+            self.requests = Counter()
+            self.rate_limited = 0
+
+    def fail(self, path, times=1):
+        """
+        Answer the next times requests to path (the first segment, e.g. "dealFields") with a 500
+        """
+        with self._lock:
+            self.failures[path] += times
+
+    def _failing(self, path):
+        with self._lock:
+            if self.failures[path]:
+                self.failures[path] -= 1
+                return True
+        return False
+
+    def _throttle(self, path):
+        """
+        :return: True if this request gets a 429
+        """
+        with self._lock:
+            self.requests[path] += 1
+            total = sum(self.requests.values())
+            if self.rate_limit_every and total % self.rate_limit_every == 0:
+                self.rate_limited += 1
+                return True
+        return False
+
+    def _page(self, items, query):
+        start = int(query.get("start", 0))
+        limit = min(int(query.get("limit", 100)), self.max_page)
+        more = start + limit < len(items)
+        return {"success": True, "data": items[start:start + limit] or None, "additional_data": {"pagination": {
+            "start": start, "limit": limit, "more_items_in_collection": more, "next_start": start + limit}}}
+
+    def get(self, parts, query):
+        account = self.account
+        if len(parts) == 1 and parts[0].endswith("Fields"):
+            return {"success": True, "data": account.fields.get(parts[0][:-len("Fields")], [])}
+        if parts == ["stages"]:
+            stages = account.stages
+            if "pipeline_id" in query:
+                stages = [s for s in stages if str(s["pipeline_id"]) == query["pipeline_id"]]
+            return {"success": True, "data": stages}
+        if parts == ["pipelines"]:
+            return {"success": True, "data": account.pipelines}
+        if parts == ["users"]:
+            return {"success": True, "data": account.users}
+        if len(parts) == 2 and parts[0] in ("stages", "pipelines", "users"):
+            matches = [e for e in getattr(account, parts[0]) if str(e["id"]) == parts[1]]
+            return {"success": bool(matches), "data": matches[0] if matches else None}
+        if len(parts) == 3 and parts[0] == "pipelines" and parts[2] == "deals":
+            deals = [d for d in account.entities["deals"].values() if str(d["pipeline_id"]) == parts[1]]
+            return self._page(deals, query)
+        if parts == ["recents"]:
+            items = account.recents(query.get("since_timestamp", ""), query.get("items", "deal,person").split(","))
+            page = self._page(items, query)
+            page["additional_data"]["since_timestamp"] = query.get("since_timestamp")
+            page["additional_data"]["last_timestamp_on_page"] = page["data"][-1]["data"]["update_time"] if page["data"] else None
+            return page
+        if parts and parts[0] in account.entities:
+            collection = account.entities[parts[0]]
+            if len(parts) == 2:
+                entity = collection.get(int(parts[1]))
+                return {"success": entity is not None, "data": entity}
+            return self._page(list(collection.values()), query)
+        return None
+
+    def _handler(self):
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1" # Keep-alive, like Pipedrive
+            disable_nagle_algorithm = True # Headers and body are written separately, don't wait for a delayed ack
+
+            def log_message(self, *args):
+                pass
+
+            def _send(self, code, payload, headers=()):
+                body = json.dumps(payload).encode('UTF-8')
+                self.send_response(code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _request(self):
+                url = urlparse(self.path)
+                parts = [unquote(p) for p in url.path.split("/") if p]
+                if parts and parts[0] == "v1":
+                    parts = parts[1:]
+                selector = None
+                if parts and parts[-1].endswith(")") and ":(" in parts[-1]: # Field selector, e.g. persons:(id,name)
+                    parts[-1], _, selector = parts[-1][:-1].partition(":(")
+                    selector = selector.split(",")
+                query = {k: v[0] for k, v in parse_qs(url.query).items()}
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length)) if length else {}
+                if mock.latency:
+                    time.sleep(mock.latency)
+                if mock._throttle("/".join(parts[:1])):
+                    self._send(429, {"success": False, "error": "Rate limit exceeded"},
+                               [("Retry-After", str(mock.retry_after))])
+                    return None
+                if mock._failing("/".join(parts[:1])):
+                    self._send(500, {"success": False, "error": "Internal server error"})
+                    return None
+                if selector is not None:
+                    query["fields"] = selector
+                return parts, query, body
+
+            def do_GET(self):
+                request = self._request()
+                if request is None:
+                    return
+                payload = mock.get(*request[:2])
+                if payload is None or payload.get("success") is False:
+                    self._send(404, {"success": False, "error": "Not found"})
+                else:
+                    fields = request[1].get("fields")
+                    if fields and payload.get("data"):
+                        project = lambda d: {k: v for k, v in d.items() if k in fields}
+                        data = payload["data"]
+                        payload = dict(payload, data=project(data) if isinstance(data, dict) else [project(d) for d in data])
+                    self._send_etagged(payload)
+
+            def _send_etagged(self, payload):
+                body = json.dumps(payload).encode('UTF-8')
+                etag = '"%s"' % hashlib.sha1(body).hexdigest()
+                if self.headers.get("If-None-Match") == etag:
+                    with mock._lock:
+                        mock.not_modified += 1
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                else:
+                    self._send(200, payload, [("ETag", etag)])
+
+            def do_PUT(self):
+                request = self._request()
+                if request is None:
+                    return
+                parts, _, body = request
+                with mock._lock:
+                    entity = mock.account.update(parts[0], int(parts[1]), body) if len(parts) == 2 and parts[0] in mock.account.entities else None
+                if entity is None:
+                    self._send(404, {"success": False, "error": "Not found"})
+                else:
+                    self._send(200, {"success": True, "data": entity})
+
+            def do_DELETE(self):
+                request = self._request()
+                if request is None:
+                    return
+                parts, query, _ = request
+                ids = [int(i) for i in query["ids"].split(",")] if "ids" in query else [int(parts[1])]
+                with mock._lock:
+                    for theId in ids:
+                        mock.account.entities.get(parts[0], {}).pop(theId, None)
+                self._send(200, {"success": True, "data": {"id": ids}})
+
+        return Handler
+
+
+def main(port=8080, persons=10000, custom_fields=20):
+    server = MockPipedrive(SyntheticAccount(persons=persons, custom_fields=custom_fields), port=port)
+    print("Serving a synthetic account of {} persons on {}".format(persons, server.base_url))
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,144 @@
+"""
+Concurrent stress test of one shared Client and the entity caches: threads make their first requests together
+(the custom fields must load exactly once), then page, refresh, find and evict the same entities at once.
+Checks every cached entity is the only object for its id and is indexed under its current data, and that
+clients with different tokens don't share an Authorization header.  Exits non zero on failure.
+Run from the repository root: python benchmarks/stress_threads.py [threads] [rounds]
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from urllib.parse import urlparse
+sys.path.append(os.path.abspath('.'))
+from pipedrive.client import Client, Person
+
+NUM_PERSONS = 2000
+NUM_ORGS = 50
+LEVEL_KEY = "%040x" % 1
+
+
+class FakeResponse:
+
+    def __init__(self, url, payload):
+        self.status_code = 200
+        self.url = url
+        self.headers = {}
+        self.content = json.dumps(payload).encode('UTF-8')
+        self.text = self.content.decode('UTF-8')
+
+
+class FakeSession:
+    """
+    Stands in for requests.Session, serving custom fields and pages of persons
+    """
+
+    def __init__(self):
+        self.requests = Counter()
+        self.authorizations = set()
+        self._lock = threading.Lock()
+
+    def request(self, method, url, headers=None, params=None, data=None, json=None, stream=False):
+        path = urlparse(url).path.rsplit("/", 1)[-1]
+        with self._lock:
+            self.requests[path] += 1
+            if headers and "Authorization" in headers:
+                self.authorizations.add(headers["Authorization"])
+        if path.endswith("Fields"):
+            fields = [{"key": LEVEL_KEY, "name": "Level", "options": [{"id": 1, "label": "Gold"}, {"id": 2, "label": "Silver"}]}]
+            return FakeResponse(url, {"success": True, "data": fields if path == "personFields" else []})
+        start = int((params or {}).get("start") or 0)
+        limit = int((params or {}).get("limit") or 100)
+        persons = [{"id": i, "name": "Person %s" % i, "org_id": {"value": i % NUM_ORGS, "name": "Org %s" % (i % NUM_ORGS)},
+                    "owner_id": {"id": 1, "name": "Owner"}, "email": [{"value": "p%s@example.com" % i}],
+                    LEVEL_KEY: str(1 + i % 2)} for i in range(start, min(start + limit, NUM_PERSONS))]
+        more = start + limit < NUM_PERSONS
+        return FakeResponse(url, {"success": True, "data": persons, "additional_data": {"pagination": {
+            "start": start, "limit": limit, "more_items_in_collection": more, "next_start": start + limit}}})
+
+    def close(self):
+        pass
+
+
+def worker(client, barrier, errors, rounds, n):
+    try:
+        barrier.wait()
+        for r in range(rounds):
+            for person in client.iter_persons(limit=NUM_PERSONS):
+                if (person.data["id"] + n + r) % 7 == 0:
+                    person.level = "Gold" if person.level == "Silver" else "Silver"
+            for person in Person.find(org_id=n % NUM_ORGS, level="Gold")[:5]:
+                person.org.notes # Resolves the relationship concurrently with the other threads
+            Person.evict(*range(n, NUM_PERSONS, 97))
+            Person.find(email__in=["p%s@example.com" % i for i in range(n, n + 20)])
+    except Exception as e:
+        errors.append(e)
+
+
+def check(errors, session):
+    failures = ["{}: {}".format(type(e).__name__, e) for e in errors]
+    for path, count in session.requests.items():
+        if path.endswith("Fields") and count != 1:
+            failures.append("{} requested {} times".format(path, count))
+    with Person.getCache().lock:
+        cache = dict(Person.getCache())
+        index = Person._index()
+        for theId, person in cache.items():
+            if person.data["id"] != theId:
+                failures.append("{} cached under {}".format(person, theId))
+            for field in Person.indexed_fields:
+                for value in person._index_values(field):
+                    if theId not in index["fields"][field].get(value, ()):
+                        failures.append("{} not indexed under {}={}".format(person, field, value))
+        for field, entries in index["fields"].items():
+            for value, ids in entries.items():
+                for theId in ids:
+                    if theId not in cache:
+                        failures.append("Evicted person {} still indexed under {}={}".format(theId, field, value))
+    orgs = {id(p.org) for p in cache.values() if p.org is not None and p.org.data["id"] == 0}
+    if len(orgs) > 1:
+        failures.append("{} objects for Organization 0".format(len(orgs)))
+    return failures
+
+
+def main(num_threads=32, rounds=3):
+    os.chdir(tempfile.mkdtemp()) # The custom field json cache files are written to the working directory
+    session = FakeSession()
+    client = Client(api_base_url="https://example.pipedrive.com/", session=session)
+    client.set_token("token")
+    barrier = threading.Barrier(num_threads)
+    errors = []
+    threads = [threading.Thread(target=worker, args=(client, barrier, errors, rounds, n)) for n in range(num_threads)]
+    start = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.time() - start
+
+    other = Client(api_base_url="https://example.pipedrive.com/", session=session, oauth=True)
+    other.set_token("other")
+    oauth = Client(api_base_url="https://example.pipedrive.com/", session=session, oauth=True)
+    oauth.set_token("oauth")
+    thread = threading.Thread(target=other.get_persons, kwargs={"limit": 10})
+    thread.start()
+    oauth.get_persons(limit=10)
+    thread.join()
+    failures = check(errors, session)
+    if "Authorization" in Client.header or session.authorizations != {"Bearer other", "Bearer oauth"}:
+        failures.append("Authorization headers leaked between clients: {}".format(session.authorizations))
+
+    print("{} threads x {} rounds of {} persons in {:.1f}s, {} requests".format(
+        num_threads, rounds, NUM_PERSONS, elapsed, sum(session.requests.values())))
+    print(Person.cache_stats())
+    for failure in failures[:20]:
+        print("FAIL", failure)
+    print("{} failures".format(len(failures)))
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*[int(a) for a in sys.argv[1:]]))
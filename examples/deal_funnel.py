@@ -0,0 +1,24 @@
+import sys
+import numpy
+sys.path.append('..')
+from pipedrive.client import *
+from pipedrive.columns import EntityColumns
+client = Client() # setup in pipedrive_settings.json
+pipelines = client.get_pipelines()
+client.get_stages()
+
+deals = EntityColumns(client.get_deals(limit=1000000), numeric=["value", "probability"],
+                      categorical=["pipeline_id", "stage_id", "status", "currency"], dates=["rotten_time"])
+open_deals = deals.where(deals.equals("status", "open"))
+counts = open_deals.group_by("stage_id").count()
+values = open_deals.group_by("stage_id", "currency").sum("value")
+medians = open_deals.group_by("stage_id").percentile("value", 50)
+rotten = open_deals.where(open_deals["rotten_time"] <= numpy.datetime64("now")).group_by("stage_id").count()
+
+for pipeline in pipelines:
+    print(" ----------  ",pipeline," -----------")
+    print("{0:<35} {1:>8} {2:>8} {3:>14} {4:>30}".format("Stage","Deals","Rotten","Median value","Value"))
+    for stage in pipeline.stages:
+        stage_values = ", ".join("{0:.0f} {1}".format(v, currency) for (s, currency), v in values.items() if s == stage.id)
+        print("{0:<35} {1:>8} {2:>8} {3:>14.0f} {4:>30}".format(stage.name, counts.get(stage.id, 0), rotten.get(stage.id, 0),
+                                                         medians.get(stage.id, 0), stage_values))
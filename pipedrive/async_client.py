@@ -0,0 +1,713 @@
+import asyncio
+import json as jsonlib
+import logging
+from base64 import b64encode
+
+import aiohttp
+
+from pipedrive.client import *
+
+log = logging.getLogger(__name__)
+
+def make_async_session(pool_connections=10, pool_maxsize=10, keep_alive=True):
+    """
+    Build a connection-pooled aiohttp session suitable for passing to one or more AsyncClients.
+    Must be called from inside a running event loop.
+    :param pool_connections: number of hosts to keep pools for, the total connection limit is pool_connections * pool_maxsize
+    :param pool_maxsize: max connections per host
+    :param keep_alive: set to False to close the connection after each request
+    :return: aiohttp.ClientSession
+    """
+    connector = aiohttp.TCPConnector(limit=pool_connections * pool_maxsize, limit_per_host=pool_maxsize,
+                                     force_close=not keep_alive)
+    return aiohttp.ClientSession(connector=connector)
+
+
+class _AsyncResponse:
+    """
+    The parts of a requests.Response that parse_response needs, read from an aiohttp response
+    """
+
+    def __init__(self, status_code, url, content, headers):
+        self.status_code = status_code
+        self.url = url
+        self.content = content
+        self.headers = headers
+
+    @property
+    def text(self):
+        return self.content.decode('UTF-8', 'replace')
+
+
+class AsyncClient(Client):
+    """
+    asyncio version of Client, all the API methods are coroutines using a non-blocking aiohttp session.
+    Entities are constructed into the same caches as Client, e.g. deals = await client.get_deals(limit=5000)
+    """
+
+    def __init__(self, api_base_url=None, client_id=None, client_secret=None, oauth=False, session=None,
+                 pool_connections=10, pool_maxsize=10, keep_alive=True, page_workers=1, rate_limiter=None, max_retries=3,
+                 decoder=None, response_cache=None, custom_fields_cache=None):
+        """
+        :param session: an existing aiohttp.ClientSession (e.g. from make_async_session or another AsyncClient's .session)
+         to share one connection pool.  If None, one is created on the first request (inside the running loop)
+        :param decoder: json decoder for responses, see Client
+        :param response_cache: a ResponseCache for GETs of slow changing endpoints, see Client
+        :param custom_fields_cache: a CustomFieldsCache, see Client
+        """
+        self._custom_fields_task = None
+        super().__init__(api_base_url, client_id, client_secret, oauth, session, pool_connections, pool_maxsize,
+                         keep_alive=keep_alive, page_workers=page_workers, rate_limiter=rate_limiter,
+                         max_retries=max_retries, decoder=decoder, response_cache=response_cache,
+                         custom_fields_cache=custom_fields_cache)
+
+    def _init_session(self, session, pool_connections, pool_maxsize, pool_block, keep_alive):
+        self.session = session # Otherwise created on the first request, see _get_session
+        self._session_args = (pool_connections, pool_maxsize, keep_alive)
+
+    def _get_session(self):
+        if self.session is None:
+            self.session = make_async_session(*self._session_args)
+        return self.session
+
+    async def close(self):
+        """
+        Close the underlying session and its pooled connections.  Don't call this on a shared session still in use.
+        """
+        if self.session is not None:
+            await self.session.close()
+
+    def __enter__(self):
+        raise TypeError("Use async with AsyncClient(...), close() is a coroutine")
+
+    def __exit__(self, *args):
+        raise TypeError("Use async with AsyncClient(...), close() is a coroutine")
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def gather(self, *aws, concurrency=None, return_exceptions=False):
+        """
+        Like asyncio.gather, but with at most concurrency awaitables running at once
+        e.g. deals = await client.gather(*[client.get_deals(deal_id=i) for i in ids], concurrency=10)
+        """
+        if not concurrency:
+            return await asyncio.gather(*aws, return_exceptions=return_exceptions)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def bounded(aw):
+            async with semaphore:
+                return await aw
+        return await asyncio.gather(*[bounded(aw) for aw in aws], return_exceptions=return_exceptions)
+
+    async def map(self, method, args, concurrency=None, return_exceptions=False):
+        """
+        Call method with each of args, e.g. persons = await client.map(client.get_persons, person_ids, concurrency=10)
+        """
+        return await self.gather(*[method(arg) for arg in args], concurrency=concurrency,
+                                 return_exceptions=return_exceptions)
+
+    async def load_custom_fields(self, *entities):
+        """
+        Coroutine version of Client.load_custom_fields.  The first request loads all of them (see _ensure_custom_fields)
+        as an entity class can't load its own on first use without blocking the loop.
+        """
+        entities = entities or EntityWithCustomFields.__subclasses__()
+        missing = [e for e in entities if "custom_fields" not in e.__dict__ and not self._load_custom_fields_file(e)]
+        await self._fetch_custom_fields(missing)
+
+    async def reload_custom_fields(self, *entities):
+        """
+        Coroutine version of Client.reload_custom_fields
+        """
+        entities = entities or EntityWithCustomFields.__subclasses__()
+        self._invalidate_custom_fields(entities)
+        await self._fetch_custom_fields(entities)
+        for entity in entities:
+            entity.clear_cache()
+
+    async def _fetch_custom_fields(self, entities):
+        urls = ["/" + e.__name__.lower() + "Fields" for e in entities]
+        results = await asyncio.gather(*[self._make_request('get', url) for url in urls], return_exceptions=True)
+        errors = [result for result in results if isinstance(result, Exception)]
+        for entity, result in zip(entities, results):
+            if not isinstance(result, Exception):
+                self._store_custom_fields(entity, result)
+        if errors:
+            raise errors[0]
+
+    async def _ensure_custom_fields(self):
+        """
+        Load the custom fields once, concurrent first requests all wait for the same load
+        """
+        if self._custom_fields_task is None:
+            Entity.initialised = True
+            if all("custom_fields" in e.__dict__ for e in EntityWithCustomFields.__subclasses__()):
+                return
+            self._custom_fields_task = asyncio.ensure_future(self.load_custom_fields())
+        task = self._custom_fields_task
+        try:
+            await task
+        except Exception:
+            if self._custom_fields_task is task:
+                self._custom_fields_task = None # So the next request tries again rather than re-raising this
+            raise
+
+    @staticmethod
+    def _params(kwargs):
+        """
+        aiohttp doesn't accept None or bool query values (requests drops and str()s them respectively)
+        """
+        return {k: (str(v) if isinstance(v, bool) else v) for k, v in kwargs.items() if v is not None}
+
+    async def _send(self, method, url, **kwargs):
+        async with self._get_session().request(method, url, **kwargs) as response:
+            content = await response.read()
+            return _AsyncResponse(response.status, str(response.url), content, response.headers.copy())
+
+    async def make_request(self, method, endpoint, data=None, json=None, **kwargs):
+        """
+            Async version of Client.make_request
+            :param method:
+            :param endpoint:
+            :param data:
+            :param kwargs:
+            :return:
+        """
+        await self._ensure_custom_fields()
+        return await self._make_request(method, endpoint, data, json, **kwargs)
+
+    async def _make_request(self, method, endpoint, data=None, json=None, **kwargs):
+        url = self._request_url(endpoint)
+        key, cached, headers = self._cache_lookup(method, endpoint, url, kwargs)
+        if cached is not None:
+            return self.parse_response(cached)
+        event = RequestEvent(method, endpoint) if self.listeners else None
+        bucket = self._rate_limit_bucket()
+        attempt = 0
+        while True:
+            if bucket:
+                wait = bucket.reserve()
+                if wait:
+                    await asyncio.sleep(wait)
+                    if event:
+                        event.wait_seconds += wait
+            sent = time.perf_counter() if event else None
+            if method == "get":
+                response = await self._send(method, url, headers=headers, params=self._params(kwargs))
+            else:
+                response = await self._send(method, url, headers=headers, data=data, json=json,
+                                            params=self._params(kwargs))
+            if event:
+                event.network_seconds += time.perf_counter() - sent
+            delay = self._retry_delay(bucket, response, attempt)
+            if delay is None:
+                break
+            attempt += 1
+            if event:
+                event.retries += 1
+            if not bucket:
+                await asyncio.sleep(delay)
+                if event:
+                    event.wait_seconds += delay
+        response = self._cache_store(method, endpoint, key, response)
+        if self._revalidation_lost(response, event):
+            return await self._make_request(method, endpoint, data, json, **kwargs)
+        if event and json is not None:
+            event.bytes_sent = len(jsonlib.dumps(json))
+        return self._parse_response(response, event)
+
+    async def _get(self, endpoint, data=None, **kwargs):
+        return await self.make_request('get', endpoint, data=data, **kwargs)
+
+    async def _post(self, endpoint, data=None, json=None, **kwargs):
+        return await self.make_request('post', endpoint, data=data, json=json, **kwargs)
+
+    async def _delete(self, endpoint, **kwargs):
+        return await self.make_request('delete', endpoint, **kwargs)
+
+    async def _put(self, endpoint, json=None, **kwargs):
+        return await self.make_request('put', endpoint, json=json, **kwargs)
+
+    async def exchange_code(self, redirect_uri, code):
+        if redirect_uri is not None and code is not None:
+            url = self.flow_base_url + self.token_end
+            authorization = '{0}:{1}'.format(self.client_id, self.client_secret)
+            header = {'Authorization': 'Basic {0}'.format(b64encode(authorization.encode('UTF-8')).decode('UTF-8'))}
+            args = {'grant_type': 'authorization_code', 'code': code, 'redirect_uri': redirect_uri}
+            response = await self._send('post', url, headers=header, data=args)
+            return self.parse_response(response)
+        else:
+            raise Exception("The attributes necessary to exchange the code were not obtained.")
+
+    async def refresh_token(self, refresh_token):
+        if refresh_token is not None:
+            url = self.flow_base_url + self.token_end
+            data = {
+                'client_id': self.client_id,
+                'client_secret': self.client_secret,
+                'grant_type': "refresh_token",
+                'refresh_token': refresh_token,
+            }
+            response = await self._send('post', url, data=data)
+            return self.parse_response(response)
+        else:
+            raise Exception("The attributes necessary to refresh the token were not obtained.")
+
+    async def get_recent_changes(self, **kwargs):
+        if kwargs is not None:
+            url = "recents"
+            return await self._get(url, **kwargs)
+
+    async def get_data(self, endpoint, **kwargs):
+        if endpoint != "":
+            return await self._get(endpoint, **kwargs)
+
+    async def get_specific_data(self, endpoint, data_id, **kwargs):
+        if endpoint != "":
+            url = "{0}/{1}".format(endpoint, data_id)
+            return await self._get(url, **kwargs)
+
+    async def create_data(self, endpoint, **kwargs):
+        if endpoint != "" and kwargs is not None:
+            params = {}
+            params.update(kwargs)
+            return await self._post(endpoint, json=params)
+
+    def _entity_custom_fields(self, entity):
+        return entity.custom_fields # Loaded by _ensure_custom_fields, awaited before building a field selector
+
+    async def _get_with_pagination(self, url, entity, fields=None, **kwargs):
+        entities = []
+        if fields is not None:
+            await self._ensure_custom_fields()
+        url += self._field_selector(entity, fields)
+        async for result in self._iter_pages(url, entity, **kwargs):
+            entities.extend(self.as_entities(entity, result, partial=fields is not None))
+        return entities
+
+    async def _iter_with_pagination(self, url, entity, pages=False, cache=True, fields=None, **kwargs):
+        """
+        Async generator version of _get_with_pagination, see Client._iter_with_pagination
+        """
+        if fields is not None:
+            await self._ensure_custom_fields()
+        url += self._field_selector(entity, fields)
+        async for result in self._iter_pages(url, entity, **kwargs):
+            entities = self.as_entities(entity, result, cache, fields is not None)
+            if pages:
+                yield entities
+            else:
+                for e in entities:
+                    yield e
+
+    async def _iter_pages(self, url, entity, page_workers=None, **kwargs):
+        """
+        Yield the raw json of each page, see Client._iter_pages.  With page_workers > 1 the remaining
+        pages are requested page_workers at a time with asyncio.gather.
+        """
+        if page_workers is None:
+            page_workers = self.page_workers
+        while True:
+            result = await self._get(url, **kwargs)
+            yield result
+            pagination = result["additional_data"]["pagination"]
+            if pagination["more_items_in_collection"]:
+                if "limit" in kwargs and kwargs["limit"] > pagination["next_start"]:
+                    if page_workers > 1:
+                        async for page in self._iter_pages_parallel(url, entity, pagination, page_workers, **kwargs):
+                            yield page
+                        break
+                    kwargs["start"] = pagination["next_start"]
+                    log.debug("Making another API hit for %s, starting at %s", entity.__name__, kwargs["start"])
+                    continue
+            break
+
+    async def _iter_pages_parallel(self, url, entity, pagination, page_workers, **kwargs):
+        page_size = max(pagination.get("limit") or pagination["next_start"] - pagination.get("start", 0), 1)
+        limit = kwargs["limit"]
+        start = pagination["next_start"]
+        while start < limit:
+            starts = range(start, limit, page_size)[:page_workers]
+            log.debug("Making %s parallel API hits for %s, starting at %s", len(starts), entity.__name__, start)
+            results = await asyncio.gather(*[self._get(url, **dict(kwargs, start=s)) for s in starts])
+            for result in results:
+                yield result
+                if not result["additional_data"]["pagination"]["more_items_in_collection"]:
+                    return
+            start = starts[-1] + page_size
+
+    async def refresh(self, entity):
+        return self.as_entity(entity.__class__, await self._get(self._entity_url(entity)))
+
+    async def get_stages(self, **kwargs):
+        url = "stages"
+        return self.as_entities(Stage, await self._get(url)) # No pagination here
+
+    # Pipeline section, see the api documentation: https://developers.pipedrive.com/docs/api/v1/#!/Pipelines
+    async def get_pipelines(self, pipeline_id=None, **kwargs):
+        if pipeline_id is not None:
+            url = "pipelines/{0}".format(pipeline_id)
+            return self.as_entity(Pipeline, await self._get(url))
+        else:
+            url = "pipelines"
+            return self.as_entities(Pipeline, await self._get(url)) # No pagination here
+
+    async def get_pipeline_deals(self, pipeline_id, **kwargs):
+        url = "pipelines/{0}/deals".format(pipeline_id)
+        return await self._get_with_pagination(url, Deal, **kwargs)
+
+    # Deals section, see the api documentation: https://developers.pipedrive.com/docs/api/v1/#!/Deals
+    async def get_deals(self, deal_id=None, fields=None, **kwargs):
+        if deal_id is not None:
+            if fields is not None:
+                await self._ensure_custom_fields()
+            url = "deals/{0}".format(deal_id) + self._field_selector(Deal, fields)
+            return self.as_entity(Deal, await self._get(url), partial=fields is not None)
+        else:
+            url = "deals"
+        return await self._get_with_pagination(url, Deal, fields, **kwargs)
+
+    async def create_deal(self, **kwargs):
+        url = "deals"
+        if kwargs is not None:
+            params = {}
+            params.update(kwargs)
+            return self.as_entity(Deal, await self._post(url, json=params))
+
+    async def update_deal(self, deal_id, **kwargs):
+        if deal_id is not None and kwargs is not None:
+            url = "deals/{0}".format(deal_id)
+            params = {}
+            params.update(kwargs)
+            return self.as_entity(Deal, await self._put(url, json=params))
+
+    async def delete_deal(self, deal_id):
+        if deal_id is not None:
+            url = "deals/{0}".format(deal_id)
+            return await self._delete(url)
+
+    async def duplicate_deal(self, deal_id):
+        if deal_id is not None:
+            url = "deals/{0}/duplicate".format(deal_id)
+            ret = await self._post(url)
+            log.debug("duplicate_deal : %s", ret)
+            return self.as_entity(Deal,ret["data"])
+
+    async def get_deals_by_name(self, **kwargs):
+        if kwargs is not None:
+            url = "deals/find"
+            return await self._get_with_pagination(url, Deal, **kwargs)
+
+    async def get_deal_followers(self, deal_id):
+        if deal_id is not None:
+            url = "deals/{0}/followers".format(deal_id)
+            return await self._get(url)
+
+    async def add_follower_to_deal(self, deal_id, user_id):
+        if deal_id is not None and user_id is not None:
+            url = "deals/{0}/followers".format(deal_id)
+            return await self._post(url, json=user_id)
+
+    async def delete_follower_to_deal(self, deal_id, follower_id):
+        if deal_id is not None and follower_id is not None:
+            url = "deals/{0}/followers/{1}".format(deal_id, follower_id)
+            return await self._delete(url)
+
+    async def get_deal_participants(self, deal_id, **kwargs):
+        if deal_id is not None:
+            url = "deals/{0}/participants".format(deal_id)
+            return await self._get(url, **kwargs)
+
+    async def add_participants_to_deal(self, deal_id, person_id):
+        if deal_id is not None and person_id is not None:
+            url = "deals/{0}/participants".format(deal_id)
+            return await self._post(url, json=person_id)
+
+    async def delete_participant_to_deal(self, deal_id, participant_id):
+        if deal_id is not None and participant_id is not None:
+            url = "deals/{0}/participants/{1}".format(deal_id, participant_id)
+            return await self._delete(url)
+
+    async def get_deal_activities(self, deal_id, **kwargs):
+        if deal_id is not None:
+            url = "deals/{0}/activities".format(deal_id)
+            return self.as_entities(Activity, await self._get(url, **kwargs))
+
+    async def get_deal_mail_messages(self, deal_id, **kwargs):
+        if deal_id is not None:
+            url = "deals/{0}/mailMessages".format(deal_id)
+            return await self._get(url, **kwargs)
+
+    async def get_deal_products(self, deal_id, **kwargs):
+        if deal_id is not None:
+            url = "deals/{0}/products".format(deal_id)
+            return self.as_entities(Deal, await self._get(url, **kwargs))
+
+    # Notes section, see the api documentation: https://developers.pipedrive.com/docs/api/v1/#!/Notes
+    async def get_notes(self, note_id=None, **kwargs):
+        if note_id is not None:
+            url = "notes/{0}".format(note_id)
+            return self.as_entity(Note, await self._get(url, **kwargs))
+        else:
+            url = "notes"
+            return await self._get_with_pagination(url, Note, **kwargs)
+
+    async def create_note(self, **kwargs):
+        if kwargs is not None:
+            url = "notes"
+            params = {}
+            params.update(kwargs)
+            return self.as_entity(Note, await self._post(url, json=params))
+
+    async def update_note(self, note_id, **kwargs):
+        if note_id is not None and kwargs is not None:
+            url = "notes/{0}".format(note_id)
+            params = {}
+            params.update(kwargs)
+            return self.as_entity(Note, await self._put(url, json=params))
+
+    async def delete_note(self, note_id):
+        if note_id is not None:
+            url = "notes/{0}".format(note_id)
+            return await self._delete(url)
+
+    # Organizations section, see the api documentation: https://developers.pipedrive.com/docs/api/v1/#!/Organizations
+    async def get_organizations(self, org_id=None, fields=None, **kwargs):
+        if org_id is not None:
+            if fields is not None:
+                await self._ensure_custom_fields()
+            url = "organizations/{0}".format(org_id) + self._field_selector(Organization, fields)
+            return self.as_entity(Organization, await self._get(url, **kwargs), partial=fields is not None)
+        else:
+            url = "organizations"
+            return await self._get_with_pagination(url, Organization, fields, **kwargs)
+
+    async def save_changes(self, entity):
+        url = self._entity_url(entity)
+        params = self._changes(entity)
+        log.debug("Saving %s changes %s", entity, params)
+        return self.as_entity(entity.__class__, await self._put(url,json=params))
+
+    async def create_organization(self, **kwargs):
+        if kwargs is not None:
+            url = "organizations"
+            params = {}
+            params.update(kwargs)
+            return await self._post(url, json=params)
+
+    async def update_organization(self, data_id, **kwargs):
+        if data_id is not None:
+            url = "organizations/{0}".format(data_id)
+            params = {}
+            params.update(kwargs)
+            return await self._put(url, json=params)
+
+    async def delete_organization(self, data_id):
+        if data_id is not None:
+            url = "organizations/{0}".format(data_id)
+            return await self._delete(url)
+
+    async def get_entity_fields(self,entityClass):
+        url = "/" + entityClass.__name__.lower() + "Fields"
+        return await self._get(url)
+
+    # Persons section, see the api documentation: https://developers.pipedrive.com/docs/api/v1/#!/Persons
+    async def get_persons(self, person_id=None, fields=None, **kwargs):
+        if person_id is not None:
+            if fields is not None:
+                await self._ensure_custom_fields()
+            url = "persons/{0}".format(person_id) + self._field_selector(Person, fields)
+            return self.as_entity(Person, await self._get(url, **kwargs), partial=fields is not None)
+        else:
+            url = "persons"
+            return await self._get_with_pagination(url, Person, fields, **kwargs)
+
+    async def get_persons_by_name(self, **kwargs):
+        if kwargs is not None:
+            url = "persons/find"
+            return self.as_entities(Person, await self._get(url, **kwargs))
+
+    async def create_person(self, **kwargs):
+        if kwargs is not None:
+            url = "persons"
+            params = {}
+            params.update(kwargs)
+            return self.as_entity(Person, await self._post(url, json=params))
+
+    async def update_person(self, data_id, **kwargs):
+        if data_id is not None and kwargs is not None:
+            url = "persons/{0}".format(data_id)
+            params = {}
+            params.update(kwargs)
+            return self.as_entity(Person, await self._put(url, json=params))
+
+    async def delete_person(self, data_id):
+        if data_id is not None:
+            url = "persons/{0}".format(data_id)
+            return await self._delete(url)
+
+    async def get_person_deals(self, person_id, **kwargs):
+        if person_id is not None:
+            url = "persons/{0}/deals".format(person_id)
+            return self.as_entities(Deal, await self._get(url, **kwargs))
+
+    # Products section, see the api documentation: https://developers.pipedrive.com/docs/api/v1/#!/Products
+    async def get_products(self, product_id=None, **kwargs):
+        if product_id is not None:
+            url = "products/{0}".format(product_id)
+            return self.as_entity(Product, await self._get(url, **kwargs))
+        else:
+            url = "products"
+            return self.as_entities(Product, await self._get(url, **kwargs))
+
+    async def get_product_by_name(self, params=None):
+        if params is not None:
+            url = "products/find"
+            return self.as_entities(Product, await self._get(url, params))
+
+    async def create_product(self, **kwargs):
+        if kwargs is not None:
+            url = "products"
+            params = {}
+            params.update(kwargs)
+            return self.as_entity(Product, await self._post(url, json=params))
+
+    async def update_product(self, product_id, **kwargs):
+        if product_id is not None and kwargs is not None:
+            url = "products/{0}".format(product_id)
+            params = {}
+            params.update(kwargs)
+            return self.as_entity(Product, await self._put(url, json=params))
+
+    async def delete_product(self, product_id):
+        if product_id is not None:
+            url = "products/{0}".format(product_id)
+            return await self._delete(url)
+
+    async def get_product_deals(self, product_id, **kwargs):
+        if product_id is not None:
+            url = "products/{0}/deals".format(product_id)
+            return self.as_entities(Deal, await self._get(url, **kwargs))
+
+    # Activities section, see the api documentation: https://developers.pipedrive.com/docs/api/v1/#!/Activities
+    async def get_activities(self, activity_id=None, **kwargs):
+        if activity_id is not None:
+            url = "activities/{0}".format(activity_id)
+        else:
+            url = "activities"
+        return self.as_entities(Activity, await self._get(url, **kwargs))
+
+    async def create_activity(self, **kwargs):
+        if kwargs is not None:
+            url = "activities"
+            params = {}
+            params.update(kwargs)
+            return self.as_entity(Activity, await self._post(url, json=params))
+
+    async def update_activity(self, activity_id, **kwargs):
+        if activity_id is not None:
+            url = "activities/{0}".format(activity_id)
+            params = {}
+            params.update(kwargs)
+            return self.as_entity(Activity, await self._put(url, json=params))
+
+    async def delete_activity(self, activity_id):
+        if activity_id is not None:
+            url = "activities/{0}".format(activity_id)
+            return await self._delete(url)
+
+    # Webhook section, see the api documentation: https://developers.pipedrive.com/docs/api/v1/#!/Webhooks
+    async def get_hooks_subscription(self):
+        url = "webhooks"
+        return await self._get(url)
+
+    async def create_hook_subscription(self, subscription_url, event_action, event_object, **kwargs):
+        if subscription_url is not None and event_action is not None and event_object is not None:
+            args = {"subscription_url": subscription_url, "event_action": event_action, "event_object": event_object}
+            if kwargs is not None:
+                args.update(kwargs)
+            return await self._post(endpoint='webhooks', json=args)
+        else:
+            raise Exception("The attributes necessary to create the webhook were not obtained.")
+
+    async def delete_hook_subscription(self, hook_id):
+        if hook_id is not None:
+            url = "webhooks/{0}".format(hook_id)
+            return await self._delete(url)
+        else:
+            raise Exception("The attributes necessary to delete the webhook were not obtained.")
+
+    # Users section, see the api documentation: https://developers.pipedrive.com/docs/api/v1/#!/Users
+    async def get_users(self, user_id=None, **kwargs):
+        if user_id is not None:
+            url = "users/{}".format(user_id)
+            return self.as_entity(User, await self._get(url, **kwargs))
+        else:
+            url = "users"
+            return self.as_entities(User, await self._get(url, **kwargs))
+
+    # Bulk section, see Client.  The public delete_*/update_* methods are inherited and return these coroutines
+    async def _fan_out(self, call, args, workers):
+        semaphore = asyncio.Semaphore(max(workers, 1))
+
+        async def bounded(arg):
+            async with semaphore:
+                return await call(arg)
+        results = await asyncio.gather(*[bounded(arg) for arg in args], return_exceptions=True)
+        return dict(zip(args, results))
+
+    async def _bulk_delete(self, endpoint, entity, ids, bulk, chunk_size, workers):
+        call, chunks = self._bulk_delete_calls(endpoint, ids, bulk, chunk_size)
+        return self._bulk_delete_result(entity, await self._fan_out(call, chunks, workers))
+
+    async def _bulk_update(self, endpoint, entity, updates, workers):
+        outcomes = await self._fan_out(lambda theId: self._put("{0}/{1}".format(endpoint, theId), json=updates[theId]),
+                                       list(updates), workers)
+        return self._bulk_update_result(outcomes, lambda theId: entity)
+
+    async def save_all_changes(self, entities, workers=8):
+        outcomes = await self._fan_out(lambda entity: self._put(self._entity_url(entity), json=self._changes(entity)),
+                                       [e for e in entities if e.modified_fields], workers)
+        return self._bulk_update_result(outcomes, lambda entity: entity.__class__)
+
+
+    async def _hydrate_level(self, stubs, workers, list_above):
+        result = BulkResult()
+        by_class = {}
+        for stub in stubs:
+            by_class.setdefault(stub.__class__, []).append(stub)
+        singles = []
+        for cls, cls_stubs in by_class.items():
+            if list_above is not None and len(cls_stubs) > list_above and cls.__name__ in self.paged_classes:
+                await self._get_with_pagination(self.paged_classes[cls.__name__], cls, limit=10 ** 9)
+                for stub in cls_stubs:
+                    if stub.stub:
+                        result.failed[stub] = Exception("{0} {1} wasn't listed".format(cls.__name__, stub.data["id"]))
+                    else:
+                        result.succeeded[stub] = stub
+            else:
+                singles.extend(cls_stubs)
+        outcomes = await self._fan_out(lambda stub: self._get(self._entity_url(stub)), singles, workers)
+        fetched = self._bulk_update_result(outcomes, lambda stub: stub.__class__)
+        result.succeeded.update(fetched.succeeded)
+        result.failed.update(fetched.failed)
+        return result
+
+    async def hydrate(self, entities, relationships=None, workers=8, depth=1, list_above=None):
+        """
+        Async version of Client.hydrate, workers requests at a time
+        """
+        result = BulkResult()
+        for _ in range(depth):
+            stubs = [s for s in self._reachable_stubs(entities, relationships) if s not in result.failed]
+            if not stubs:
+                break
+            level = await self._hydrate_level(stubs, workers, list_above)
+            result.succeeded.update(level.succeeded)
+            result.failed.update(level.failed)
+            entities = list(level.succeeded.values())
+        return result
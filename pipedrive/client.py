@@ -1,41 +1,340 @@
 import requests
+from requests.adapters import HTTPAdapter
 from urllib.parse import urlencode, urlparse, quote_plus
 from base64 import b64encode
+from pipedrive.ratelimit import RateLimiter, retry_after
+from pipedrive.metrics import RequestEvent
 import re
+import os
+import time
+import hashlib
+import bisect
 import logging
+import threading
+import codecs
+from collections import deque
+from collections.abc import Mapping, MutableMapping
+from concurrent.futures import ThreadPoolExecutor
 
 import json
+try:
+    import orjson # Optional, pip install orjson for faster decoding
+except ImportError:
+    orjson = None
 
 logging.basicConfig(level=logging.WARNING) # Update this to DEBUG see all the cache action
 log = logging.getLogger(__name__)
 
-class Entity(object):
+class KeyTable:
+    """
+    The field name -> position table shared by all the CompactData of one entity class
+    """
+    __slots__ = ("positions", "keys", "_lock")
+
+    def __init__(self):
+        self.positions = {}
+        self.keys = []
+        self._lock = threading.Lock()
+
+    def position(self, key):
+        i = self.positions.get(key)
+        if i is None:
+            with self._lock:
+                i = self.positions.get(key)
+                if i is None:
+                    i = len(self.keys)
+                    self.keys.append(key)
+                    self.positions[key] = i
+        return i
+
+
+_MISSING = object()
+
+
+class CompactData(MutableMapping):
+    """
+    Dict-like entity data (see Entity.compact) that only stores a list of values, the keys come from the
+    class's shared KeyTable.  Iterates in the table's key order rather than insertion order, and copy()
+    (or dict(data)) gives a plain dict, e.g. for json.
+    """
+    __slots__ = ("_table", "_values")
+
+    def __init__(self, table, data=()):
+        self._table = table
+        self._values = []
+        for key, value in dict(data).items():
+            self[key] = value
+
+    def __getitem__(self, key):
+        i = self._table.positions.get(key)
+        if i is None or i >= len(self._values) or self._values[i] is _MISSING:
+            raise KeyError(key)
+        return self._values[i]
+
+    def get(self, key, default=None):
+        i = self._table.positions.get(key)
+        if i is None or i >= len(self._values):
+            return default
+        value = self._values[i]
+        return default if value is _MISSING else value
+
+    def __contains__(self, key):
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __setitem__(self, key, value):
+        i = self._table.position(key)
+        values = self._values
+        if i >= len(values):
+            values.extend([_MISSING] * (i + 1 - len(values)))
+        values[i] = value
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        values = self._values
+        values[self._table.positions[key]] = _MISSING
+        while values and values[-1] is _MISSING:
+            values.pop()
+
+    def __iter__(self):
+        for key, value in zip(self._table.keys, self._values):
+            if value is not _MISSING:
+                yield key
+
+    def __len__(self):
+        return sum(1 for value in self._values if value is not _MISSING)
+
+    def copy(self):
+        return dict(self)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class EntityCache(dict):
+    """
+    An entity class's id -> entity cache.  Unbounded by default, set_policy() bounds it to max_size entities
+    (dropping the least recently used) and/or expires entities ttl seconds after they were constructed or refreshed.
+    Dropped entities leave the find() indexes (and so the back references) with them, but stay in the EntityStore if
+    one is attached, so get_by_id reloads them from there.
+    Plain dict access (get, [], in, values) doesn't count as use, lookup() is what get_by_id etc. go through.
+    lock guards the cache and its class's find() indexes, hold it to iterate over the cache while other threads load.
+    """
+
+    def __init__(self, max_size=None, ttl=None):
+        super().__init__()
+        self.lock = threading.RLock()
+        self.entity_class = None
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._expiry = {} # id -> monotonic expiry time, when there's a ttl
+        self._expiry_queue = deque() # (expiry, id) in expiry order, including superseded entries
+
+    def __set_name__(self, owner, name):
+        self.entity_class = owner
+
+    def set_policy(self, max_size=None, ttl=None):
+        """
+        :param max_size: most entities to keep, None for unbounded
+        :param ttl: seconds an entity stays cached after it was constructed or last refreshed, None for forever
+        """
+        with self.lock:
+            self.max_size = max_size
+            self.ttl = ttl
+            now = time.monotonic()
+            self._expiry = {theId: now + ttl for theId in self} if ttl else {}
+            self._expiry_queue = deque((expiry, theId) for theId, expiry in self._expiry.items())
+            self.expire()
+            self._enforce_size()
+
+    def lookup(self, theId):
+        """
+        :return: the cached entity (marking it recently used) or None, counting the hit or miss
+        """
+        with self.lock:
+            entity = dict.get(self, theId)
+            if entity is not None and self.ttl and self._expiry.get(theId, 0) <= time.monotonic():
+                self.drop(theId)
+                entity = None
+            if entity is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            if self.max_size:
+                dict.__delitem__(self, theId) # Reinsert, dict order is the recency order
+                dict.__setitem__(self, theId, entity)
+            return entity
+
+    def touch(self, theId, entity):
+        """
+        :return: True if entity is still the cached one for theId, marking it recently used (as lookup does)
+        """
+        if not self.max_size and not self.ttl: # No recency or expiry to keep
+            return dict.get(self, theId) is entity
+        return self.lookup(theId) is entity
+
+    def __setitem__(self, theId, entity):
+        with self.lock:
+            if self.max_size:
+                dict.pop(self, theId, None)
+            dict.__setitem__(self, theId, entity)
+            if self.ttl:
+                expiry = time.monotonic() + self.ttl
+                self._expiry[theId] = expiry
+                self._expiry_queue.append((expiry, theId))
+                self.expire()
+            self._enforce_size()
+
+    def _enforce_size(self):
+        if self.max_size:
+            while len(self) > self.max_size:
+                self.drop(next(iter(self)))
+
+    def expire(self):
+        """
+        Drop the entities whose ttl has passed
+        """
+        if not self.ttl:
+            return
+        with self.lock:
+            now = time.monotonic()
+            queue = self._expiry_queue
+            while queue and queue[0][0] <= now:
+                expiry, theId = queue.popleft()
+                if self._expiry.get(theId) == expiry: # Otherwise refreshed (or dropped) since
+                    self.drop(theId)
+
+    def drop(self, theId):
+        """
+        Remove an entity from the cache and the find() indexes
+        :return: the entity, or None if it wasn't cached
+        """
+        with self.lock:
+            entity = dict.pop(self, theId, None)
+            self._expiry.pop(theId, None)
+            if entity is None:
+                return None
+            if self.entity_class is not None:
+                self.entity_class._unindex(theId)
+            self.evictions += 1
+        log.debug("Dropped %s from cache %s", entity, id(self))
+        return entity
+
+    def clear(self):
+        with self.lock:
+            dict.clear(self)
+            self._expiry = {}
+            self._expiry_queue = deque()
+            if self.entity_class is not None:
+                self.entity_class._index_cache = None
+
+    def stats(self):
+        return {"size": len(self), "max_size": self.max_size, "ttl": self.ttl,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
 
-    initialised = False # Used to know if the custom fields have been loaded yet
-    custom_fields = {} # Set per concrete sub-class of EntityWithCustomFields
+class Entity(object):
+    # Slots for the attributes every entity sets, __dict__ is kept (but only allocated if used) for anything else
+    __slots__ = ("data", "stub", "modified_fields", "__dict__", "__weakref__")
+
+    initialised = False # Used to know if the custom fields can be loaded (a request has been made, or a store attached)
+    custom_fields = {} # Set per concrete sub-class of EntityWithCustomFields, loaded on first use (see _LazyCustomFields)
+    standard_fields = None # The data keys of the class's other fields, loaded with its custom fields.  None if unknown
+    fields_loader = None # The Client that loads the custom fields (see Client.load_custom_fields), the first to make a request
+    store = None # Optional persistent EntityStore (see pipedrive.store) behind the caches, set by EntityStore.attach
+    indexed_fields = () # Data or custom field names with a secondary index for find(), per concrete class
+    aggregate_class = None # Kept with the find() indexes if set, given each cached entity (see DealAggregates)
+    aggregated_fields = () # Data fields the aggregate reads, so setting one updates it
+    _find_operators = ("in", "gt", "gte", "lt", "lte")
+    compact = False # Set to True (before loading) to store entity data as CompactData instead of a dict per entity
+    loaded_fields = None # The data keys of a partial entity (loaded with fields=[...]), None when it has them all
+    fetch_partial = True # Reading a field a partial entity doesn't have fetches the whole entity, if False it raises
 
     @classmethod
     def getCache(cls):
         raise NotImplemented
 
     @classmethod
-    def refresh_or_construct(cls,data):
+    def refresh_or_construct(cls,data,cache=True,partial=False):
         """
         Only to be used by direct API objects returned (i.e. get_persons should call with Person,data
         related entities should use get_or_construct for passing in their stubs.
+        :param cache: if False a new entity is not added to the cache, so isn't in any back references (for streaming)
+        :param partial: data only has some of the fields (see Client._field_selector), the others an already
+         loaded entity has are kept
         :rtype: Type[entity]
         """
         theId = data["id"]
-        if cls.id_exists(theId):
-            entity = cls.get_by_id(theId)
-            old = str(entity)
-            entity.data = data
-            entity.stub = False
-            entity.modified_fields = [] # Clear this.
-            log.debug("Refreshing %s with %s in cache %s", old, entity, id(cls.getCache()))
-            return entity
-        else:
-            return cls(data,is_stub=False)
+        entities = cls.getCache()
+        loaded = frozenset(data) if partial else None
+        with entities.lock: # So two threads refreshing the same id can't both construct it
+            entity = entities.lookup(theId) # Not get_by_id, no point loading the stored version just to replace its data
+            if entity is not None:
+                old = "{0}({1})".format(cls.__name__, theId)
+                if partial and not entity.stub:
+                    if entity.loaded_fields is not None:
+                        loaded |= entity.loaded_fields
+                    else:
+                        loaded = None # It's still whole
+                    merged = dict(entity.data)
+                    merged.update(data)
+                    data = merged
+                entity._set_loaded_fields(loaded)
+                entity.data = data
+                entity.stub = False
+                entity.modified_fields = [] # Clear this.
+                entity._reset_relationships()
+                entities[theId] = entity # Restarts its ttl
+                cls._reindex(entity)
+                log.debug("Refreshing %s with %s in cache %s", old, entity, id(entities))
+            else:
+                entity = cls(data,is_stub=False,cache=cache)
+                entity._set_loaded_fields(loaded)
+        if Entity.store is not None and entity.loaded_fields is None:
+            Entity.store.save(entity)
+        return entity
+
+    @property
+    def partial(self):
+        """
+        True if only some fields were loaded (with fields=[...]), see loaded_fields
+        """
+        return self.loaded_fields is not None
+
+    def _set_loaded_fields(self, loaded):
+        if loaded is not None:
+            object.__setattr__(self, "loaded_fields", loaded)
+        elif self.loaded_fields is not None:
+            object.__delattr__(self, "loaded_fields")
+
+    def _load_missing(self, key):
+        """
+        Called when a data key this partial entity wasn't loaded with is read: fetch the whole entity into this one
+        through Entity.fields_loader if fetch_partial, otherwise raise AttributeError.  Also raises AttributeError if
+        the whole entity doesn't have key either.
+        """
+        client = Entity.fields_loader
+        theId = self.data["id"]
+        if not Entity.fetch_partial or client is None:
+            raise AttributeError("{0} wasn't loaded for {1} {2}, only {3}".format(
+                key, self.__class__.__name__, theId, ", ".join(sorted(self.loaded_fields))))
+        log.info("Fetching all of %s %s to read %s", self.__class__.__name__, theId, key)
+        data = client._get(client._entity_url(self))["data"]
+        entities = self.getCache()
+        with entities.lock:
+            if entities.lookup(theId) is self:
+                self.refresh_or_construct(data) # Refreshes this one, reindexing and storing it
+            else: # Streamed with cache=False, or evicted since: don't cache it now
+                self._set_loaded_fields(None)
+                self.data = data
+                self.stub = False
+                self.modified_fields = []
+                self._reset_relationships()
+        if key not in self.data:
+            raise AttributeError("{0} {1} has no {2}".format(self.__class__.__name__, theId, key))
 
     @classmethod
     def get_or_construct(cls,data,is_stub=True):
@@ -50,13 +349,14 @@ class Entity(object):
             theId = data["value"]
         else:
             theId = data["id"]
-        if cls.id_exists(theId):
+        with cls.getCache().lock:
             entity = cls.get_by_id(theId)
-            log.debug("Getting cached version of %s from cache %s", entity, id(cls.getCache()))
-            return entity
-        return cls(data,is_stub)
+            if entity is not None:
+                log.debug("Getting cached version of %s from cache %s", entity, id(cls.getCache()))
+                return entity
+            return cls(data,is_stub)
 
-    def __init__(self, data,is_stub):
+    def __init__(self, data,is_stub,cache=True):
         if not Entity.initialised:
             raise Exception("Custom fields not yet initialised, should be impossible")
 
@@ -72,47 +372,333 @@ class Entity(object):
         if not self.__class__.getCache():
             log.debug("%s first object added to cache, data is : %s",self,data)
         self.modified_fields = []
-        self.__class__.getCache()[self.data["id"]] = self
+        if cache:
+            with self.__class__.getCache().lock:
+                self.__class__.getCache()[self.data["id"]] = self
+                self.__class__._reindex(self)
+
+    @classmethod
+    def evict(cls, *ids):
+        """
+        Remove entities from the cache (and so from the related entities' back references, e.g. org.deals)
+        to free the memory.  They stay in the EntityStore if one is attached.  Unknown ids are ignored.
+        :return: the evicted entities
+        """
+        evicted = []
+        for theId in ids:
+            entity = cls.getCache().drop(theId)
+            if entity is not None:
+                evicted.append(entity)
+        return evicted
+
+    @classmethod
+    def purge(cls, *ids):
+        """
+        Evict entities that have been deleted, from the EntityStore too
+        :return: the evicted entities
+        """
+        evicted = cls.evict(*ids)
+        if Entity.store is not None:
+            Entity.store.delete(cls, ids)
+        return evicted
+
+    @classmethod
+    def clear_cache(cls):
+        """
+        Evict every entity of this class (the EntityStore is untouched)
+        """
+        cls.getCache().clear()
+
+    @classmethod
+    def set_cache_policy(cls, max_size=None, ttl=None):
+        """
+        Bound this class's cache, e.g. Person.set_cache_policy(max_size=50000, ttl=3600).  See EntityCache.
+        :param max_size: most entities to keep, dropping the least recently used.  None for unbounded
+        :param ttl: seconds an entity stays cached after it was constructed or last refreshed.  None for forever
+        """
+        cls.getCache().set_policy(max_size, ttl)
+
+    @classmethod
+    def cache_stats(cls):
+        """
+        :return: dict of size, max_size, ttl, hits, misses and evictions
+        """
+        return cls.getCache().stats()
 
     @classmethod
     def get_by_id(cls, id):
-        return cls.getCache().get(id,None)
+        entity = cls.getCache().lookup(id)
+        if entity is None and Entity.store is not None:
+            entity = Entity.store.load(cls, id) # Lazy load, constructs it into the cache
+        return entity
 
     @classmethod
     def id_exists(cls, id):
-        return id in cls.getCache()
+        cache = cls.getCache()
+        cache.expire()
+        return id in cache or (Entity.store is not None and Entity.store.exists(cls, id))
 
     @classmethod
     def get_by_name(cls, name):
-        return [e for e in cls.getCache().values() if e.name == name]
+        if "name" in cls.indexed_fields:
+            return cls.find(name=name)
+        cache = cls.getCache()
+        with cache.lock:
+            cache.expire()
+            entities = list(cache.values())
+        return [e for e in entities if e.name == name]
+
+    @classmethod
+    def find(cls, **criteria):
+        """
+        Find cached entities matching all the criteria, using the indexed_fields indexes where possible
+        (other fields are checked one entity at a time).  Relationships match on id, and list fields (like email)
+        match on any of their values.  Append __in, __gt, __gte, __lt or __lte to a field for other comparisons,
+        e.g. Person.find(email="a@b.com", org_id=12), Deal.find(status="open", value__gte=1000, add_time__lt="2024-01-01")
+        :return: the matching entities, ordered by id
+        """
+        cache = cls.getCache()
+        with cache.lock:
+            cache.expire()
+            index = cls._index()
+            ids = None
+            unindexed = []
+            for criterion, value in criteria.items():
+                field, _, operator = criterion.rpartition("__")
+                if operator not in cls._find_operators:
+                    field, operator = criterion, "eq"
+                if field not in index["fields"]:
+                    unindexed.append((field, operator, value))
+                    continue
+                matched = cls._index_lookup(index, field, operator, value)
+                ids = matched if ids is None else ids & matched
+                if not ids:
+                    return []
+            entities = [cache[i] for i in sorted(ids)] if ids is not None else list(cache.values())
+        for field, operator, value in unindexed:
+            entities = [e for e in entities if cls._matches(e._index_values(field), operator, value)]
+        return entities
+
+    @classmethod
+    def add_index(cls, field):
+        """
+        Index another field (e.g. a custom field) for find()
+        """
+        with cls.getCache().lock:
+            if field not in cls.indexed_fields:
+                cls.indexed_fields = tuple(cls.indexed_fields) + (field,)
+                cls._index_cache = None # Rebuilt on the next find
+
+    @staticmethod
+    def _index_value(value):
+        if isinstance(value, Entity):
+            return value.data["id"]
+        if isinstance(value, dict):
+            return value.get("value", value.get("id"))
+        return value
+
+    def _index_values(self, field):
+        """
+        The values this entity is indexed under for field, several for list fields like email
+        """
+        if field in self.custom_fields:
+            value = getattr(self, field) if self.custom_fields[field]["key"] in self.data else None
+        else:
+            value = self.data.get(field)
+        if isinstance(value, list):
+            values = tuple(self._index_value(v) for v in value)
+        else:
+            values = (self._index_value(value),)
+        return tuple(v for v in values if v is not None and v.__hash__ is not None)
+
+    @classmethod
+    def _index(cls):
+        """
+        The per class secondary indexes, built on first use and rebuilt if the cache has been replaced
+        """
+        with cls.getCache().lock:
+            index = cls.__dict__.get("_index_cache")
+            if index is None or index["cache"] is not cls.getCache():
+                index = {"cache": cls.getCache(), "fields": {f: {} for f in cls.indexed_fields}, "sorted": {}, "values": {},
+                         "aggregates": cls.aggregate_class() if cls.aggregate_class else None}
+                cls._index_cache = index
+                for entity in list(index["cache"].values()):
+                    cls._reindex(entity)
+            return index
+
+    @classmethod
+    def _current_index(cls):
+        """
+        :return: the indexes if they're in use and current, None if they'll be (re)built on the next find anyway
+        """
+        index = cls.__dict__.get("_index_cache")
+        if index is None or index["cache"] is not cls.getCache():
+            return None
+        return index
+
+    @classmethod
+    def _unindex(cls, theId):
+        with cls.getCache().lock:
+            index = cls._current_index()
+            if index is None:
+                return
+            if index["aggregates"] is not None:
+                index["aggregates"].remove(theId)
+            for field, values in index["values"].pop(theId, {}).items():
+                entries = index["fields"][field]
+                for value in values:
+                    ids = entries.get(value)
+                    if ids is not None:
+                        ids.discard(theId)
+                        if not ids:
+                            del entries[value]
+                index["sorted"].pop(field, None)
+
+    @classmethod
+    def _reindex(cls, entity):
+        with cls.getCache().lock:
+            index = cls._current_index()
+            if index is None or not (index["fields"] or index["aggregates"] is not None):
+                return
+            theId = entity.data["id"]
+            if cls.getCache().get(theId) is not entity:
+                return # Not cached (e.g. streamed), so not findable
+            cls._unindex(theId)
+            values = {}
+            for field, entries in index["fields"].items():
+                values[field] = entity._index_values(field)
+                for value in values[field]:
+                    entries.setdefault(value, set()).add(theId)
+                index["sorted"].pop(field, None)
+            index["values"][theId] = values
+            if index["aggregates"] is not None:
+                index["aggregates"].add(entity)
+
+    @classmethod
+    def _index_lookup(cls, index, field, operator, value):
+        entries = index["fields"][field]
+        if operator == "eq":
+            return set(entries.get(cls._index_value(value), ()))
+        if operator == "in":
+            return set().union(*[entries.get(cls._index_value(v), ()) for v in value])
+        if field not in index["sorted"]:
+            try:
+                keys = sorted(k for k in entries)
+            except TypeError:
+                raise Exception("Can't do range queries on " + cls.__name__ + "." + field + ", its values have mixed types")
+            index["sorted"][field] = keys
+        keys = index["sorted"][field]
+        if operator == "gt":
+            keys = keys[bisect.bisect_right(keys, value):]
+        elif operator == "gte":
+            keys = keys[bisect.bisect_left(keys, value):]
+        elif operator == "lt":
+            keys = keys[:bisect.bisect_left(keys, value)]
+        else:
+            keys = keys[:bisect.bisect_right(keys, value)]
+        return set().union(*[entries[k] for k in keys])
+
+    @classmethod
+    def _matches(cls, values, operator, value):
+        if operator == "eq":
+            return cls._index_value(value) in values
+        if operator == "in":
+            return any(cls._index_value(v) in values for v in value)
+        compare = {"gt": lambda v: v > value, "gte": lambda v: v >= value,
+                   "lt": lambda v: v < value, "lte": lambda v: v <= value}[operator]
+        try:
+            return any(compare(v) for v in values)
+        except TypeError:
+            return False
+
+    @classmethod
+    def _relationships(cls):
+        """
+        :return: this class's Relationship descriptors
+        """
+        relationships = cls.__dict__.get("_relationships_cache")
+        if relationships is None:
+            relationships = [v for c in cls.__mro__ for v in vars(c).values() if isinstance(v, Relationship)]
+            cls._relationships_cache = relationships
+        return relationships
+
+    def _reset_relationships(self):
+        """
+        Forget the resolved related entities, e.g. after the data is refreshed the deal might be in another stage
+        """
+        for relationship in self._relationships():
+            relationship.reset(self)
+
+    @classmethod
+    def _key_table(cls):
+        table = cls.__dict__.get("_key_table_cache")
+        if table is None:
+            table = cls._key_table_cache = KeyTable()
+        return table
 
     def __getattr__(self, name):
+        if name == "data":
+            raise AttributeError(name) # Not set yet, don't recurse
         if (name in self.custom_fields):
             return self.__get_custom_field(name)
+        if self.loaded_fields is not None and name not in self.data:
+            if not self._is_field(name): # A typo, or hasattr, shouldn't fetch the entity
+                raise AttributeError("{0} has no field {1}".format(self.__class__.__name__, name))
+            self._load_missing(name)
         value = self.data.get(name,"Invalid field name" + name)
         return value
 
+    @classmethod
+    def _is_field(cls, name):
+        """
+        True if name is one of the class's standard fields (see standard_fields), or could be as they aren't known
+        """
+        if name.startswith("_"):
+            return False
+        return cls.standard_fields is None or name in cls.standard_fields
+
+    def _loaded(self, key):
+        """
+        The data, after fetching the whole entity if this is a partial one without key (for properties reading data)
+        """
+        if self.loaded_fields is not None and key not in self.data:
+            self._load_missing(key)
+        return self.data
+
     def __setattr__(self, name, value):
         if name == "data": # Note, this must be set before any other field (in this super class) to avoid infinite recursion
+            if Entity.compact and not isinstance(value, CompactData):
+                value = CompactData(self.__class__._key_table(), value)
             object.__setattr__(self,name,value)
-        selfdata = self.__dict__["data"]
+            return
+        selfdata = object.__getattribute__(self, "data")
         if name in self.custom_fields:
             custom_field = self.custom_fields[name]
             key = custom_field["key"]
             val_to_set = value
             if ("fields" in custom_field):
-                val_to_set = [ k for k,v in custom_field["fields"].items() if v == value]
-                if not val_to_set:
-                    raise Exception("Value '" + value + "' is not a valid value for field, valid values are " + str(list(custom_field["fields"].values())))
-                val_to_set = val_to_set[0] # There should only be one, and need to de-list
+                try:
+                    val_to_set = self._custom_field_index()[3][name].get(value)
+                except TypeError: # Unhashable, so can't be a label
+                    val_to_set = None
+                if val_to_set is None and value != "": # "" is the label for None (no value)
+                    raise Exception("Value '" + str(value) + "' is not a valid value for field, valid values are " + str(list(custom_field["fields"].values())))
             log.info("Modified custom field %s(%s) from %s(%s) to %s(%s)",name,key,self.__get_custom_field(name),selfdata[key],value,val_to_set)
             selfdata[key] = val_to_set
             self.modified_fields.append(key)
+            if name in self.indexed_fields:
+                self.__class__._reindex(self)
             return
         if name in selfdata:
             log.info("Modified field '%s' from '%s' to '%s')",name,selfdata[name],value)
             selfdata[name] = value
             self.modified_fields.append(name)
+            if name in self.indexed_fields or name in self.aggregated_fields:
+                self.__class__._reindex(self)
+            return
+        if self.loaded_fields is not None and name not in Entity.__slots__ and not name.startswith("_"):
+            selfdata[name] = value # A field that wasn't loaded, still saved as a change
+            self.modified_fields.append(name)
             return
         object.__setattr__(self,name,value)
 
@@ -132,6 +718,9 @@ class Entity(object):
                 return value
             if ("fields" in self.custom_fields[name]):
                 return self.custom_fields[name]["fields"].get(value,"Invalid field value " + value)
+        elif self.loaded_fields is not None:
+            self._load_missing(key) # Whole now, and has key
+            return self.__get_custom_field(name)
         log.warning("{},{} Not found for {}[{}]".format(name, key, self.__class__.__name__, self))
         log.warning("%s",self.data)
         return ("{} Not found".format(name))
@@ -140,6 +729,8 @@ class Entity(object):
         return "(" + str(self.id)  + "," + str(self.name) + ")"
 
     def __str__(self):
+        if self.loaded_fields is not None: # Don't fetch the whole entity just to print it
+            return "{0}({1},{2})".format(self.__class__.__name__, self.data["id"], self.data.get("name", "partial"))
         return self.__class__.__name__  + self.repr()
 
     def get_custom_field_name(self,key):
@@ -148,12 +739,35 @@ class Entity(object):
         :param key:
         :return: the passed in name if not found (assumes it's not custom)
         """
-        names = [ k for k,v in self.custom_fields.items() if v["key"]==key ]
-        if not names:
-            return key # assumes it's not custom
-        if len(names) > 1:
+        _, names_by_key, duplicate_keys, _ = self._custom_field_index()
+        if key in duplicate_keys:
+            names = [ k for k,v in self.custom_fields.items() if v["key"]==key ]
             raise NameError("There are " + str(len(names)) + " matches found in custom_fields for key " + key)
-        return names[0]
+        return names_by_key.get(key, key) # assumes it's not custom if not found
+
+    @classmethod
+    def _custom_field_index(cls):
+        """
+        Maps over this class's custom_fields, built once and rebuilt whenever custom_fields is replaced (e.g. reloaded)
+        :return: (the custom_fields indexed, key -> name, keys with more than one name, name -> {option label -> option id})
+        """
+        index = cls.__dict__.get("_custom_field_index_cache")
+        if index is None or index[0] is not cls.custom_fields:
+            names_by_key = {}
+            duplicate_keys = set()
+            options_by_label = {}
+            for name, field in cls.custom_fields.items():
+                if field["key"] in names_by_key:
+                    duplicate_keys.add(field["key"])
+                names_by_key[field["key"]] = name
+                if "fields" in field:
+                    labels = {}
+                    for option_id, label in field["fields"].items():
+                        labels.setdefault(label, option_id) # First match wins, as the old linear scan did
+                    options_by_label[name] = labels
+            index = (cls.custom_fields, names_by_key, duplicate_keys, options_by_label)
+            cls._custom_field_index_cache = index
+        return index
 
     def __repr__(self):
         if self.data:
@@ -163,12 +777,32 @@ class Entity(object):
 #        return str(self.data)
 
 
+_NO_CUSTOM_FIELDS = {}
+
+
+class _LazyCustomFields:
+    """
+    EntityWithCustomFields.custom_fields until a concrete class's own are set: the first access has
+    Entity.fields_loader load them, which sets them as a plain class attribute that shadows this one
+    """
+
+    def __get__(self, instance, owner):
+        loader = Entity.fields_loader
+        if owner is EntityWithCustomFields or loader is None:
+            return _NO_CUSTOM_FIELDS
+        loader.load_custom_fields(owner)
+        return owner.__dict__.get("custom_fields", _NO_CUSTOM_FIELDS)
+
+
 class EntityWithCustomFields(Entity):
-    pass
+    __slots__ = ()
+
+    custom_fields = _LazyCustomFields()
 
 
 # Just for shared convenience properties
 class EntityWithOrganisations():
+    __slots__ = ()
 
     @property
     def org_name(self):
@@ -180,88 +814,325 @@ class EntityWithOrganisations():
 
 # Just for shared convenience properties
 class EntityWithEmail():
+    __slots__ = ()
 
     @property
     def email_address(self):
-        if "email" in self.data:
-            return str(self.data["email"][0]["value"])
+        data = self._loaded("email")
+        if "email" in data:
+            return str(data["email"][0]["value"])
         return ""
 
 
-class Person(EntityWithCustomFields,EntityWithOrganisations,EntityWithEmail):
+class Relationship:
+    """
+    A related entity (e.g. deal.org) resolved through the cache from the foreign id in data on first access,
+    then kept in the "_" + name slot until the entity's data is refreshed.  Constructing an entity therefore
+    doesn't construct any stubs for the entities it refers to.
+    """
 
-    _by_id = {}
+    def __init__(self, key, resolve):
+        """
+        :param key: the data field holding the foreign id (or a dict with it)
+        :param resolve: function(entity, data) returning the related entity, or None
+        """
+        self.key = key
+        self.resolve = resolve
+
+    def __set_name__(self, owner, name):
+        self.name = name
+        self.slot = "_" + name
+
+    def __get__(self, entity, owner=None):
+        if entity is None:
+            return self
+        try:
+            related = object.__getattribute__(entity, self.slot)
+            if related is None or related.getCache().touch(related.data["id"], related):
+                return related
+        except AttributeError:
+            pass
+        data = entity.data # Not resolved yet, or the related entity has since been evicted
+        if self.key not in data and entity.loaded_fields is not None:
+            entity._load_missing(self.key)
+            data = entity.data
+        related = self.resolve(entity, data) if data.get(self.key) else None
+        object.__setattr__(entity, self.slot, related)
+        return related
+
+    def __set__(self, entity, value):
+        object.__setattr__(entity, self.slot, value)
+
+    def reset(self, entity):
+        try:
+            object.__delattr__(entity, self.slot)
+        except AttributeError:
+            pass
+
+    def related_id(self, entity):
+        """
+        The foreign id, without resolving the relationship
+        """
+        return Entity._index_value(entity.data.get(self.key))
+
+
+class BackReference:
+    """
+    The cached entities referring to this one (e.g. org.deals), looked up with the other class's find()
+    index on the foreign id, so it's always current and nothing is appended at construction time.
+    """
+
+    def __init__(self, entity_class, key, order=None):
+        """
+        :param entity_class: function returning the referring class (they're defined later in this module)
+        :param key: the referring class's indexed field holding this entity's id
+        :param order: data field to sort by, otherwise they're in id order
+        """
+        self.entity_class = entity_class
+        self.key = key
+        self.order = order
+
+    def __get__(self, entity, owner=None):
+        if entity is None:
+            return self
+        related = self.entity_class().find(**{self.key: entity.data["id"]})
+        if self.order:
+            related.sort(key=lambda e: e.data.get(self.order) or 0)
+        return related
+
+    def __set__(self, entity, value):
+        raise AttributeError("Back references are looked up from the related entities, they can't be set")
+
+
+class DealTotals:
+    """
+    The cached deals of a stage or pipeline: count, value per currency, value weighted by the stages' deal_probability
+    per currency, and how many are rotten (have a rotten_time)
+    """
+    __slots__ = ("count", "values", "weighted_values", "rotten")
+
+    def __init__(self):
+        self.count = 0
+        self.values = {}
+        self.weighted_values = {}
+        self.rotten = 0
+
+    def _add(self, currency, count, value, rotten, probability):
+        self.count += count
+        self.values[currency] = self.values.get(currency, 0) + value
+        self.weighted_values[currency] = self.weighted_values.get(currency, 0) + value * probability / 100
+        self.rotten += rotten
+
+    def __repr__(self):
+        return "DealTotals(count={0}, values={1}, weighted_values={2}, rotten={3})".format(
+            self.count, self.values, self.weighted_values, self.rotten)
+
+
+class DealAggregates:
+    """
+    Deal count, value and rotten count per stage, status and currency, kept with Deal's find() indexes: built from
+    the cached deals on first read, then updated as deals are constructed, refreshed, changed or evicted, so
+    Stage.totals, Pipeline.totals and Pipeline.stage_totals don't iterate deals.  Each deal's contribution is kept
+    so a refresh subtracts the old one before adding the new.  Stubs, and partial deals without all of
+    Deal.aggregated_fields, aren't counted.
+    """
+
+    def __init__(self):
+        self._deals = {} # deal id -> (pipeline id, stage id, (status, currency), value, rotten)
+        self._stages = {} # stage id -> (status, currency) -> [count, value, rotten]
+        self._pipelines = {} # pipeline id -> stage id -> count
+
+    @staticmethod
+    def _value(value):
+        if isinstance(value, (int, float)):
+            return value
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return 0
+
+    def add(self, deal):
+        theId = deal.data["id"]
+        self.remove(theId)
+        if deal.stub or (deal.loaded_fields is not None and not deal.loaded_fields.issuperset(deal.aggregated_fields)):
+            return
+        data = deal.data
+        contribution = (Entity._index_value(data.get("pipeline_id")), Entity._index_value(data.get("stage_id")),
+                        (data.get("status"), data.get("currency")), self._value(data.get("value")),
+                        1 if data.get("rotten_time") else 0)
+        self._deals[theId] = contribution
+        self._update(contribution, 1)
+
+    def remove(self, theId):
+        contribution = self._deals.pop(theId, None)
+        if contribution is not None:
+            self._update(contribution, -1)
+
+    def _update(self, contribution, sign):
+        pipeline_id, stage_id, key, value, rotten = contribution
+        buckets = self._stages.setdefault(stage_id, {})
+        bucket = buckets.setdefault(key, [0, 0, 0])
+        bucket[0] += sign
+        bucket[1] += sign * value
+        bucket[2] += sign * rotten
+        if not bucket[0]: # Dropped rather than left at zero, so no rounding is left behind either
+            del buckets[key]
+            if not buckets:
+                del self._stages[stage_id]
+        stages = self._pipelines.setdefault(pipeline_id, {})
+        stages[stage_id] = stages.get(stage_id, 0) + sign
+        if not stages[stage_id]:
+            del stages[stage_id]
+            if not stages:
+                del self._pipelines[pipeline_id]
+
+    def stage_ids(self, pipeline_id):
+        """
+        The stages the pipeline's cached deals are in
+        """
+        return list(self._pipelines.get(pipeline_id, ()))
+
+    def totals(self, stage_id, status="open", probability=100, totals=None):
+        """
+        :param status: the deals' status, None for all of them
+        :param probability: the stage's deal_probability, for the weighted values
+        :param totals: DealTotals to add to, e.g. a pipeline's
+        """
+        if totals is None:
+            totals = DealTotals()
+        for (deal_status, currency), (count, value, rotten) in self._stages.get(stage_id, {}).items():
+            if status is None or deal_status == status:
+                totals._add(currency, count, value, rotten, probability)
+        return totals
+
+
+class StageOrder:
+    """
+    Each pipeline's cached stages in order_nr (then id) order, kept with Stage's find() indexes, so
+    Pipeline.get_next_stage and get_prev_stage are a bisect rather than sorting pipeline.stages for a list.index
+    """
+
+    def __init__(self):
+        self._stages = {} # stage id -> (pipeline id, (order_nr, id))
+        self._order = {} # pipeline id -> sorted [(order_nr, id)]
+
+    def add(self, stage):
+        theId = stage.data["id"]
+        self.remove(theId)
+        pipeline_id = Entity._index_value(stage.data.get("pipeline_id"))
+        key = (stage.data.get("order_nr") or 0, theId)
+        self._stages[theId] = (pipeline_id, key)
+        bisect.insort(self._order.setdefault(pipeline_id, []), key)
+
+    def remove(self, theId):
+        entry = self._stages.pop(theId, None)
+        if entry is None:
+            return
+        pipeline_id, key = entry
+        order = self._order[pipeline_id]
+        del order[bisect.bisect_left(order, key)]
+        if not order:
+            del self._order[pipeline_id]
+
+    def stage_ids(self, pipeline_id):
+        return [theId for _, theId in self._order.get(pipeline_id, ())]
+
+    def neighbour(self, pipeline_id, theId, step):
+        """
+        :return: the id of the stage step places after (or before, if negative) theId in its pipeline, None past the ends
+        """
+        entry = self._stages.get(theId)
+        if entry is None or entry[0] != pipeline_id:
+            raise ValueError("Stage " + str(theId) + " is not a cached stage of pipeline " + str(pipeline_id))
+        order = self._order[pipeline_id]
+        position = bisect.bisect_left(order, entry[1]) + step
+        if 0 <= position < len(order):
+            return order[position][1]
+        return None
+
+
+class Person(EntityWithCustomFields,EntityWithOrganisations,EntityWithEmail):
+    __slots__ = ("_org", "_owner")
+    _by_id = EntityCache()
+    indexed_fields = ("name", "email", "org_id", "owner_id")
 
     @classmethod
     def getCache(cls):
         return cls._by_id
 
-    def __init__(self, data, is_stub):
-        super().__init__(data,is_stub)
-        self.deals = []
-        self.notes = []
-        if "org_id" in data and data["org_id"]: # Can have None in data
-            self.org = Organization.get_or_construct(data["org_id"])
-        else:
-            self.org = None
-        if "owner_id" in data and data["owner_id"]:
-            self.owner = User.get_or_construct(data["owner_id"],is_stub=False)
-        else:
-            self.owner = None
+    def _resolve_org(self, data):
+        return Organization.get_or_construct(data["org_id"])
+
+    def _resolve_owner(self, data):
+        return User.get_or_construct(data["owner_id"],is_stub=False)
+
+    org = Relationship("org_id", _resolve_org)
+    owner = Relationship("owner_id", _resolve_owner)
+    deals = BackReference(lambda: Deal, "person_id")
+    notes = BackReference(lambda: Note, "person_id")
 
 
 class Organization(EntityWithCustomFields):
-    _by_id = {}
+    __slots__ = ()
+    _by_id = EntityCache()
+    indexed_fields = ("name", "owner_id")
 
     @classmethod
     def getCache(cls):
         return cls._by_id
 
-    def __init__(self, data, is_stub):
-        super().__init__(data,is_stub)
-        self.deals = []
-        self.notes = []
+    deals = BackReference(lambda: Deal, "org_id")
+    notes = BackReference(lambda: Note, "org_id")
 
 class Deal(EntityWithCustomFields,EntityWithOrganisations):
-    _by_id = {}
+    __slots__ = ("_pipeline", "_stage", "_org", "_owner", "_creator", "_person")
+    _by_id = EntityCache()
+    indexed_fields = ("title", "status", "value", "pipeline_id", "stage_id", "org_id", "person_id", "user_id")
+    aggregate_class = DealAggregates
+    aggregated_fields = ("pipeline_id", "stage_id", "status", "value", "currency", "rotten_time")
 
     @classmethod
     def getCache(cls):
         return cls._by_id
 
-    def __init__(self, data, is_stub):
-        super().__init__(data,is_stub)
-        self.notes = []
-        # Have to test all of this, because for notes, the note data might be the old objects, so it's not passed in
-        if "pipeline_id" in data:
-            self.pipeline = Pipeline.get_or_construct({"id":data["pipeline_id"],"name":"Unknown (from deal)"})
-            self.pipeline.deals.append(self)
-        if "stage_id" in data:
-            self.stage = Stage.get_or_construct({"id":data["stage_id"],"name":"Unknown (from deal)","pipeline_id":data["pipeline_id"]})
-            self.stage.deals.append(self)
-        # Damn, /deals and /pipeline/#/deals returns different fields.  Latter is an ID, former is an org object.. (for org, user, creator and person)
-        if "org_id" in data:
-            if type(data["org_id"]) is dict:
-                self.org = Organization.get_or_construct(data["org_id"])
-            else:
-                self.org = Organization.get_or_construct({"id":data["org_id"],"name":data["org_name"]})
-            self.org.deals.append(self)
-        if "user_id" in data:
-            if type(data["user_id"]) is dict:
-                self.owner = User.get_or_construct(data["user_id"],is_stub=True)
-            else:
-                self.owner = User.get_or_construct({"id":data["user_id"],"name":data["owner_name"]},is_stub=True)
-        if "creator_user_id" in data:
-            if type(data["creator_user_id"]) is dict:
-                self.creator = User.get_or_construct(data["creator_user_id"],is_stub=False)
-            else:
-                self.creator = User.get_or_construct({"id":data["creator_user_id"],"name":"Unknown (from deal)"},is_stub=True)
-        if "person_id" in data:
-            if type(data["person_id"]) is dict:
-                self.person = Person.get_or_construct(data["person_id"],is_stub=True)
-            else:
-                self.person = Person.get_or_construct({"id":data["person_id"],"name":data["person_name"],"org_id":self.org.data},is_stub=True)
-            self.person.deals.append(self)
+    # Have to test all of this, because for notes, the note data might be the old objects, so it's not passed in
+    def _resolve_pipeline(self, data):
+        return Pipeline.get_or_construct({"id":data["pipeline_id"],"name":"Unknown (from deal)"})
+
+    def _resolve_stage(self, data):
+        return Stage.get_or_construct({"id":data["stage_id"],"name":"Unknown (from deal)","pipeline_id":data.get("pipeline_id")})
+
+    # Damn, /deals and /pipeline/#/deals returns different fields.  Latter is an ID, former is an org object.. (for org, user, creator and person)
+    def _resolve_org(self, data):
+        if type(data["org_id"]) is dict:
+            return Organization.get_or_construct(data["org_id"])
+        return Organization.get_or_construct({"id":data["org_id"],"name":data.get("org_name")})
+
+    def _resolve_owner(self, data):
+        if type(data["user_id"]) is dict:
+            return User.get_or_construct(data["user_id"],is_stub=True)
+        return User.get_or_construct({"id":data["user_id"],"name":data.get("owner_name")},is_stub=True)
+
+    def _resolve_creator(self, data):
+        if type(data["creator_user_id"]) is dict:
+            return User.get_or_construct(data["creator_user_id"],is_stub=False)
+        return User.get_or_construct({"id":data["creator_user_id"],"name":"Unknown (from deal)"},is_stub=True)
+
+    def _resolve_person(self, data):
+        if type(data["person_id"]) is dict:
+            return Person.get_or_construct(data["person_id"],is_stub=True)
+        person_data = {"id":data["person_id"],"name":data.get("person_name")}
+        if self.org:
+            person_data["org_id"] = self.org.data
+        return Person.get_or_construct(person_data,is_stub=True)
+
+    pipeline = Relationship("pipeline_id", _resolve_pipeline)
+    stage = Relationship("stage_id", _resolve_stage)
+    org = Relationship("org_id", _resolve_org)
+    owner = Relationship("user_id", _resolve_owner)
+    creator = Relationship("creator_user_id", _resolve_creator)
+    person = Relationship("person_id", _resolve_person)
+    notes = BackReference(lambda: Note, "deal_id")
 
     @property
     def person_name(self):
@@ -271,47 +1142,97 @@ class Deal(EntityWithCustomFields,EntityWithOrganisations):
             return ""
 
 class Pipeline(Entity):
-    _by_id = {}
+    __slots__ = ()
+    _by_id = EntityCache()
+    indexed_fields = ("name",)
 
     @classmethod
     def getCache(cls):
         return cls._by_id
 
-    def __init__(self, data, is_stub):
-        super().__init__(data,is_stub)
-        self.stages = [] # Left here to be hooked up if stages are loaded
-        self.deals = [] # Left here to be hooked up if deals are loaded
+    stages = BackReference(lambda: Stage, "pipeline_id", order="order_nr")
+    deals = BackReference(lambda: Deal, "pipeline_id")
+
+    def _neighbour_stage(self, stage, step):
+        with Stage.getCache().lock:
+            theId = Stage._index()["aggregates"].neighbour(self.data["id"], stage.data["id"], step)
+            return None if theId is None else Stage.getCache().get(theId)
 
     def get_next_stage(self,stage):
-        pos = self.stages.index(stage)
-        try:
-            return self.stages[pos+1]
-        except ValueError:
-            return None
+        return self._neighbour_stage(stage, 1)
 
     def get_prev_stage(self,stage):
-        pos = self.stages.index(stage)
-        try:
-            return self.stages[pos-1]
-        except ValueError:
-            return None
+        return self._neighbour_stage(stage, -1)
+
+    def stage_totals(self, status="open"):
+        """
+        Funnel figures without iterating the deals (see DealAggregates): the cached stages in order_nr order, then
+        any other stage this pipeline's cached deals are in
+        :param status: the deals' status, None for all of them
+        :return: list of (stage, DealTotals)
+        """
+        with Stage.getCache().lock:
+            stage_ids = Stage._index()["aggregates"].stage_ids(self.data["id"])
+        with Deal.getCache().lock:
+            aggregates = Deal._index()["aggregates"]
+            ordered = set(stage_ids)
+            stage_ids += [theId for theId in aggregates.stage_ids(self.data["id"]) if theId not in ordered]
+            probabilities = [Stage._probability(theId) for theId in stage_ids]
+            totals = [aggregates.totals(theId, status, probability) for theId, probability in zip(stage_ids, probabilities)]
+        stages = [Stage.get_or_construct({"id": theId, "name": "Unknown (from deal)", "pipeline_id": self.data["id"]})
+                  for theId in stage_ids]
+        return list(zip(stages, totals))
+
+    def totals(self, status="open"):
+        """
+        :return: DealTotals of this pipeline's cached deals, the weighted values by each deal's stage
+        """
+        totals = DealTotals()
+        with Deal.getCache().lock:
+            aggregates = Deal._index()["aggregates"]
+            for theId in aggregates.stage_ids(self.data["id"]):
+                aggregates.totals(theId, status, Stage._probability(theId), totals)
+        return totals
 
 
 class Stage(Entity):
-    _by_id = {}
+    __slots__ = ("_pipeline",)
+    _by_id = EntityCache()
+    indexed_fields = ("name", "pipeline_id")
+    aggregate_class = StageOrder
+    aggregated_fields = ("order_nr",)
 
     @classmethod
     def getCache(cls):
         return cls._by_id
 
-    def __init__(self, data, is_stub):
-        super().__init__(data,is_stub)
-        self.pipeline = Pipeline.get_or_construct({"id":data["pipeline_id"],"name":data.get("pipeline_name","Unknown (from Stage, stub=" + str(is_stub) + ")")})
-        self.pipeline.stages.append(self)
-        self.deals = []
+    def _resolve_pipeline(self, data):
+        return Pipeline.get_or_construct({"id":data["pipeline_id"],"name":data.get("pipeline_name","Unknown (from Stage, stub=" + str(self.stub) + ")")})
+
+    pipeline = Relationship("pipeline_id", _resolve_pipeline)
+    deals = BackReference(lambda: Deal, "stage_id")
+
+    @staticmethod
+    def _probability(theId):
+        """
+        The cached stage's deal_probability, 100 if it isn't known
+        """
+        stage = Stage.getCache().get(theId)
+        probability = stage.data.get("deal_probability") if stage is not None else None
+        return 100 if probability is None else probability
+
+    def totals(self, status="open"):
+        """
+        :param status: the deals' status, None for all of them
+        :return: DealTotals of this stage's cached deals, kept up to date as deals are loaded (see DealAggregates)
+        """
+        with Deal.getCache().lock:
+            return Deal._index()["aggregates"].totals(self.data["id"], status, Stage._probability(self.data["id"]))
 
 class User(Entity,EntityWithEmail):
-    _by_id = {}
+    __slots__ = ()
+    _by_id = EntityCache()
+    indexed_fields = ("name", "email")
 
     @classmethod
     def getCache(cls):
@@ -320,7 +1241,9 @@ class User(Entity,EntityWithEmail):
     pass
 
 class Product(Entity):
-    _by_id = {}
+    __slots__ = ()
+    _by_id = EntityCache()
+    indexed_fields = ("name",)
 
     @classmethod
     def getCache(cls):
@@ -329,146 +1252,715 @@ class Product(Entity):
     pass
 
 class Note(Entity):
-    _by_id = {}
+    __slots__ = ("_user", "_org", "_deal", "_person")
+    _by_id = EntityCache()
+    indexed_fields = ("deal_id", "person_id", "org_id", "user_id")
 
     @classmethod
     def getCache(cls):
         return cls._by_id
 
-    def __init__(self, data, is_stub):
-        super().__init__(data,is_stub)
+    def _resolve_user(self, data):
         # Inconsistent data format, so have to mix two dicts
-        self.user = User.get_or_construct({**{"id":data["user_id"]},**data["user"]},is_stub=False)
-        if data["organization"]:
-            self.org = Organization.get_or_construct({"id":data["org_id"],"name":data["organization"]["name"]})
-            self.org.notes.append(self)
-        if data["deal"]:
-            self.deal = Deal.get_or_construct({"id":data["deal_id"],"name":data["deal"]["title"]},is_stub=True)
-        if data["person"]:
-            person_data = {"id": data["person_id"], "name": data["person"]["name"]}
-            if data["organization"]:
-                person_data["org_id"] = self.org.data
-            self.person = Person.get_or_construct(person_data, is_stub=True)
-            self.person.notes.append(self)
+        return User.get_or_construct({**{"id":data["user_id"]},**(data.get("user") or {})},is_stub=False)
+
+    def _resolve_org(self, data):
+        if not data.get("organization"):
+            return None
+        return Organization.get_or_construct({"id":data["org_id"],"name":data["organization"]["name"]})
+
+    def _resolve_deal(self, data):
+        if not data.get("deal"):
+            return None
+        return Deal.get_or_construct({"id":data["deal_id"],"name":data["deal"]["title"]},is_stub=True)
+
+    def _resolve_person(self, data):
+        if not data.get("person"):
+            return None
+        person_data = {"id": data["person_id"], "name": data["person"]["name"]}
+        if self.org:
+            person_data["org_id"] = self.org.data
+        return Person.get_or_construct(person_data, is_stub=True)
+
+    user = Relationship("user_id", _resolve_user)
+    org = Relationship("org_id", _resolve_org)
+    deal = Relationship("deal_id", _resolve_deal)
+    person = Relationship("person_id", _resolve_person)
 
     def repr(self):
         return "(" + str(self.id)  + "," + str(self.content[0:30]) + ")"
 
 class Activity(Entity):
-    _by_id = {}
+    __slots__ = ("_org", "_person", "_owner")
+    _by_id = EntityCache()
+    indexed_fields = ("deal_id", "person_id", "org_id", "user_id", "done", "due_date")
 
     @classmethod
     def getCache(cls):
         return cls._by_id
 
-    def __init__(self, data, is_stub):
-        super().__init__(data,is_stub)
-        self.org = Organization.get_or_construct({"id":data["org_id"],"name":data["org_name"]})
-        self.person = Person.get_or_construct({"id":data["person_id"],"name":data["person_name"],"org_id":self.org.data},is_stub=True)
-        self.owner = User.get_or_construct({"id":data["user_id"],"name":data["owner_name"]},is_stub=True)
+    def _resolve_org(self, data):
+        return Organization.get_or_construct({"id":data["org_id"],"name":data.get("org_name")})
+
+    def _resolve_person(self, data):
+        person_data = {"id":data["person_id"],"name":data.get("person_name")}
+        if self.org:
+            person_data["org_id"] = self.org.data
+        return Person.get_or_construct(person_data,is_stub=True)
+
+    def _resolve_owner(self, data):
+        return User.get_or_construct({"id":data["user_id"],"name":data.get("owner_name")},is_stub=True)
+
+    org = Relationship("org_id", _resolve_org)
+    person = Relationship("person_id", _resolve_person)
+    owner = Relationship("user_id", _resolve_owner)
 
     def repr(self):
         return "(" + str(self.id)  + "," + str(self.subject) + ")"
 
 
+def make_session(pool_connections=10, pool_maxsize=10, pool_block=False, keep_alive=True):
+    """
+    Build a connection-pooled requests session suitable for passing to one or more Clients.
+    :param pool_connections: number of per-host connection pools to keep
+    :param pool_maxsize: max connections kept alive per host
+    :param pool_block: if True, block when a host's pool is exhausted rather than opening extra connections (per-host limit)
+    :param keep_alive: set to False to close the connection after each request
+    :return: requests.Session
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, pool_block=pool_block)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    if not keep_alive:
+        session.headers["Connection"] = "close"
+    return session
+
+
+def json_decoder(name=None):
+    """
+    :param name: "orjson", "json", a function decoding bytes, or None for orjson if it's installed (else json)
+    :return: the function parse_response decodes response bodies with
+    """
+    if callable(name):
+        return name
+    if name == "orjson" or (name is None and orjson is not None):
+        if orjson is None:
+            raise Exception("orjson is not installed, pip install orjson or use json_decoder='json'")
+        return orjson.loads
+    if name in (None, "json"):
+        return json.loads
+    raise Exception("Unknown json decoder " + str(name) + ", expected 'orjson', 'json' or a function")
+
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+
+
+class _JsonStream:
+    """
+    Reads json values one at a time from an iterable of byte chunks, reading more only when the buffer runs out
+    """
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._decoder = json.JSONDecoder()
+        self._text = codecs.getincrementaldecoder("utf-8")()
+        self.buf = ""
+        self.pos = 0
+        self.exhausted = False
+
+    def _read(self):
+        for chunk in self._chunks:
+            if chunk:
+                self.buf = self.buf[self.pos:] + self._text.decode(chunk)
+                self.pos = 0
+                return
+        self.buf += self._text.decode(b"", final=True)
+        self.exhausted = True
+
+    def peek(self):
+        """
+        :return: the next non whitespace character, without consuming it
+        """
+        while True:
+            self.pos = _WHITESPACE.match(self.buf, self.pos).end()
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if self.exhausted:
+                raise ValueError("Unexpected end of json")
+            self._read()
+
+    def take(self, expected):
+        c = self.peek()
+        if c not in expected:
+            raise ValueError("Expected one of '{0}' but got '{1}' in json".format(expected, c))
+        self.pos += 1
+        return c
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self.exhausted:
+                    raise
+            else:
+                if end < len(self.buf) or self.exhausted: # A number at the end of the buffer might continue
+                    self.pos = end
+                    return value
+            self._read()
+
+
+def _page_events(stream):
+    """
+    Parse a response object, yielding ("item", record) for each element of its data list as soon as it's read
+    and ("key", (key, value)) for the other keys (and data, if it isn't a list)
+    """
+    stream.take("{")
+    if stream.peek() == "}":
+        return
+    while True:
+        key = stream.value()
+        stream.take(":")
+        if key == "data" and stream.peek() == "[":
+            stream.take("[")
+            if stream.peek() == "]":
+                stream.take("]")
+            else:
+                while True:
+                    yield "item", stream.value()
+                    if stream.take(",]") == "]":
+                        break
+            yield "key", ("data", None)
+        else:
+            yield "key", (key, stream.value())
+        if stream.take(",}") == "}":
+            return
+
+
+class StreamedPage(Mapping):
+    """
+    A page response decoded while it's downloaded (see Client incremental_parsing): iterating page["data"] yields
+    each record as soon as it's decoded, so only one record is held rather than the whole page.
+    The other keys (e.g. additional_data, which comes after data) are read on first access, keeping any records
+    not iterated yet.
+    """
+
+    def __init__(self, chunks, close=None):
+        self._events = _page_events(_JsonStream(chunks))
+        self._close = close
+        self._values = {}
+        self._pending = deque() # Records read ahead to reach a later key
+        self._data = None
+        self._data_done = False
+        self._done = False
+
+    def _next(self):
+        """
+        :return: the next event, or None when the response is all read
+        """
+        if self._done:
+            return None
+        try:
+            return next(self._events)
+        except StopIteration:
+            self.close()
+            return None
+
+    def close(self):
+        """
+        Release the response (and its pooled connection), e.g. when the rest of the page isn't needed.
+        Called once it's all read.
+        """
+        self._done = True
+        close, self._close = self._close, None
+        if close is not None:
+            close()
+
+    def _read_ahead(self):
+        """
+        Read the next event, queueing records for data
+        :return: False once the response is all read
+        """
+        event = self._next()
+        if event is None:
+            return False
+        kind, value = event
+        if kind == "item":
+            self._pending.append(value)
+        elif value[0] == "data":
+            self._data_done = True
+            if isinstance(value[1], dict): # A single entity
+                self._pending.append(value[1])
+        else:
+            self._values[value[0]] = value[1]
+        return True
+
+    def _iter_data(self):
+        while True:
+            if self._pending:
+                yield self._pending.popleft()
+            elif self._data_done or not self._read_ahead():
+                return
+
+    def __getitem__(self, key):
+        if key == "data":
+            if self._data is None:
+                self._data = self._iter_data()
+            return self._data
+        while key not in self._values:
+            if not self._read_ahead():
+                raise KeyError(key)
+        return self._values[key]
+
+    def __iter__(self):
+        while self._read_ahead():
+            pass
+        return iter(["data"] + list(self._values))
+
+    def __len__(self):
+        return len(list(iter(self)))
+
+
+class BulkResult:
+    """
+    Per id outcome of a bulk operation.  succeeded maps id -> the returned entity (or True for deletes),
+    failed maps id -> the exception raised for it.
+    """
+
+    def __init__(self):
+        self.succeeded = {}
+        self.failed = {}
+
+    @property
+    def ok(self):
+        return not self.failed
+
+    def __str__(self):
+        return "BulkResult({} succeeded, {} failed)".format(len(self.succeeded), len(self.failed))
+
+
+class CustomFieldsCache:
+    """
+    Keeps each entity class's custom field definitions between runs, in a json file per class and account
+    in directory.  A file older than ttl seconds, or written with a different version, is fetched again.
+    """
+
+    def __init__(self, directory=".", ttl=24 * 3600, version=None):
+        """
+        :param directory: where the files are written, None to not keep them at all
+        :param ttl: seconds a file is used for, None for no expiry
+        :param version: anything json serialisable, change it (e.g. to a deploy or schema version) to refetch
+         before the ttl is up
+        """
+        self.directory = os.path.expanduser(directory) if directory is not None else None
+        self.ttl = ttl
+        self.version = version
+
+    def path(self, entity, account):
+        """
+        :param account: the client's api_base_url, so accounts don't share definitions
+        """
+        suffix = hashlib.sha256((account or "").encode('UTF-8')).hexdigest()[:12]
+        return os.path.join(self.directory, "{0}_custom_fields_{1}.json".format(entity.__name__, suffix))
+
+    def load(self, entity, account):
+        """
+        :return: (entity's custom fields, its standard field keys), or None if there's no file or it's expired
+        """
+        if self.directory is None:
+            return None
+        try:
+            with open(self.path(entity, account), 'r', encoding='UTF-8') as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(cached, dict) or cached.get("version") != self.version:
+            return None
+        if self.ttl is not None and time.time() - cached.get("fetched", 0) > self.ttl:
+            return None
+        if "fields" not in cached or "standard_fields" not in cached: # Written before the standard fields were kept
+            return None
+        return cached["fields"], frozenset(cached["standard_fields"])
+
+    def save(self, entity, account, custom_fields, standard_fields=()):
+        if self.directory is None:
+            return
+        path = self.path(entity, account)
+        temp = "{0}.{1}.tmp".format(path, os.getpid())
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(temp, 'w', encoding='UTF-8') as f:
+                json.dump({"version": self.version, "fetched": time.time(), "fields": custom_fields,
+                           "standard_fields": sorted(standard_fields)}, f, ensure_ascii=False)
+            os.replace(temp, path) # Whole, for other processes reading it
+        except OSError as e:
+            log.warning("Couldn't write the %s custom fields to %s: %s", entity.__name__, path, e)
+
+
 class Client:
     flow_base_url = "https://oauth.pipedrive.com/oauth/"
     oauth_end = "authorize?"
     token_end = "token"
     api_version = "v1/"
-    header = {"Accept": "application/json, */*", "content-type": "application/json"}
+    header = {"Accept": "application/json, */*", "content-type": "application/json"} # Copied per instance
+
+    _custom_fields_lock = threading.RLock()
 
     _fields = ("client_id", "client_secret", "oauth", "api_base_url", "token")
 
-    def __init__(self, api_base_url=None, client_id=None, client_secret=None, oauth=False):
+    def __init__(self, api_base_url=None, client_id=None, client_secret=None, oauth=False, session=None,
+                 pool_connections=10, pool_maxsize=10, pool_block=False, keep_alive=True, page_workers=1,
+                 rate_limiter=None, max_retries=3, decoder=None, incremental_parsing=False, response_cache=None,
+                 custom_fields_cache=None):
+        """
+        :param session: an existing requests.Session (e.g. from make_session or another Client's .session)
+         to share one connection pool between several Clients.  If None, a new pooled session is created
+         using the pool_* and keep_alive arguments (see make_session)
+        :param page_workers: default number of pages fetched concurrently by paginated calls (1 is serial).
+         Can be overridden per call, e.g. get_persons(limit=200000, page_workers=8)
+        :param rate_limiter: a RateLimiter used to pace requests per API token (see pipedrive.ratelimit),
+         share one between Clients (or give it a path to share it between processes) to share the budget
+        :param max_retries: how many times a request that got a 429 is retried after waiting for Retry-After
+        :param decoder: json decoder for responses, "orjson", "json" or a function (see json_decoder).
+         Defaults to orjson if it's installed
+        :param incremental_parsing: stream the pages of paginated calls (fetched serially), constructing each entity
+         as soon as it's decoded instead of decoding the whole page first (see StreamedPage)
+        :param response_cache: a ResponseCache (see pipedrive.response_cache) for GETs of slow changing endpoints
+         like stages, pipelines and users.  Writes through this client invalidate the same resource
+        :param custom_fields_cache: a CustomFieldsCache for where (and how long) the custom field definitions are
+         kept between runs, defaults to a day in the working directory
+        """
         self.client_id = client_id
         self.client_secret = client_secret
         self.oauth = oauth
         self.api_base_url = api_base_url
         self.token = None
+        self.header = dict(Client.header) # The Authorization header is per client
+        self.listeners = [] # RequestListeners, see add_listener
+        self.json_loads = json_decoder(decoder)
+        self.incremental_parsing = incremental_parsing
+        self.response_cache = response_cache
+        self.custom_fields_cache = custom_fields_cache if custom_fields_cache is not None else CustomFieldsCache()
+        self.page_workers = page_workers
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self._init_session(session, pool_connections, pool_maxsize, pool_block, keep_alive)
         if not api_base_url:
             self._load_settings()
 
+    def _init_session(self, session, pool_connections, pool_maxsize, pool_block, keep_alive):
+        if session is None:
+            session = make_session(pool_connections, pool_maxsize, pool_block, keep_alive)
+        self.session = session
+
+    def close(self):
+        """
+        Close the underlying session and its pooled connections.  Don't call this on a shared session still in use.
+        """
+        self.session.close()
+
+    def add_listener(self, listener):
+        """
+        Report every request and entity construction to listener, a RequestListener (see pipedrive.metrics,
+        e.g. PrometheusListener or SpanListener).  Without listeners nothing is timed.
+        """
+        self.listeners = self.listeners + [listener] # Copied, so requests in flight can iterate the old list
+        return listener
+
+    def remove_listener(self, listener):
+        self.listeners = [l for l in self.listeners if l is not listener]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
     def _load_settings(self):
         data = json.load(open("pipedrive_settings.json", 'r'))
         for field in self._fields:
             if field in data:
                 self.__setattr__(field,data[field])
 
-    def _set_custom_fields(self):
+    def load_custom_fields(self, *entities):
+        """
+        Load the custom fields of entities (default all the EntityWithCustomFields classes) that aren't loaded yet,
+        from the custom_fields_cache if it's fresh, otherwise fetched concurrently.  Each class loads its own
+        on first use, this prefetches several at once.
+        """
+        entities = entities or EntityWithCustomFields.__subclasses__()
+        with Client._custom_fields_lock:
+            missing = [e for e in entities if "custom_fields" not in e.__dict__ and not self._load_custom_fields_file(e)]
+            self._fetch_custom_fields(missing)
+
+    def reload_custom_fields(self, *entities):
+        """
+        Fetch the custom fields of entities (default all the EntityWithCustomFields classes) again, e.g. after
+        adding one, and clear their caches
+        """
+        entities = entities or EntityWithCustomFields.__subclasses__()
+        with Client._custom_fields_lock:
+            self._invalidate_custom_fields(entities)
+            self._fetch_custom_fields(entities)
+        for entity in entities:
+            entity.clear_cache()
+
+    def _invalidate_custom_fields(self, entities):
         """
-        Initialise the custom field data for all entities to allow attribute based access
+        Drop the response_cache's field responses of entities, so a reload gets the current ones
+        """
+        if self.response_cache is not None:
+            for entity in entities:
+                self.response_cache.invalidate(entity.__name__.lower() + "Fields")
+
+    def _fetch_custom_fields(self, entities):
+        if len(entities) == 1:
+            self._store_custom_fields(entities[0], self.get_entity_fields(entities[0]))
+            return
+        results = self._fan_out(self.get_entity_fields, entities, len(entities))
+        errors = [result for result in results.values() if isinstance(result, Exception)]
+        for entity, result in results.items():
+            if not isinstance(result, Exception):
+                self._store_custom_fields(entity, result)
+        if errors:
+            raise errors[0]
+
+    def _load_custom_fields_file(self, entity):
+        """
+        :return: True if the custom fields for entity were loaded from the custom_fields_cache
+        """
+        cached = self.custom_fields_cache.load(entity, self.api_base_url)
+        if cached is None:
+            return False
+        entity.custom_fields, entity.standard_fields = cached
+        log.info("Loaded %s custom fields for %s from the cache", len(entity.custom_fields), entity.__name__)
+        return True
+
+    def _store_custom_fields(self, entity, fields_json):
+        """
+        Set entity.custom_fields (and standard_fields) from the json returned by get_entity_fields and save them in
+        the custom_fields_cache
         """
-        print("Loading custom fields (from json cache files if possible)")
         regex = re.compile('[^0-9a-zA-Z]+')
-        for entity in  EntityWithCustomFields.__subclasses__():
-            file_name = entity.__name__ + "_custom_fields.json"
+        custom_fields = {}
+        standard_fields = set()
+        for field in fields_json["data"]:
             try:
-                f = open(file_name, 'r')
-                entity.custom_fields = json.load(f)
-                continue
-            except:
-                custom_fields = {}
-                for field in self.get_entity_fields(entity)["data"]:
-                    try:
-                        int(field["key"],16) # test if it's hex
-                        name=field["name"]
-                        key=field["key"]
-                        field_attr = regex.sub('_', name).lower()
-                        custom_fields[field_attr] = {"key":key}
-                        if "options" in field:
-                            fields = {None:""}
-                            for option in field["options"]:
-                                fields[str(option["id"])] = option["label"]
-                            custom_fields[field_attr]["fields"] = fields
-                    except ValueError:
-                        pass
-                entity.custom_fields = custom_fields
-                entity._by_id = dict()
-                print("Set {} custom fields for {}.  Remove the json cache file ({}) to force reload next time."
-                      .format(len(custom_fields),entity.__name__,file_name))
-                with open(file_name, 'w') as f:
-                    json.dump(custom_fields, f, ensure_ascii=False)
-
-    def as_entity(self, entity, json):
-        entities = self.as_entities(entity, json)
+                int(field["key"],16) # test if it's hex
+                name=field["name"]
+                key=field["key"]
+                field_attr = regex.sub('_', name).lower()
+                custom_fields[field_attr] = {"key":key}
+                if "options" in field:
+                    fields = {None:""}
+                    for option in field["options"]:
+                        fields[str(option["id"])] = option["label"]
+                    custom_fields[field_attr]["fields"] = fields
+            except ValueError:
+                standard_fields.add(field["key"])
+        entity.standard_fields = frozenset(standard_fields)
+        entity.custom_fields = custom_fields
+        log.info("Set %s custom fields for %s", len(custom_fields), entity.__name__)
+        self.custom_fields_cache.save(entity, self.api_base_url, custom_fields, standard_fields)
+
+    def as_entity(self, entity, json, partial=False):
+        entities = self.as_entities(entity, json, partial=partial)
         if len(entities) > 1:
             raise Exception("Expected one " + entity.__name__ + " object, but " + str(len(entities)) + " were returned.")
         if entities:
             return entities[0]
         return None
 
-    def as_entities(self, entity, json):
+    def as_entities(self, entity, json, cache=True, partial=False):
+        if not json["data"]:
+            return {}
+        return list(self._iter_entities(entity, json, cache, partial))
+
+    def _iter_entities(self, entity, json, cache=True, partial=False):
+        """
+        Generator version of as_entities, constructing each entity as it's consumed (and, for a StreamedPage, decoded)
+        :param partial: the response was projected with a field selector (see _field_selector)
+        """
         data = json["data"]
         if not data:
-            return {}
+            return
         if type(data) is dict:
             data = [data] # Convert singles to a list for ease
-        return [entity.refresh_or_construct(e) for e in data]
-
-    def make_request(self, method, endpoint, data=None, json=None, **kwargs):
+        listeners = self.listeners
+        count = 0
+        seconds = 0.0
+        finished = False
+        try:
+            for e in data:
+                if listeners:
+                    started = time.perf_counter()
+                    constructed = entity.refresh_or_construct(e,cache,partial)
+                    seconds += time.perf_counter() - started
+                else:
+                    constructed = entity.refresh_or_construct(e,cache,partial)
+                count += 1
+                yield constructed
+            finished = True
+        finally:
+            if not finished and isinstance(json, StreamedPage):
+                json.close() # Stopped early, don't hold the connection until it's garbage collected
+        if Entity.store is not None:
+            Entity.store.flush() # One transaction per page
+        for listener in listeners:
+            listener.entities_constructed(entity, count, seconds)
+
+    def make_request(self, method, endpoint, data=None, json=None, stream=False, **kwargs):
         """
             this method do the request petition, receive the different methods (post, delete, patch, get) that the api allow
             :param method:
             :param endpoint:
             :param data:
+            :param stream: return a successful get's json as a StreamedPage, decoded as it's read
             :param kwargs:
             :return:
         """
+        url = self._request_url(endpoint)
+        key, cached, headers = self._cache_lookup(method, endpoint, url, kwargs, stream)
+        if cached is not None:
+            return self.parse_response(cached)
+        event = RequestEvent(method, endpoint) if self.listeners else None
+        bucket = self._rate_limit_bucket()
+        attempt = 0
+        while True:
+            if bucket:
+                wait = bucket.reserve()
+                if wait:
+                    time.sleep(wait)
+                    if event:
+                        event.wait_seconds += wait
+            sent = time.perf_counter() if event else None
+            if method == "get":
+                response = self.session.request(method, url, headers=headers, params=kwargs, stream=stream)
+            else:
+                response = self.session.request(method, url, headers=headers, data=data, json=json, params=kwargs)
+            if event:
+                event.network_seconds += time.perf_counter() - sent
+            delay = self._retry_delay(bucket, response, attempt)
+            if delay is None:
+                break
+            response.close() # Not read, so a streamed one would otherwise keep its connection
+            attempt += 1
+            if event:
+                event.retries += 1
+            if not bucket:
+                time.sleep(delay)
+                if event:
+                    event.wait_seconds += delay
+        response = self._cache_store(method, endpoint, key, response)
+        if self._revalidation_lost(response, event):
+            return self.make_request(method, endpoint, data=data, json=json, stream=stream, **kwargs)
+        if Entity.fields_loader is None:
+            self._ensure_custom_fields()
+        if stream and response.status_code == 200:
+            if event:
+                event.record_response(response, streamed=True)
+                self._request_finished(event)
+            return StreamedPage(response.iter_content(65536), response.close)
+        return self._parse_response(response, event)
+
+    def _cache_lookup(self, method, endpoint, url, params, stream=False):
+        """
+        :return: (the response cache key or None if not caching, the cached response if it's fresh,
+         the headers to request with, conditional if revalidating)
+        """
+        cache = self.response_cache
+        if cache is None or method != "get" or stream or cache.ttl(endpoint) <= 0:
+            return None, None, self.header
+        key = cache.key(url, params, self.header)
+        cached, conditional = cache.lookup(endpoint, key)
+        return key, cached, (dict(self.header, **conditional) if conditional else self.header)
+
+    def _cache_store(self, method, endpoint, key, response):
+        """
+        Cache a GET's response (returning the cached one for a 304), or invalidate the resource a write changed
+        """
+        if key is not None:
+            return self.response_cache.store(endpoint, key, response)
+        if self.response_cache is not None and method != "get":
+            self.response_cache.invalidate(endpoint)
+        return response
+
+    def _revalidation_lost(self, response, event):
+        """
+        :return: True if response is a 304 whose cached response went while revalidating it (see ResponseCache.store),
+         so there's nothing to parse and the request has to be made again
+        """
+        if response.status_code != 304:
+            return False
+        log.debug("%s was revalidated after its cached response went, requesting it again", response.url)
+        if event:
+            event.record_response(response)
+            self._request_finished(event)
+        return True
+
+    def _request_finished(self, event):
+        event.end_time = time.time()
+        for listener in self.listeners:
+            listener.request_finished(event)
+
+    def _parse_response(self, response, event):
+        """
+        parse_response, timed and reported to the listeners if there's an event
+        """
+        if event is None:
+            return self.parse_response(response)
+        event.record_response(response)
+        started = time.perf_counter()
+        try:
+            return self.parse_response(response)
+        except Exception as e:
+            event.error = e
+            raise
+        finally:
+            event.decode_seconds = time.perf_counter() - started
+            self._request_finished(event)
+
+    def _ensure_custom_fields(self):
+        """
+        Make this client the one that loads each entity class's custom fields when first needed
+        """
+        if Entity.fields_loader is None:
+            Entity.fields_loader = self
+        Entity.initialised = True
+
+    def _rate_limit_bucket(self):
+        if self.rate_limiter and self.token:
+            return self.rate_limiter.for_token(self.token)
+        return None
+
+    def _retry_delay(self, bucket, response, attempt):
+        """
+        Feed the response's rate limit headers to the bucket and decide if a 429 should be retried.
+        :return: seconds to wait before retrying (the bucket is already paused for that long), or None to not retry
+        """
+        if bucket:
+            bucket.observe(response.headers)
+        if response.status_code != 429 or attempt >= self.max_retries:
+            return None
+        delay = retry_after(response.headers, default=2.0 ** attempt)
+        log.warning("%s returned 429, retrying in %.1f seconds (attempt %s of %s)",
+                    response.url, delay, attempt + 1, self.max_retries)
+        if bucket:
+            bucket.pause(delay)
+        return delay
+
+    def _request_url(self, endpoint):
+        """
+        Build the full url for an API endpoint, adding the token as a header (oauth) or query parameter
+        """
         if self.token:
             if self.oauth:
                 self.header["Authorization"] = "Bearer " + self.token
-                url = '{0}{1}{2}'.format(self.api_base_url, self.api_version, endpoint)
-            else:
-                url = '{0}{1}{2}?api_token={3}'.format(self.api_base_url, self.api_version, endpoint, self.token)
-            if method == "get":
-                response = requests.request(method, url, headers=self.header, params=kwargs)
+                return '{0}{1}{2}'.format(self.api_base_url, self.api_version, endpoint)
             else:
-                response = requests.request(method, url, headers=self.header, data=data, json=json)
-            if not Entity.initialised:
-                Entity.initialised = True # Must be set first to stop a infinite loop
-                self._set_custom_fields()
-            return self.parse_response(response)
+                return '{0}{1}{2}?api_token={3}'.format(self.api_base_url, self.api_version, endpoint, self.token)
         else:
             raise Exception("To make petitions the token is necessary")
 
@@ -528,7 +2020,7 @@ class Client:
             raise Exception(
                 "The URL {0} retrieved an {1} error. Please check the URL and try again.\nRaw message: {2}".format(
                     response.url, response.status_code, response.text))
-        return response.json()
+        return self.json_loads(response.content)
 
     def get_oauth_uri(self, redirect_uri, state=None):
         if redirect_uri is not None:
@@ -551,7 +2043,7 @@ class Client:
             authorization = '{0}:{1}'.format(self.client_id, self.client_secret)
             header = {'Authorization': 'Basic {0}'.format(b64encode(authorization.encode('UTF-8')).decode('UTF-8'))}
             args = {'grant_type': 'authorization_code', 'code': code, 'redirect_uri': redirect_uri}
-            response = requests.post(url, headers=header, data=args)
+            response = self.session.post(url, headers=header, data=args)
             return self.parse_response(response)
         else:
             raise Exception("The attributes necessary to exchange the code were not obtained.")
@@ -565,7 +2057,7 @@ class Client:
                 'grant_type': "refresh_token",
                 'refresh_token': refresh_token,
             }
-            response = requests.post(url, data=data)
+            response = self.session.post(url, data=data)
             return self.parse_response(response)
         else:
             raise Exception("The attributes necessary to refresh the token were not obtained.")
@@ -604,19 +2096,113 @@ class Client:
             params.update(kwargs)
             return self._post(endpoint, json=params)
 
-    def _get_with_pagination(self, url, entity, **kwargs):
+    def _get_with_pagination(self, url, entity, fields=None, **kwargs):
+        """
+        :param fields: only fetch these fields, see _field_selector
+        """
         entities = []
+        url += self._field_selector(entity, fields)
+        for result in self._iter_pages(url, entity, **kwargs):
+            entities.extend(self.as_entities(entity, result, partial=fields is not None))
+        return entities
+
+    def _iter_with_pagination(self, url, entity, pages=False, cache=True, fields=None, **kwargs):
+        """
+        Generator version of _get_with_pagination, yielding entities as each page is parsed.
+        :param pages: yield a list of entities per page instead of single entities
+        :param cache: set to False to not keep the entities in the cache (or in their related entities' lists),
+         so memory stays constant however many are streamed.  Already cached entities are still refreshed.
+        :param fields: only fetch these fields, see _field_selector
+        """
+        url += self._field_selector(entity, fields)
+        for result in self._iter_pages(url, entity, **kwargs):
+            if pages:
+                yield self.as_entities(entity, result, cache, fields is not None)
+            else:
+                yield from self._iter_entities(entity, result, cache, fields is not None)
+
+    def _field_selector(self, entity, fields):
+        """
+        Pipedrive's field selector for the end of a url, e.g. persons:(id,name,5f3c...), so responses only carry those
+        fields.  The entities constructed from them are partial (see Entity.loaded_fields).
+        :param fields: data keys or custom field names (translated to their keys), id is always included
+        :return: "" if fields is None
+        """
+        if fields is None:
+            return ""
+        keys = ["id"]
+        custom_fields = self._entity_custom_fields(entity)
+        for name in fields:
+            key = custom_fields[name]["key"] if name in custom_fields else name
+            if key not in keys:
+                keys.append(key)
+        return ":(" + ",".join(keys) + ")"
+
+    def _entity_custom_fields(self, entity):
+        """
+        entity's custom fields, loaded now if need be, as a selector can be built before the first request
+        """
+        if issubclass(entity, EntityWithCustomFields):
+            if "custom_fields" not in entity.__dict__:
+                self.load_custom_fields(entity)
+            if entity.standard_fields is None: # Loaded from an EntityStore, which only keeps the custom fields
+                with Client._custom_fields_lock:
+                    if entity.standard_fields is None:
+                        self._fetch_custom_fields([entity])
+        return entity.custom_fields
+
+    def refresh(self, entity):
+        """
+        Fetch entity again, all of its fields
+        """
+        return self.as_entity(entity.__class__, self._get(self._entity_url(entity)))
+
+    def _iter_pages(self, url, entity, page_workers=None, **kwargs):
+        """
+        Yield the raw json of each page, following start/next_start until the limit keyword is reached or
+        there are no more items.
+        :param page_workers: fetch this many pages concurrently once the first page gives the page size
+         (defaults to self.page_workers).  Pages are still yielded in offset order.
+        """
+        if page_workers is None:
+            page_workers = self.page_workers
         while True:
-            result = self._get(url, **kwargs)
-            entities.extend(self.as_entities(entity, result))
-            pagination = result["additional_data"]["pagination"]
+            result = self._get(url, stream=self.incremental_parsing, **kwargs)
+            try:
+                yield result
+                pagination = result["additional_data"]["pagination"]
+            finally:
+                if isinstance(result, StreamedPage):
+                    result.close() # Already all read, unless the caller stopped early
             if pagination["more_items_in_collection"]:
                 if "limit" in kwargs and kwargs["limit"] > pagination["next_start"]:
+                    if page_workers > 1:
+                        yield from self._iter_pages_parallel(url, entity, pagination, page_workers, **kwargs)
+                        break
                     kwargs["start"] = pagination["next_start"]
-                    print("Making another API hit for ", entity.__name__, ", starting at ", kwargs["start"])
+                    log.debug("Making another API hit for %s, starting at %s", entity.__name__, kwargs["start"])
                     continue
             break
-        return entities
+
+    def _iter_pages_parallel(self, url, entity, pagination, page_workers, **kwargs):
+        """
+        Fetch the remaining offset windows after the first page, page_workers at a time.
+        Each batch is yielded in offset order and fetching stops at the first page reporting no more items.
+        """
+        page_size = max(pagination.get("limit") or pagination["next_start"] - pagination.get("start", 0), 1)
+        limit = kwargs["limit"]
+        start = pagination["next_start"]
+        with ThreadPoolExecutor(max_workers=page_workers) as executor:
+            while start < limit:
+                starts = range(start, limit, page_size)[:page_workers]
+                log.debug("Making %s parallel API hits for %s, starting at %s", len(starts), entity.__name__, start)
+                futures = [executor.submit(self._get, url, **dict(kwargs, start=s)) for s in starts]
+                for future in futures:
+                    result = future.result()
+                    yield result
+                    if not result["additional_data"]["pagination"]["more_items_in_collection"]:
+                        return
+                start = starts[-1] + page_size
 
     def get_stages(self, **kwargs):
         """
@@ -641,14 +2227,27 @@ class Client:
         url = "pipelines/{0}/deals".format(pipeline_id)
         return self._get_with_pagination(url, Deal, **kwargs)
 
+    def iter_pipeline_deals(self, pipeline_id, pages=False, cache=True, **kwargs):
+        url = "pipelines/{0}/deals".format(pipeline_id)
+        return self._iter_with_pagination(url, Deal, pages, cache, **kwargs)
+
     # Deals section, see the api documentation: https://developers.pipedrive.com/docs/api/v1/#!/Deals
-    def get_deals(self, deal_id=None, **kwargs):
+    def get_deals(self, deal_id=None, fields=None, **kwargs):
+        """
+        :param fields: only fetch these fields (data keys or custom field names), the deals are partial
+        """
         if deal_id is not None:
-            url = "deals/{0}".format(deal_id)
-            return self.as_entity(Deal, self._get(url))
+            url = "deals/{0}".format(deal_id) + self._field_selector(Deal, fields)
+            return self.as_entity(Deal, self._get(url), partial=fields is not None)
         else:
             url = "deals"
-        return self._get_with_pagination(url, Deal, **kwargs)
+        return self._get_with_pagination(url, Deal, fields, **kwargs)
+
+    def iter_deals(self, pages=False, cache=True, **kwargs):
+        """
+        Generator version of get_deals, see _iter_with_pagination for pages and cache
+        """
+        return self._iter_with_pagination("deals", Deal, pages, cache, **kwargs)
 
     def create_deal(self, **kwargs):
         url = "deals"
@@ -735,6 +2334,9 @@ class Client:
             url = "notes"
             return self._get_with_pagination(url, Note, **kwargs)
 
+    def iter_notes(self, pages=False, cache=True, **kwargs):
+        return self._iter_with_pagination("notes", Note, pages, cache, **kwargs)
+
     def create_note(self, **kwargs):
         if kwargs is not None:
             url = "notes"
@@ -755,33 +2357,44 @@ class Client:
             return self._delete(url)
 
     # Organizations section, see the api documentation: https://developers.pipedrive.com/docs/api/v1/#!/Organizations
-    def get_organizations(self, org_id=None, **kwargs):
+    def get_organizations(self, org_id=None, fields=None, **kwargs):
         """
         Returns either a single Organisation (if id specified), or a list otherwise.
         if the limit keyword is passed in, this will make multiple hits
         (collecting 500 per hit) until the limit is reached or all entities are retrieved
         :param org_id:
+        :param fields: only fetch these fields (data keys or custom field names), the organizations are partial
         :param kwargs:
         :return:
         """
         if org_id is not None:
-            url = "organizations/{0}".format(org_id)
-            return self.as_entity(Organization, self._get(url, **kwargs))
+            url = "organizations/{0}".format(org_id) + self._field_selector(Organization, fields)
+            return self.as_entity(Organization, self._get(url, **kwargs), partial=fields is not None)
         else:
             url = "organizations"
-            return self._get_with_pagination(url, Organization, **kwargs)
+            return self._get_with_pagination(url, Organization, fields, **kwargs)
+
+    def iter_organizations(self, pages=False, cache=True, **kwargs):
+        return self._iter_with_pagination("organizations", Organization, pages, cache, **kwargs)
 
 
     def save_changes(self, entity):
-        url = entity.__class__.__name__.lower() + "s/{0}".format(entity.id)
+        url = self._entity_url(entity)
+        params = self._changes(entity)
+        log.debug("Saving %s changes %s", entity, params)
+        return self.as_entity(entity.__class__,self._put(url,json=params))
+
+    def _entity_url(self, entity):
+        return entity.__class__.__name__.lower() + "s/{0}".format(entity.id)
+
+    def _changes(self, entity):
         params={}
         for field in entity.modified_fields:
             value = entity.data[field]
             if value == 'null':
                 value = None
             params[field] = value
-        print(params)
-        return self.as_entity(entity.__class__,self._put(url,json=params))
+        return params
 
     def create_organization(self, **kwargs):
         if kwargs is not None:
@@ -807,13 +2420,23 @@ class Client:
         return self._get(url)
 
     # Persons section, see the api documentation: https://developers.pipedrive.com/docs/api/v1/#!/Persons
-    def get_persons(self, person_id=None, **kwargs):
+    def get_persons(self, person_id=None, fields=None, **kwargs):
+        """
+        :param fields: only fetch these fields (data keys or custom field names), the persons are partial,
+         e.g. get_persons(limit=100000, fields=["name", "email", "lead_source"])
+        """
         if person_id is not None:
-            url = "persons/{0}".format(person_id)
-            return self.as_entity(Person, self._get(url, **kwargs))
+            url = "persons/{0}".format(person_id) + self._field_selector(Person, fields)
+            return self.as_entity(Person, self._get(url, **kwargs), partial=fields is not None)
         else:
             url = "persons"
-            return self._get_with_pagination(url, Person, **kwargs)
+            return self._get_with_pagination(url, Person, fields, **kwargs)
+
+    def iter_persons(self, pages=False, cache=True, **kwargs):
+        """
+        Generator version of get_persons, e.g. for person in client.iter_persons(limit=1000000, cache=False)
+        """
+        return self._iter_with_pagination("persons", Person, pages, cache, **kwargs)
 
 
     def get_persons_by_name(self, **kwargs):
@@ -940,3 +2563,183 @@ class Client:
         else:
             url = "users"
             return self.as_entities(User,self._get(url, **kwargs))
+
+    # Bulk section, uses the comma separated ids endpoints where Pipedrive has them, otherwise concurrent single calls
+    def _fan_out(self, call, args, workers):
+        """
+        Run call(arg) for each arg on up to workers threads
+        :return: dict arg -> result, or the exception it raised
+        """
+        results = {}
+        with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+            futures = {arg: executor.submit(call, arg) for arg in args}
+            for arg, future in futures.items():
+                try:
+                    results[arg] = future.result()
+                except Exception as e:
+                    results[arg] = e
+        return results
+
+    def _bulk_delete(self, endpoint, entity, ids, bulk, chunk_size, workers):
+        """
+        Delete ids in chunks through endpoint?ids=1,2,3 (bulk) or one DELETE endpoint/id each,
+        then evict the deleted ids from the entity cache in one go
+        """
+        call, chunks = self._bulk_delete_calls(endpoint, ids, bulk, chunk_size)
+        return self._bulk_delete_result(entity, self._fan_out(call, chunks, workers))
+
+    def _bulk_delete_calls(self, endpoint, ids, bulk, chunk_size):
+        ids = list(dict.fromkeys(ids))
+        if bulk:
+            chunks = [tuple(ids[i:i + chunk_size]) for i in range(0, len(ids), chunk_size)]
+            return (lambda chunk: self._delete(endpoint, ids=",".join(str(i) for i in chunk))), chunks
+        return (lambda chunk: self._delete("{0}/{1}".format(endpoint, chunk[0]))), [(i,) for i in ids]
+
+    def _bulk_delete_result(self, entity, outcomes):
+        result = BulkResult()
+        for chunk, outcome in outcomes.items():
+            for theId in chunk:
+                if isinstance(outcome, Exception):
+                    result.failed[theId] = outcome
+                else:
+                    result.succeeded[theId] = True
+        entity.purge(*result.succeeded)
+        return result
+
+    def _bulk_update(self, endpoint, entity, updates, workers):
+        """
+        PUT each id's fields concurrently (Pipedrive has no bulk update), constructing the returned entities afterwards
+        :param updates: dict id -> dict of fields
+        """
+        outcomes = self._fan_out(lambda theId: self._put("{0}/{1}".format(endpoint, theId), json=updates[theId]),
+                                 list(updates), workers)
+        return self._bulk_update_result(outcomes, lambda theId: entity)
+
+    def _bulk_update_result(self, outcomes, entity_class):
+        result = BulkResult()
+        for key, outcome in outcomes.items():
+            if isinstance(outcome, Exception):
+                result.failed[key] = outcome
+            else:
+                result.succeeded[key] = self.as_entity(entity_class(key), outcome)
+        return result
+
+    def delete_deals(self, ids, chunk_size=100, workers=4):
+        """
+        Delete many deals with the bulk endpoint, chunk_size ids per request
+        :return: BulkResult
+        """
+        return self._bulk_delete("deals", Deal, ids, True, chunk_size, workers)
+
+    def delete_persons(self, ids, chunk_size=100, workers=4):
+        return self._bulk_delete("persons", Person, ids, True, chunk_size, workers)
+
+    def delete_organizations(self, ids, chunk_size=100, workers=4):
+        return self._bulk_delete("organizations", Organization, ids, True, chunk_size, workers)
+
+    def delete_activities(self, ids, chunk_size=100, workers=4):
+        return self._bulk_delete("activities", Activity, ids, True, chunk_size, workers)
+
+    def delete_notes(self, ids, workers=8):
+        """
+        No bulk endpoint for notes, so these are deleted one request per id, workers at a time
+        """
+        return self._bulk_delete("notes", Note, ids, False, None, workers)
+
+    def delete_products(self, ids, workers=8):
+        return self._bulk_delete("products", Product, ids, False, None, workers)
+
+    def update_deals(self, updates, workers=8):
+        """
+        :param updates: dict deal id -> dict of fields to set, e.g. {1: {"status": "lost"}, 2: {"status": "won"}}
+        :return: BulkResult with the refreshed Deals
+        """
+        return self._bulk_update("deals", Deal, updates, workers)
+
+    def update_persons(self, updates, workers=8):
+        return self._bulk_update("persons", Person, updates, workers)
+
+    def update_organizations(self, updates, workers=8):
+        return self._bulk_update("organizations", Organization, updates, workers)
+
+    def update_activities(self, updates, workers=8):
+        return self._bulk_update("activities", Activity, updates, workers)
+
+    paged_classes = {"Person": "persons", "Organization": "organizations", "Deal": "deals"} # For hydrate's list_above
+
+    @staticmethod
+    def _reachable_stubs(entities, relationships=None):
+        """
+        :return: the distinct stubs related to entities, through the named relationships (default all)
+        """
+        if isinstance(entities, type):
+            with entities.getCache().lock:
+                entities = list(entities.getCache().values())
+        stubs = {} # Ordered set
+        for entity in entities:
+            for relationship in entity._relationships():
+                if relationships is not None and relationship.name not in relationships:
+                    continue
+                if entity.loaded_fields is not None and relationship.key not in entity.data:
+                    continue # Don't fetch a partial entity just to find its stubs
+                related = relationship.__get__(entity)
+                if related is not None and related.stub:
+                    stubs[related] = None
+        return list(stubs)
+
+    def _hydrate_level(self, stubs, workers, list_above):
+        """
+        Fetch stubs, by listing their class's endpoint if there are more than list_above of them
+        :return: BulkResult keyed by stub
+        """
+        result = BulkResult()
+        by_class = {}
+        for stub in stubs:
+            by_class.setdefault(stub.__class__, []).append(stub)
+        singles = []
+        for cls, cls_stubs in by_class.items():
+            if list_above is not None and len(cls_stubs) > list_above and cls.__name__ in self.paged_classes:
+                self._get_with_pagination(self.paged_classes[cls.__name__], cls, limit=10 ** 9)
+                for stub in cls_stubs:
+                    if stub.stub:
+                        result.failed[stub] = Exception("{0} {1} wasn't listed".format(cls.__name__, stub.data["id"]))
+                    else:
+                        result.succeeded[stub] = stub
+            else:
+                singles.extend(cls_stubs)
+        outcomes = self._fan_out(lambda stub: self._get(self._entity_url(stub)), singles, workers)
+        fetched = self._bulk_update_result(outcomes, lambda stub: stub.__class__)
+        result.succeeded.update(fetched.succeeded)
+        result.failed.update(fetched.failed)
+        return result
+
+    def hydrate(self, entities, relationships=None, workers=8, depth=1, list_above=None):
+        """
+        Fetch the whole of the stubs related to entities (e.g. the org, owner and creator of deals), each distinct one
+        once and workers at a time, refreshing them in place.  Pipedrive has no GET by several ids, so with list_above
+        a class with more stubs than that (of persons, organizations and deals) is listed whole instead.
+        e.g. client.hydrate(client.get_deals(limit=10000), ["org", "person"])
+        :param entities: entities, or an entity class for all its cached entities
+        :param relationships: names of the relationships to follow, default all
+        :param depth: then hydrate the stubs of the hydrated entities, this many levels in all
+        :return: BulkResult keyed by the (former) stubs
+        """
+        result = BulkResult()
+        for _ in range(depth):
+            stubs = [s for s in self._reachable_stubs(entities, relationships) if s not in result.failed]
+            if not stubs:
+                break
+            level = self._hydrate_level(stubs, workers, list_above)
+            result.succeeded.update(level.succeeded)
+            result.failed.update(level.failed)
+            entities = list(level.succeeded.values())
+        return result
+
+    def save_all_changes(self, entities, workers=8):
+        """
+        Bulk version of save_changes, the entities can be of mixed classes
+        :return: BulkResult keyed by entity
+        """
+        outcomes = self._fan_out(lambda entity: self._put(self._entity_url(entity), json=self._changes(entity)),
+                                 [e for e in entities if e.modified_fields], workers)
+        return self._bulk_update_result(outcomes, lambda entity: entity.__class__)
@@ -0,0 +1,196 @@
+from pipedrive.export import flat, resolve_columns
+
+try:
+    import numpy # Optional, pip install numpy for EntityColumns
+except ImportError:
+    numpy = None
+
+
+class EntityColumns:
+    """
+    Selected fields of a list of entities packed into NumPy arrays, read once from the entities' data (not through
+    __getattr__), so reports over 100k deals are vectorised instead of Python loops.
+    Numeric fields become float64 (NaN where missing), categorical fields integer codes into a list of their
+    categories (related entities by id, option custom fields by label), date fields datetime64[s] (NaT where missing).
+    Fields are data keys or custom field names (see export.resolve_columns).
+
+    deals = EntityColumns(client.get_deals(limit=100000), numeric=["value", "probability"],
+                          categorical=["pipeline_id", "stage_id", "user_id", "status", "currency"], dates=["rotten_time"])
+    open_deals = deals.where(deals.equals("status", "open"))
+    open_deals.group_by("stage_id").sum("value")  # {stage id: total value}
+    open_deals.group_by("pipeline_id", "currency").percentile("value", 90)
+    """
+
+    def __init__(self, entities, numeric=(), categorical=(), dates=(), entity_class=None):
+        """
+        :param entities: a list of entities of one class (e.g. from get_deals, or stage.deals)
+        :param entity_class: needed to resolve custom field names if entities can be empty
+        """
+        if numpy is None:
+            raise Exception("numpy is not installed, pip install numpy to use EntityColumns")
+        entities = list(entities)
+        entity_class = entity_class or (type(entities[0]) if entities else None)
+        self.entity_class = entity_class
+        self.ids = numpy.fromiter((e.data["id"] for e in entities), dtype=numpy.int64, count=len(entities))
+        self.arrays = {}
+        self.categories = {} # categorical field -> the values its codes index
+        columns = resolve_columns(entity_class, list(numeric) + list(categorical) + list(dates)) if entity_class else []
+        datas = [e.data for e in entities]
+        for column in columns:
+            values = [column.value(data) for data in datas]
+            if column.name in numeric:
+                self.arrays[column.name] = self._numeric(values)
+            elif column.name in categorical:
+                self.arrays[column.name], self.categories[column.name] = self._categorical(values)
+            else:
+                self.arrays[column.name] = self._dates(values)
+
+    @classmethod
+    def _from_arrays(cls, entity_class, ids, arrays, categories):
+        columns = cls.__new__(cls)
+        columns.entity_class = entity_class
+        columns.ids = ids
+        columns.arrays = arrays
+        columns.categories = categories
+        return columns
+
+    @staticmethod
+    def _numeric(values):
+        try:
+            return numpy.array(values, dtype=numpy.float64) # None -> NaN, numeric strings parsed
+        except (TypeError, ValueError):
+            array = numpy.full(len(values), numpy.nan)
+            for i, value in enumerate(values):
+                try:
+                    array[i] = float(value)
+                except (TypeError, ValueError):
+                    pass
+            return array
+
+    @staticmethod
+    def _categorical(values):
+        codes = {}
+        array = numpy.fromiter((codes.setdefault(flat(v), len(codes)) for v in values), dtype=numpy.int32,
+                               count=len(values))
+        return array, list(codes)
+
+    @staticmethod
+    def _dates(values):
+        return numpy.array([v.replace(" ", "T") if v else "NaT" for v in values], dtype="datetime64[s]")
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getitem__(self, field):
+        """
+        The array of field, codes for a categorical field
+        """
+        return self.arrays[field]
+
+    def values(self, field):
+        """
+        A categorical field's values (rather than codes), as an object array
+        """
+        categories = numpy.empty(len(self.categories[field]), dtype=object)
+        categories[:] = self.categories[field]
+        return categories[self.arrays[field]]
+
+    def equals(self, field, value):
+        """
+        :return: a mask of the rows where field is value
+        """
+        if field not in self.categories:
+            return self.arrays[field] == value
+        try:
+            return self.arrays[field] == self.categories[field].index(value)
+        except ValueError:
+            return numpy.zeros(len(self), dtype=bool)
+
+    def isin(self, field, values):
+        if field not in self.categories:
+            return numpy.isin(self.arrays[field], list(values))
+        codes = [i for i, category in enumerate(self.categories[field]) if category in values]
+        return numpy.isin(self.arrays[field], codes)
+
+    def where(self, mask):
+        """
+        :param mask: a boolean array (e.g. from equals, or deals["value"] > 1000) or indices
+        :return: EntityColumns of the selected rows, sharing the categories
+        """
+        return self._from_arrays(self.entity_class, self.ids[mask],
+                                 {field: array[mask] for field, array in self.arrays.items()}, self.categories)
+
+    def count(self):
+        return len(self)
+
+    def sum(self, field):
+        return float(numpy.nansum(self.arrays[field]))
+
+    def mean(self, field):
+        return float(numpy.nanmean(self.arrays[field])) if len(self) else numpy.nan
+
+    def percentile(self, field, q):
+        return float(numpy.nanpercentile(self.arrays[field], q)) if len(self) else numpy.nan
+
+    def group_by(self, *fields):
+        """
+        :param fields: categorical fields
+        """
+        return GroupBy(self, fields)
+
+
+class GroupBy:
+    """
+    The rows of an EntityColumns grouped by the values of categorical fields.  Each aggregate returns a dict of
+    group -> result, the group being the field's value, or a tuple of values when grouped by several fields.
+    """
+
+    def __init__(self, columns, fields):
+        if not fields:
+            raise Exception("Group by at least one categorical field")
+        self.columns = columns
+        self.fields = fields
+        combined = numpy.zeros(len(columns), dtype=numpy.int64)
+        for field in fields:
+            combined = combined * (len(columns.categories[field]) + 1) + columns.arrays[field]
+        unique, self.inverse = numpy.unique(combined, return_inverse=True)
+        self.inverse = self.inverse.reshape(-1) # Some numpy versions keep the input's shape
+        self.keys = []
+        for code in unique.tolist():
+            key = []
+            for field in reversed(fields):
+                code, field_code = divmod(code, len(columns.categories[field]) + 1)
+                key.append(columns.categories[field][field_code])
+            self.keys.append(tuple(reversed(key)) if len(fields) > 1 else key[0])
+
+    def _result(self, results):
+        return dict(zip(self.keys, results.tolist() if hasattr(results, "tolist") else results))
+
+    def count(self):
+        return self._result(numpy.bincount(self.inverse, minlength=len(self.keys)))
+
+    def sum(self, field):
+        values = self.columns.arrays[field]
+        return self._result(numpy.bincount(self.inverse, weights=numpy.nan_to_num(values), minlength=len(self.keys)))
+
+    def mean(self, field):
+        values = self.columns.arrays[field]
+        present = ~numpy.isnan(values)
+        sums = numpy.bincount(self.inverse, weights=numpy.where(present, values, 0), minlength=len(self.keys))
+        counts = numpy.bincount(self.inverse, weights=present, minlength=len(self.keys))
+        with numpy.errstate(invalid="ignore", divide="ignore"):
+            return self._result(sums / counts)
+
+    def percentile(self, field, q):
+        """
+        :param q: percentile, or a list of them (each group's result is then a list)
+        """
+        values = self.columns.arrays[field]
+        order = numpy.lexsort((values, self.inverse))
+        bounds = numpy.cumsum(numpy.bincount(self.inverse, minlength=len(self.keys)))[:-1]
+        results = []
+        for group in numpy.split(values[order], bounds):
+            group = group[~numpy.isnan(group)]
+            result = numpy.percentile(group, q) if len(group) else numpy.full(numpy.shape(q), numpy.nan)
+            results.append(result.tolist() if numpy.ndim(result) else float(result))
+        return self._result(results)
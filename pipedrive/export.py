@@ -0,0 +1,291 @@
+import bz2
+import csv
+import gzip
+import json
+import logging
+import lzma
+import os
+import time
+
+from pipedrive.client import Activity, EntityWithCustomFields
+
+try:
+    import pyarrow # Optional, pip install pyarrow to export parquet
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+log = logging.getLogger(__name__)
+
+
+class Column:
+    """
+    One exported column, resolved once: the data key it reads (a custom field's hash key for custom fields),
+    the path into nested values, and the option labels of an option custom field
+    """
+    __slots__ = ("name", "key", "path", "labels")
+
+    def __init__(self, name, key, path=(), labels=None):
+        self.name = name
+        self.key = key
+        self.path = tuple(path)
+        self.labels = labels
+
+    def value(self, data):
+        value = data.get(self.key)
+        for step in self.path:
+            if not isinstance(value, dict):
+                return None
+            value = value.get(step)
+        if self.labels is None or value is None:
+            return value
+        label = self.labels.get(str(value))
+        if label is None and isinstance(value, str) and "," in value: # A multiple options field
+            return ",".join(self.labels.get(v, v) for v in value.split(","))
+        return value if label is None else label
+
+
+def resolve_columns(entity, columns):
+    """
+    :param columns: data keys ("title"), custom field names as attributes ("lead_source") or dotted paths
+     into nested values ("org_id.name")
+    :return: a Column per name
+    """
+    custom_fields = entity.custom_fields
+    resolved = []
+    for name in columns:
+        head, _, rest = name.partition(".")
+        path = rest.split(".") if rest else ()
+        field = custom_fields.get(head)
+        if field is None:
+            resolved.append(Column(name, head, path))
+        else:
+            resolved.append(Column(name, field["key"], path, None if path else field.get("fields")))
+    return resolved
+
+
+def check_columns(entity, columns, data):
+    """
+    Raise if a column is neither a custom field nor a field of data (a record from the entity's endpoint,
+    which has every field), rather than exporting it as empty
+    """
+    unknown = [column.name for column in columns if column.key not in data]
+    if unknown:
+        raise Exception("Unknown " + entity.__name__ + " column(s) " + ", ".join(unknown) + ", expected data keys or custom "
+                        "field names: " + ", ".join(sorted(set(data) | set(entity.custom_fields))))
+
+
+def default_columns(entity, data):
+    """
+    Every field of one record (e.g. the first exported), custom fields by their attribute names
+    """
+    names_by_key = entity._custom_field_index()[1]
+    return [names_by_key.get(key, key) for key in data]
+
+
+def flat(value):
+    """
+    A value for a flat format: related entities ({"value": 5, "name": "ACME"}) as their id, other nested values as json
+    """
+    if isinstance(value, dict):
+        if "value" in value:
+            return value["value"]
+        return json.dumps(value, ensure_ascii=False)
+    if isinstance(value, list):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+class _NdjsonPart:
+    def __init__(self, path, names, opener, compression):
+        self.names = names
+        self.file = opener(path, 'wt', encoding='UTF-8')
+
+    def write(self, rows):
+        names = self.names
+        self.file.write("".join(json.dumps(dict(zip(names, row)), ensure_ascii=False) + "\n" for row in rows))
+
+    def close(self):
+        self.file.close()
+
+
+class _CsvPart:
+    def __init__(self, path, names, opener, compression):
+        self.file = opener(path, 'wt', encoding='UTF-8', newline='')
+        self.writer = csv.writer(self.file)
+        self.writer.writerow(names)
+
+    def write(self, rows):
+        self.writer.writerows([flat(v) for v in row] for row in rows)
+
+    def close(self):
+        self.file.close()
+
+
+class _ParquetPart:
+    """
+    Keeps the part's values per column and writes them at close, so each column's type is inferred from all of them
+    """
+
+    def __init__(self, path, names, opener, compression):
+        self.path = path
+        self.names = names
+        self.compression = compression or "snappy"
+        self.columns = [[] for _ in names]
+
+    def write(self, rows):
+        for column, values in zip(self.columns, zip(*rows)):
+            column.extend(flat(v) for v in values)
+
+    @staticmethod
+    def _array(values):
+        try:
+            array = pyarrow.array(values)
+        except (pyarrow.ArrowInvalid, pyarrow.ArrowTypeError): # Mixed types, e.g. numbers and text
+            return pyarrow.array([None if v is None else str(v) for v in values], pyarrow.string())
+        if array.type == pyarrow.null():
+            return array.cast(pyarrow.string())
+        return array
+
+    def close(self):
+        table = pyarrow.Table.from_arrays([self._array(c) for c in self.columns], names=self.names)
+        self.columns = None
+        pyarrow.parquet.write_table(table, self.path, compression=self.compression)
+
+
+class Exporter:
+    """
+    Streams every entity of a class from its paginated endpoint into part files of rows_per_file rows,
+    without constructing entities (so the caches don't grow).  Custom field keys and option labels are resolved
+    once per column.  Only one page (and for parquet, one part) is held in memory, whatever the account's size.
+    With a checkpoint file an interrupted export carries on from the last complete part.
+
+    exporter = Exporter(client, format="csv", compression="gzip")
+    exporter.export(Deal, "warehouse/deals", columns=["id", "title", "value", "currency", "org_id.name", "lead_source"],
+                    checkpoint="warehouse/deals.checkpoint.json")
+    """
+
+    formats = {"ndjson": (".ndjson", _NdjsonPart), "csv": (".csv", _CsvPart), "parquet": (".parquet", _ParquetPart)}
+    compressions = {None: (open, ""), "gzip": (gzip.open, ".gz"), "bz2": (bz2.open, ".bz2"), "xz": (lzma.open, ".xz")}
+    endpoints = {Activity: "activities"} # Where the endpoint isn't the lower case class name + "s"
+
+    def __init__(self, client, format="ndjson", compression=None, rows_per_file=100000):
+        """
+        :param client: the Client to page through the endpoints with (its page_workers and incremental_parsing apply)
+        :param format: "ndjson", "csv" or "parquet" (needs pyarrow)
+        :param compression: "gzip", "bz2" or "xz" for ndjson and csv, any pyarrow codec (default "snappy") for parquet
+        :param rows_per_file: rows per part file, parts end on page boundaries so they can hold a page more
+        """
+        if format not in self.formats:
+            raise Exception("Unknown export format " + str(format) + ", expected one of " + ", ".join(self.formats))
+        if format == "parquet" and pyarrow is None:
+            raise Exception("pyarrow is not installed, pip install pyarrow to export parquet")
+        if format != "parquet" and compression not in self.compressions:
+            raise Exception("Unknown compression " + str(compression) + ", expected gzip, bz2 or xz")
+        self.client = client
+        self.format = format
+        self.compression = compression
+        self.rows_per_file = rows_per_file
+
+    def _part_path(self, directory, entity, part):
+        extension, _ = self.formats[self.format]
+        if self.format != "parquet":
+            extension += self.compressions[self.compression][1]
+        return os.path.join(directory, "{0}-{1:05d}{2}".format(entity.__name__.lower(), part, extension))
+
+    def _open_part(self, path, names):
+        _, part_class = self.formats[self.format]
+        opener = self.compressions[self.compression][0] if self.format != "parquet" else None
+        return part_class(path, names, opener, self.compression)
+
+    @staticmethod
+    def _load_checkpoint(checkpoint):
+        if checkpoint and os.path.exists(checkpoint):
+            with open(checkpoint, 'r') as f:
+                return json.load(f)
+        return None
+
+    @staticmethod
+    def _save_checkpoint(checkpoint, state):
+        if checkpoint:
+            with open(checkpoint + ".tmp", 'w') as f:
+                json.dump(state, f)
+            os.replace(checkpoint + ".tmp", checkpoint)
+
+    def export(self, entity, directory, columns=None, checkpoint=None, endpoint=None, project=True, **kwargs):
+        """
+        :param entity: the entity class, e.g. Deal
+        :param directory: where the part files are written
+        :param columns: names to export (see resolve_columns), default every field of the first record
+        :param checkpoint: json file the progress is saved to after each part.  If it exists, the export
+         resumes after the parts it lists (the offsets are Pipedrive's, so pass a stable sort, e.g. sort="id ASC")
+        :param endpoint: defaults to the class's list endpoint, e.g. "deals", or say "pipelines/1/deals"
+        :param project: with columns, only fetch their fields (see Client._field_selector)
+        :param kwargs: passed to the endpoint, e.g. filter_id, and limit to stop after that many rows
+        :return: dict of rows, parts (the part file paths) and seconds
+        """
+        started = time.perf_counter()
+        endpoint = endpoint or self.endpoints.get(entity, entity.__name__.lower() + "s")
+        state = {"entity": entity.__name__, "endpoint": endpoint, "format": self.format, "columns": columns,
+                 "next_start": 0, "rows": 0, "parts": [], "done": False}
+        saved = self._load_checkpoint(checkpoint)
+        if saved is not None:
+            if any(saved.get(k) != state[k] for k in ("entity", "endpoint", "format")) or \
+                    (columns is not None and saved.get("columns") != columns):
+                raise Exception("Checkpoint " + checkpoint + " is for a different export: " + str(saved))
+            state = saved
+            log.info("Resuming the %s export at %s after %s rows", entity.__name__, state["next_start"], state["rows"])
+        if state["done"]:
+            return {"rows": state["rows"], "parts": state["parts"], "seconds": time.perf_counter() - started}
+        os.makedirs(directory, exist_ok=True)
+
+        if issubclass(entity, EntityWithCustomFields):
+            self.client.load_custom_fields(entity) # Before resolving the columns, no request may have been made yet
+        resolved = resolve_columns(entity, state["columns"]) if state["columns"] else None
+        checked = False
+        part = None
+        part_rows = 0
+        limit = kwargs.pop("limit", 10 ** 9)
+        url = endpoint
+        if project and columns:
+            url += self.client._field_selector(entity, [name.partition(".")[0] for name in columns])
+        for page in self.client._iter_pages(url, entity, start=state["next_start"], limit=limit, **kwargs):
+            rows = []
+            for data in page["data"] or ():
+                if resolved is None:
+                    state["columns"] = default_columns(entity, data)
+                    resolved = resolve_columns(entity, state["columns"])
+                elif not checked:
+                    check_columns(entity, resolved, data)
+                    checked = True
+                rows.append([column.value(data) for column in resolved])
+            del rows[max(limit - state["rows"] - part_rows, 0):] # Whole pages come back
+            if rows:
+                if part is None:
+                    path = self._part_path(directory, entity, len(state["parts"]))
+                    part = self._open_part(path + ".tmp", state["columns"])
+                part.write(rows)
+                part_rows += len(rows)
+            pagination = (page.get("additional_data") or {}).get("pagination") or {}
+            more = pagination.get("more_items_in_collection", False) and pagination["next_start"] < limit
+            if part is not None and (part_rows >= self.rows_per_file or not more):
+                part.close()
+                os.replace(path + ".tmp", path) # Only whole parts appear
+                state["parts"].append(path)
+                state["rows"] += part_rows
+                part = None
+                part_rows = 0
+            if more:
+                state["next_start"] = pagination["next_start"]
+                if part is None:
+                    self._save_checkpoint(checkpoint, state)
+        if part is not None: # The endpoint stopped early
+            part.close()
+            os.replace(path + ".tmp", path)
+            state["parts"].append(path)
+            state["rows"] += part_rows
+        state["done"] = True
+        self._save_checkpoint(checkpoint, state)
+        seconds = time.perf_counter() - started
+        log.info("Exported %s %s rows to %s part files in %.1fs", state["rows"], entity.__name__, len(state["parts"]), seconds)
+        return {"rows": state["rows"], "parts": state["parts"], "seconds": seconds}
@@ -0,0 +1,252 @@
+import bisect
+import os
+import re
+import threading
+import time
+from collections import deque
+
+_ID_SEGMENT = re.compile(r"(?<=/)\d+(?=/|$)")
+_FIELD_SELECTOR = re.compile(r":\(.*\)$")
+
+
+def endpoint_template(endpoint):
+    """
+    "persons/123" -> "persons/{id}", "/personFields" -> "personFields", "persons:(id,name)" -> "persons",
+    so requests group per endpoint
+    """
+    return _ID_SEGMENT.sub("{id}", "/" + _FIELD_SELECTOR.sub("", endpoint.lstrip("/")))[1:]
+
+
+class RequestEvent:
+    """
+    What happened during one Client.make_request, passed to the listeners once the response is decoded.
+    Only built when the client has listeners.
+    network_seconds covers the HTTP round trips (all attempts), wait_seconds the rate limit and retry sleeps,
+    decode_seconds parse_response (status checks and json decoding).
+    """
+    __slots__ = ("method", "endpoint", "status_code", "retries", "bytes_sent", "bytes_received", "start_time",
+                 "end_time", "network_seconds", "wait_seconds", "decode_seconds", "error")
+
+    def __init__(self, method, endpoint):
+        self.method = method
+        self.endpoint = endpoint_template(endpoint)
+        self.status_code = None
+        self.retries = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.start_time = time.time()
+        self.end_time = None
+        self.network_seconds = 0.0
+        self.wait_seconds = 0.0
+        self.decode_seconds = 0.0
+        self.error = None
+
+    def record_response(self, response, streamed=False):
+        """
+        :param streamed: the body hasn't been read, so take its size from Content-Length
+        """
+        self.status_code = response.status_code
+        if streamed:
+            self.bytes_received = int(response.headers.get("Content-Length") or 0)
+        else:
+            self.bytes_received = len(response.content)
+        request = getattr(response, "request", None)
+        body = getattr(request, "body", None)
+        if body:
+            self.bytes_sent = len(body)
+
+    @property
+    def seconds(self):
+        return (self.end_time or time.time()) - self.start_time
+
+
+class RequestListener:
+    """
+    Base class for Client listeners (client.add_listener(listener)), override what's needed.
+    Called on the requesting thread, so keep them quick and thread safe.
+    """
+
+    def request_finished(self, event):
+        """
+        :param event: the RequestEvent, event.error is set if parse_response raised
+        """
+
+    def entities_constructed(self, entity_class, count, seconds):
+        """
+        as_entities constructed (or refreshed) count entities from a response in seconds
+        """
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, buckets):
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, buckets, value):
+        i = bisect.bisect_left(buckets, value)
+        if i < len(self.counts):
+            self.counts[i] += 1
+        self.sum += value
+        self.count += 1
+
+
+class PrometheusListener(RequestListener):
+    """
+    Aggregates per endpoint request counts, latency histograms, bytes, statuses and retries, and entity construction,
+    rendered in the Prometheus text exposition format by render() (e.g. served on /metrics).
+
+    metrics = PrometheusListener()
+    client.add_listener(metrics)
+    print(metrics.render())
+    """
+
+    buckets = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, prefix="pipedrive", buckets=None):
+        self.prefix = prefix
+        if buckets is not None:
+            self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._counters = {} # (name, labels) -> value
+        self._histograms = {} # (name, labels) -> _Histogram
+
+    def _inc(self, name, labels, value=1):
+        key = (name, labels)
+        self._counters[key] = self._counters.get(key, 0) + value
+
+    def _observe(self, name, labels, value):
+        key = (name, labels)
+        histogram = self._histograms.get(key)
+        if histogram is None:
+            histogram = self._histograms[key] = _Histogram(self.buckets)
+        histogram.observe(self.buckets, value)
+
+    def request_finished(self, event):
+        endpoint = (("method", event.method), ("endpoint", event.endpoint))
+        with self._lock:
+            self._inc("requests_total", endpoint + (("status", str(event.status_code)),))
+            if event.retries:
+                self._inc("request_retries_total", endpoint, event.retries)
+            self._inc("request_bytes_total", endpoint, event.bytes_sent)
+            self._inc("response_bytes_total", endpoint, event.bytes_received)
+            self._inc("request_wait_seconds_total", endpoint, event.wait_seconds)
+            self._observe("request_duration_seconds", endpoint, event.network_seconds)
+            self._observe("decode_duration_seconds", endpoint, event.decode_seconds)
+
+    def entities_constructed(self, entity_class, count, seconds):
+        entity = (("entity", entity_class.__name__),)
+        with self._lock:
+            self._inc("entities_constructed_total", entity, count)
+            self._observe("construct_duration_seconds", entity, seconds)
+
+    descriptions = {
+        "requests_total": ("counter", "Pipedrive API requests by endpoint and status code"),
+        "request_retries_total": ("counter", "Requests retried after a 429"),
+        "request_bytes_total": ("counter", "Request body bytes sent"),
+        "response_bytes_total": ("counter", "Response body bytes received"),
+        "request_wait_seconds_total": ("counter", "Seconds spent waiting for the rate limiter and retries"),
+        "request_duration_seconds": ("histogram", "HTTP round trip time, all attempts"),
+        "decode_duration_seconds": ("histogram", "Response status check and json decoding time"),
+        "entities_constructed_total": ("counter", "Entities constructed or refreshed from responses"),
+        "construct_duration_seconds": ("histogram", "Time constructing the entities of one response"),
+    }
+
+    @staticmethod
+    def _labels(labels, extra=()):
+        labels = labels + extra
+        if not labels:
+            return ""
+        return "{" + ",".join('{0}="{1}"'.format(k, str(v).replace("\\", "\\\\").replace('"', '\\"')) for k, v in labels) + "}"
+
+    def render(self):
+        """
+        :return: the metrics in the Prometheus text exposition format
+        """
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {key: (list(h.counts), h.sum, h.count) for key, h in self._histograms.items()}
+        lines = []
+        for name, (kind, description) in self.descriptions.items():
+            full_name = self.prefix + "_" + name
+            if kind == "counter":
+                samples = sorted((labels, value) for (n, labels), value in counters.items() if n == name)
+            else:
+                samples = sorted((labels, value) for (n, labels), value in histograms.items() if n == name)
+            if not samples:
+                continue
+            lines.append("# HELP {0} {1}".format(full_name, description))
+            lines.append("# TYPE {0} {1}".format(full_name, kind))
+            for labels, value in samples:
+                if kind == "counter":
+                    lines.append("{0}{1} {2}".format(full_name, self._labels(labels), value))
+                    continue
+                counts, total, count = value
+                cumulative = 0
+                for bucket, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    lines.append("{0}_bucket{1} {2}".format(full_name, self._labels(labels, (("le", bucket),)), cumulative))
+                lines.append("{0}_bucket{1} {2}".format(full_name, self._labels(labels, (("le", "+Inf"),)), count))
+                lines.append("{0}_sum{1} {2}".format(full_name, self._labels(labels), total))
+                lines.append("{0}_count{1} {2}".format(full_name, self._labels(labels), count))
+        return "\n".join(lines) + "\n"
+
+
+class SpanListener(RequestListener):
+    """
+    An OpenTelemetry style client span per request (and per as_entities construction).
+    With an opentelemetry tracer (e.g. trace.get_tracer("pipedrive")) the spans are recorded through it,
+    otherwise each span is a dict in the OTLP shape passed to export, which defaults to keeping the last
+    max_spans in .spans.
+    """
+
+    def __init__(self, export=None, tracer=None, max_spans=1000):
+        self.tracer = tracer
+        self.spans = deque(maxlen=max_spans)
+        self.export = export or self.spans.append
+
+    @staticmethod
+    def _nanos(seconds):
+        return int(seconds * 1e9)
+
+    def _record(self, name, start_time, end_time, attributes, error=None):
+        if self.tracer is not None:
+            from opentelemetry.trace import SpanKind, Status, StatusCode
+            span = self.tracer.start_span(name, kind=SpanKind.CLIENT, start_time=self._nanos(start_time),
+                                          attributes=attributes)
+            if error is not None:
+                span.set_status(Status(StatusCode.ERROR, str(error)))
+            span.end(end_time=self._nanos(end_time))
+            return
+        self.export({
+            "name": name,
+            "kind": "SPAN_KIND_CLIENT",
+            "trace_id": os.urandom(16).hex(),
+            "span_id": os.urandom(8).hex(),
+            "start_time_unix_nano": self._nanos(start_time),
+            "end_time_unix_nano": self._nanos(end_time),
+            "attributes": attributes,
+            "status": {"code": "STATUS_CODE_ERROR", "message": str(error)} if error is not None else {"code": "STATUS_CODE_OK"},
+        })
+
+    def request_finished(self, event):
+        attributes = {
+            "http.request.method": event.method.upper(),
+            "url.template": event.endpoint,
+            "http.response.status_code": event.status_code,
+            "http.request.resend_count": event.retries,
+            "http.request.body.size": event.bytes_sent,
+            "http.response.body.size": event.bytes_received,
+            "pipedrive.network_seconds": event.network_seconds,
+            "pipedrive.wait_seconds": event.wait_seconds,
+            "pipedrive.decode_seconds": event.decode_seconds,
+        }
+        self._record("{0} {1}".format(event.method.upper(), event.endpoint), event.start_time, event.end_time,
+                     attributes, event.error)
+
+    def entities_constructed(self, entity_class, count, seconds):
+        end_time = time.time()
+        self._record("construct " + entity_class.__name__, end_time - seconds, end_time,
+                     {"pipedrive.entity": entity_class.__name__, "pipedrive.entity_count": count})
@@ -0,0 +1,167 @@
+import contextlib
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+log = logging.getLogger(__name__)
+
+
+def retry_after(headers, default=2.0):
+    """
+    Seconds to wait from a Retry-After header (seconds or an HTTP date), falling back to x-ratelimit-reset
+    :return: default if neither header is usable
+    """
+    value = headers.get("Retry-After")
+    if value:
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            try:
+                return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+            except (TypeError, ValueError):
+                pass
+    value = headers.get("x-ratelimit-reset")
+    if value:
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            pass
+    return default
+
+
+class TokenBucket:
+    """
+    Paces requests for one API token.  reserve() takes a token and returns how long the caller must wait
+    before sending, letting the balance go negative so callers queue up in order instead of polling.
+    observe() corrects the balance from Pipedrive's x-ratelimit-* and Retry-After headers.
+    """
+
+    def __init__(self, rate=40.0, capacity=80, window=2.0):
+        """
+        :param rate: requests per second
+        :param capacity: burst size
+        :param window: Pipedrive's rate limit window in seconds, used to turn x-ratelimit-limit into a rate
+        """
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self.window = window
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, tokens, updated, now):
+        return min(self.capacity, tokens + (now - updated) * self.rate)
+
+    def _transact(self, change):
+        """
+        Apply change(tokens) -> (tokens, result) to the refilled balance atomically
+        """
+        with self._lock:
+            now = time.monotonic()
+            tokens, result = change(self._refill(self._tokens, self._updated, now))
+            self._tokens, self._updated = tokens, now
+            return result
+
+    def reserve(self):
+        """
+        :return: seconds to wait before making the request
+        """
+        def take(tokens):
+            tokens -= 1
+            return tokens, (-tokens / self.rate if tokens < 0 else 0.0)
+        return self._transact(take)
+
+    def pause(self, seconds):
+        """
+        Stop handing out tokens for at least seconds (e.g. from Retry-After)
+        """
+        log.warning("Rate limited, pausing requests for %.1f seconds", seconds)
+        self._transact(lambda tokens: (min(tokens, -seconds * self.rate), None))
+
+    def observe(self, headers):
+        """
+        Update the bucket from a response's rate limit headers
+        """
+        limit = headers.get("x-ratelimit-limit")
+        if limit:
+            try:
+                self.capacity = float(limit)
+                self.rate = self.capacity / self.window
+            except ValueError:
+                pass
+        remaining = headers.get("x-ratelimit-remaining")
+        if remaining is None:
+            return
+        try:
+            remaining = float(remaining)
+        except ValueError:
+            return
+        if remaining <= 0:
+            self.pause(retry_after(headers, self.window))
+        else:
+            self._transact(lambda tokens: (min(tokens, remaining), None))
+
+
+class SharedTokenBucket(TokenBucket):
+    """
+    A TokenBucket whose balance lives in a SQLite file, so several processes using the same API token
+    share one budget.  The database write lock serialises the reservations.
+    """
+
+    def __init__(self, path, key, rate=40.0, capacity=80, window=2.0):
+        super().__init__(rate, capacity, window)
+        self.path = path
+        self.key = key
+        with contextlib.closing(self._connect()) as db:
+            db.execute("CREATE TABLE IF NOT EXISTS buckets (key TEXT PRIMARY KEY, tokens REAL, updated REAL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _transact(self, change):
+        with self._lock:
+            db = self._connect()
+            try:
+                db.execute("BEGIN IMMEDIATE")
+                now = time.time() # wall clock, monotonic isn't comparable between processes
+                row = db.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (self.key,)).fetchone()
+                tokens = self._refill(*row, now) if row else self.capacity
+                tokens, result = change(tokens)
+                db.execute("INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                           (self.key, tokens, now))
+                db.execute("COMMIT")
+                return result
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            finally:
+                db.close()
+
+
+class RateLimiter:
+    """
+    Hands out one bucket per API token.  Share a RateLimiter between Clients to share their budget in
+    this process, and give it a path to share it with other processes through a SQLite file.
+    e.g. client = Client(api_base_url=..., rate_limiter=RateLimiter(path="/tmp/pipedrive_rate.sqlite"))
+    """
+
+    def __init__(self, rate=40.0, capacity=80, window=2.0, path=None):
+        self.rate = rate
+        self.capacity = capacity
+        self.window = window
+        self.path = path
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def for_token(self, token):
+        key = hashlib.sha256(str(token).encode('UTF-8')).hexdigest() # Don't write tokens to disk
+        with self._lock:
+            if key not in self._buckets:
+                if self.path:
+                    self._buckets[key] = SharedTokenBucket(self.path, key, self.rate, self.capacity, self.window)
+                else:
+                    self._buckets[key] = TokenBucket(self.rate, self.capacity, self.window)
+            return self._buckets[key]
@@ -0,0 +1,168 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from pipedrive.metrics import endpoint_template
+
+
+class CachedResponse:
+    """
+    The parts of a requests.Response that parse_response needs, replayed from the cache
+    """
+
+    def __init__(self, url, content, headers):
+        self.status_code = 200
+        self.url = url
+        self.content = content
+        self.headers = headers
+
+    @property
+    def text(self):
+        return self.content.decode('UTF-8', 'replace')
+
+
+class _Entry:
+    __slots__ = ("resource", "url", "content", "headers", "expires", "etag", "last_modified")
+
+    def __init__(self, resource, url, content, headers, expires):
+        self.resource = resource
+        self.url = url
+        self.content = content
+        self.headers = headers
+        self.expires = expires
+        names = {name.lower(): value for name, value in headers.items()} # aiohttp has "Etag", HTTP/2 "etag"
+        self.etag = names.get("etag")
+        self.last_modified = names.get("last-modified")
+
+
+class ResponseCache:
+    """
+    Caches GET responses of slow changing endpoints for a per endpoint TTL, e.g.
+    client = Client(api_base_url=..., response_cache=ResponseCache(ttls={"stages": 600}))
+    Expired entries with an ETag or Last-Modified are revalidated with a conditional request (a 304 reuses the body).
+    Writes (post, put, delete) through the client invalidate the cached responses of the same resource,
+    e.g. updating "stages/5" drops "stages" and "stages/5".  The least recently used entries are evicted past
+    max_entries or max_bytes.  The bodies are stored undecoded, so every hit returns fresh objects.
+    """
+
+    # Endpoint template ("stages", "users/{id}", see metrics.endpoint_template) -> seconds
+    default_ttls = {
+        "stages": 3600, "stages/{id}": 3600,
+        "pipelines": 3600, "pipelines/{id}": 3600,
+        "users": 3600, "users/{id}": 3600,
+        "personFields": 3600, "organizationFields": 3600, "dealFields": 3600,
+        "webhooks": 600,
+    }
+
+    def __init__(self, ttls=None, default_ttl=0, max_entries=256, max_bytes=32 * 1024 * 1024):
+        """
+        :param ttls: dict of endpoint template -> seconds, added to (or overriding) default_ttls. 0 disables one
+        :param default_ttl: seconds for any other GET endpoint, 0 to only cache the ones in ttls
+        :param max_entries: most responses kept
+        :param max_bytes: most body bytes kept
+        """
+        self.ttls = dict(self.default_ttls, **(ttls or {}))
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def ttl(self, endpoint):
+        return self.ttls.get(endpoint_template(endpoint), self.default_ttl)
+
+    @staticmethod
+    def key(url, params, headers):
+        """
+        The cache key of a request, the Authorization header is hashed in so clients with different oauth tokens
+        don't share responses (the api_token is already in the url)
+        """
+        authorization = headers.get("Authorization")
+        if authorization:
+            authorization = hashlib.sha256(authorization.encode('UTF-8')).hexdigest()
+        return url, tuple(sorted((k, str(v)) for k, v in params.items() if v is not None)), authorization
+
+    def lookup(self, endpoint, key):
+        """
+        :return: (a CachedResponse if fresh, otherwise None, conditional request headers for revalidating)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None, {}
+            self._entries.move_to_end(key)
+            if entry.expires > time.monotonic():
+                self.hits += 1
+                return CachedResponse(entry.url, entry.content, entry.headers), {}
+            self.misses += 1
+            conditional = {}
+            if entry.etag:
+                conditional["If-None-Match"] = entry.etag
+            if entry.last_modified:
+                conditional["If-Modified-Since"] = entry.last_modified
+            if not conditional:
+                self._remove(key)
+            return None, conditional
+
+    def store(self, endpoint, key, response):
+        """
+        Keep a 200 response, or renew the entry a 304 revalidated
+        :return: the response to parse, the cached one for a 304.  Still the 304 if the entry went meanwhile (evicted,
+         or invalidated by a write), so the caller has to repeat the request without the conditional headers
+        """
+        ttl = self.ttl(endpoint)
+        if ttl <= 0:
+            return response
+        with self._lock:
+            if response.status_code == 304:
+                entry = self._entries.get(key)
+                if entry is None:
+                    return response
+                entry.expires = time.monotonic() + ttl
+                self.revalidated += 1
+                return CachedResponse(entry.url, entry.content, entry.headers)
+            if response.status_code != 200:
+                return response
+            if key in self._entries:
+                self._remove(key)
+            entry = _Entry(endpoint_template(endpoint).split("/")[0], response.url, response.content,
+                           dict(response.headers), time.monotonic() + ttl)
+            self._entries[key] = entry
+            self._bytes += len(entry.content)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+        return response
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= len(entry.content)
+
+    def invalidate(self, endpoint=None):
+        """
+        Drop the cached responses of endpoint's resource (e.g. "stages/5" or "stages" drops all the stages responses),
+        or everything if endpoint is None
+        :return: the number of responses dropped
+        """
+        with self._lock:
+            if endpoint is None:
+                keys = list(self._entries)
+            else:
+                resource = endpoint_template(endpoint).split("/")[0]
+                keys = [key for key, entry in self._entries.items() if entry.resource == resource]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def clear(self):
+        self.invalidate()
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._bytes, "hits": self.hits, "misses": self.misses,
+                    "revalidated": self.revalidated}
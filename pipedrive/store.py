@@ -0,0 +1,179 @@
+import json
+import logging
+import sqlite3
+import threading
+
+from pipedrive.client import Entity, EntityWithCustomFields
+
+log = logging.getLogger(__name__)
+
+
+class EntityStore:
+    """
+    Persists full (non stub) entities to a SQLite database behind the entity caches, so a later process can
+    start warm instead of downloading the whole account again.
+
+    Once attached:
+     - refresh_or_construct queues the entity's json (and its relationship ids) to be written,
+       as_entities writes each page's queue in one transaction
+     - get_by_id/id_exists fall back to the database, constructing the entity into the cache on first access
+     - purge deletes the entity from the database too (evict, and the cache policies, only free the memory)
+     - the custom fields are stored, so warm() works before the first API call
+
+    store = EntityStore("pipedrive.sqlite").attach()
+    store.warm(Organization, Person) # Or just let get_by_id load them lazily
+    """
+
+    def __init__(self, path, batch_size=500):
+        """
+        :param path: SQLite database file
+        :param batch_size: write the queued entities once this many are waiting, even mid page
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self._pending = {}
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS entities (class TEXT, id, data TEXT, relations TEXT, "
+                         "PRIMARY KEY (class, id))")
+        self._db.execute("CREATE TABLE IF NOT EXISTS custom_fields (class TEXT PRIMARY KEY, fields TEXT)")
+        self._db.commit()
+        self._custom_fields_saved = {} # class name -> the custom_fields last written
+
+    def attach(self):
+        """
+        Put this store behind all the entity caches
+        :return: self
+        """
+        Entity.store = self
+        self._load_custom_fields()
+        return self
+
+    def detach(self):
+        self.flush()
+        if Entity.store is self:
+            Entity.store = None
+
+    def close(self):
+        self.detach()
+        self._db.close()
+
+    @staticmethod
+    def _loaded_custom_fields():
+        """
+        :return: class name -> custom_fields, of the classes that have loaded theirs
+        """
+        return {c.__name__: c.__dict__["custom_fields"] for c in EntityWithCustomFields.__subclasses__()
+                if "custom_fields" in c.__dict__}
+
+    def _load_custom_fields(self):
+        rows = self._db.execute("SELECT class, fields FROM custom_fields").fetchall()
+        if not rows:
+            return
+        classes = {c.__name__: c for c in EntityWithCustomFields.__subclasses__()}
+        for name, fields in rows:
+            if name in classes and "custom_fields" not in classes[name].__dict__: # Not replacing fresher ones
+                classes[name].custom_fields = json.loads(fields)
+        Entity.initialised = True
+        self._custom_fields_saved = self._loaded_custom_fields()
+        log.info("Loaded custom fields for %s from %s", [name for name, _ in rows], self.path)
+
+    def _save_custom_fields(self, loaded):
+        changed = [(name, json.dumps(fields)) for name, fields in loaded.items()
+                   if self._custom_fields_saved.get(name) is not fields]
+        self._db.executemany("INSERT OR REPLACE INTO custom_fields (class, fields) VALUES (?, ?)", changed)
+        self._custom_fields_saved = loaded
+
+    def _relation_ids(self, entity):
+        relations = {}
+        for relationship in entity._relationships():
+            related_id = relationship.related_id(entity) # Without resolving it
+            if related_id is not None:
+                relations[relationship.name] = related_id
+        return relations
+
+    def save(self, entity):
+        """
+        Queue entity to be written at the next flush
+        """
+        with self._lock:
+            self._pending[(entity.__class__.__name__, entity.data["id"])] = entity
+            if len(self._pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        """
+        Write the queued entities in one transaction
+        """
+        with self._lock:
+            if not self._pending:
+                return
+            rows = [(name, theId, json.dumps(dict(entity.data)), json.dumps(self._relation_ids(entity)))
+                    for (name, theId), entity in self._pending.items()]
+            with self._db:
+                loaded = self._loaded_custom_fields()
+                if loaded != self._custom_fields_saved: # Classes load theirs on first use, so keep adding them
+                    self._save_custom_fields(loaded)
+                self._db.executemany("INSERT OR REPLACE INTO entities (class, id, data, relations) VALUES (?, ?, ?, ?)", rows)
+            self._pending = {}
+            log.debug("Stored %s entities in %s", len(rows), self.path)
+
+    def delete(self, cls, ids):
+        with self._lock:
+            for theId in ids:
+                self._pending.pop((cls.__name__, theId), None)
+            with self._db:
+                self._db.executemany("DELETE FROM entities WHERE class = ? AND id = ?", [(cls.__name__, i) for i in ids])
+
+    def exists(self, cls, id):
+        with self._lock:
+            if (cls.__name__, id) in self._pending:
+                return True
+            row = self._db.execute("SELECT 1 FROM entities WHERE class = ? AND id = ?", (cls.__name__, id)).fetchone()
+        return row is not None
+
+    def load(self, cls, id):
+        """
+        Construct the stored entity into the cache
+        :return: the entity, or None if it's not stored
+        """
+        with self._lock:
+            row = self._db.execute("SELECT data FROM entities WHERE class = ? AND id = ?", (cls.__name__, id)).fetchone()
+        if row is None:
+            return None
+        return cls(json.loads(row[0]), is_stub=False)
+
+    def relations(self, cls, id):
+        """
+        :return: the stored relationship ids of an entity, e.g. {"org": 12, "owner": 3}
+        """
+        with self._lock:
+            row = self._db.execute("SELECT relations FROM entities WHERE class = ? AND id = ?", (cls.__name__, id)).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def warm(self, *classes):
+        """
+        Construct every stored entity of classes into the caches, in the order given (e.g. Organization before Person
+        so the persons link to full organizations rather than loading them one at a time)
+        :return: number of entities loaded
+        """
+        if not Entity.initialised:
+            raise Exception("Custom fields not yet initialised, make an API call first or attach a store that has them")
+        count = 0
+        for cls in classes:
+            with self._lock:
+                rows = self._db.execute("SELECT id, data FROM entities WHERE class = ?", (cls.__name__,)).fetchall()
+            cache = cls.getCache()
+            for theId, data in rows:
+                with cache.lock:
+                    entity = cache.get(theId)
+                    if entity is not None:
+                        entity.data = json.loads(data) # Was constructed as a stub (or lazily) by an earlier class
+                        entity.stub = False
+                        cls._reindex(entity)
+                    else:
+                        cls(json.loads(data), is_stub=False)
+                count += 1
+            log.info("Loaded %s %s from %s", len(rows), cls.__name__, self.path)
+        return count
@@ -0,0 +1,117 @@
+import json
+import logging
+import os
+from datetime import datetime, timezone
+
+from pipedrive.client import Activity, Deal, Entity, Note, Organization, Person, Pipeline, Product, Stage, User
+
+log = logging.getLogger(__name__)
+
+
+class RecentsSync:
+    """
+    Keeps the entity caches current by paging through /recents since a high-water mark timestamp,
+    rather than reloading everything with get_persons(limit=...) etc.
+
+    sync = RecentsSync(client, state_file="pipedrive_sync.json")
+    client.get_persons(limit=100000) # Initial load, or start from an old since_timestamp
+    sync.run() # Each hour, only fetches what changed
+    """
+
+    timestamp_format = "%Y-%m-%d %H:%M:%S"
+
+    # Pipedrive's recents item type -> entity class
+    entity_classes = {
+        "deal": Deal,
+        "person": Person,
+        "organization": Organization,
+        "note": Note,
+        "activity": Activity,
+        "product": Product,
+        "user": User,
+        "stage": Stage,
+        "pipeline": Pipeline,
+    }
+
+    def __init__(self, client, since_timestamp=None, items=None, state_file=None, page_size=500):
+        """
+        :param client: the Client to fetch recents with
+        :param since_timestamp: "YYYY-MM-DD HH:MM:SS" (UTC) to start from.  If None, it's read from state_file,
+         and failing that, starts from now (so only changes after the first run are fetched)
+        :param items: the recents item types to sync, defaults to all in entity_classes
+        :param state_file: json file the high-water mark is saved to after each run, for the next process
+        :param page_size: recents per request
+        """
+        self.client = client
+        self.items = items or list(self.entity_classes)
+        self.state_file = state_file
+        self.page_size = page_size
+        self.since_timestamp = since_timestamp or self._load_state() or self._now()
+
+    def _now(self):
+        return datetime.now(timezone.utc).strftime(self.timestamp_format)
+
+    def _load_state(self):
+        if self.state_file and os.path.exists(self.state_file):
+            with open(self.state_file, 'r') as f:
+                return json.load(f).get("since_timestamp")
+        return None
+
+    def _save_state(self):
+        if self.state_file:
+            with open(self.state_file, 'w') as f:
+                json.dump({"since_timestamp": self.since_timestamp}, f)
+
+    @staticmethod
+    def is_deleted(data):
+        """
+        Deleted items come through recents with no data, deleted=True (deals) or active_flag=False
+        """
+        return not data or data.get("deleted") is True or data.get("active_flag") is False
+
+    def apply(self, item):
+        """
+        Route one recents item to its entity class, refreshing/constructing it or purging it if deleted
+        :return: the entity, or None if it was deleted or of an unsynced type
+        """
+        entity_class = self.entity_classes.get(item.get("item"))
+        if entity_class is None:
+            return None
+        data = item.get("data")
+        if self.is_deleted(data):
+            theId = item.get("id") or (data or {}).get("id")
+            if theId is None:
+                log.warning("Skipping deleted %s with no id: %s", item.get("item"), item)
+            else:
+                entity_class.purge(theId)
+            return None
+        return entity_class.refresh_or_construct(data)
+
+    def run(self):
+        """
+        Fetch and apply every change since the high-water mark, then move the mark on.
+        :return: dict of item type -> number of changes applied
+        """
+        counts = {}
+        start = 0
+        since = self.since_timestamp
+        last_timestamp = None
+        while True:
+            result = self.client.get_recent_changes(since_timestamp=since, items=",".join(self.items),
+                                                    start=start, limit=self.page_size)
+            for item in result["data"] or []:
+                self.apply(item)
+                counts[item.get("item")] = counts.get(item.get("item"), 0) + 1
+            additional_data = result.get("additional_data") or {}
+            last_timestamp = additional_data.get("last_timestamp_on_page") or last_timestamp
+            pagination = additional_data.get("pagination") or {}
+            if not pagination.get("more_items_in_collection"):
+                break
+            start = pagination["next_start"]
+        if Entity.store is not None:
+            Entity.store.flush() # Stored before the mark moves past these changes
+        if last_timestamp:
+            self.since_timestamp = last_timestamp
+        self._save_state()
+        log.info("Synced %s changes since %s", counts, since)
+        return counts
@@ -0,0 +1,258 @@
+import asyncio
+import base64
+import hmac
+import inspect
+import json
+import logging
+import queue
+import threading
+import time
+from socketserver import ThreadingMixIn
+from wsgiref.simple_server import WSGIServer, make_server
+
+from pipedrive.client import Entity
+from pipedrive.sync import RecentsSync
+
+log = logging.getLogger(__name__)
+
+
+class _ThreadingWSGIServer(ThreadingMixIn, WSGIServer):
+    daemon_threads = True
+
+
+class WebhookReceiver:
+    """
+    Applies Pipedrive webhook notifications (see Client.create_hook_subscription) to the entity caches, so they
+    stay current without polling.  Each payload's current data goes through refresh_or_construct, deletions are
+    purged.  Payloads are queued and applied in batches by a worker thread (older updates to an entity than the
+    cached update_time are skipped), and when the queue is full the receiver answers 503 so Pipedrive retries later.
+
+    It's a WSGI application, has an asgi() application, or run it standalone with serve():
+    receiver = WebhookReceiver(client, username="hook", password="secret")
+    client.create_hook_subscription("https://example.com/pipedrive", "*", "*", http_auth_user="hook", http_auth_password="secret")
+    receiver.serve(port=8080)
+    """
+
+    entity_classes = RecentsSync.entity_classes # Pipedrive's object name -> entity class
+
+    def __init__(self, client=None, batch_size=100, batch_interval=0.5, max_queue=10000, queue_timeout=1.0,
+                 username=None, password=None):
+        """
+        :param client: a Client to load the custom fields with, if no request has been made yet.  Not an AsyncClient,
+         the worker thread can't await it: load its custom fields (await client.load_custom_fields()) and pass None
+        :param batch_size: most payloads applied (and written to the EntityStore) together
+        :param batch_interval: seconds the worker waits for a batch to fill up
+        :param max_queue: payloads waiting to be applied before new ones are refused
+        :param queue_timeout: seconds a request waits for space in the queue before it's refused with a 503
+        :param username: the webhook's http_auth_user, checked if set
+        :param password: the webhook's http_auth_password
+        """
+        if client is not None and inspect.iscoroutinefunction(client._ensure_custom_fields):
+            raise TypeError("WebhookReceiver needs a Client, not an AsyncClient: await client.load_custom_fields() "
+                            "and pass client=None")
+        self.client = client
+        self.batch_size = batch_size
+        self.batch_interval = batch_interval
+        self.queue_timeout = queue_timeout
+        self.username = username
+        self.password = password
+        self.stats = {"received": 0, "refused": 0, "applied": 0, "deleted": 0, "stale": 0, "ignored": 0}
+        self._queue = queue.Queue(max_queue)
+        self._worker = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def parse(payload):
+        """
+        Read a webhook payload, v1 ({"event": "updated.deal", "meta": {"id": 5, ...}, "current": ..., "previous": ...})
+        or v2 ({"meta": {"action": "change", "entity": "deal", "entity_id": "5", "id": event uuid}, "data": ..., "previous": ...})
+        :return: (object name, action, id, current data or None if deleted)
+        """
+        meta = payload.get("meta") or {}
+        action, _, obj = (payload.get("event") or "").partition(".")
+        obj = meta.get("object") or meta.get("entity") or obj
+        action = meta.get("action") or action
+        current = payload.get("current", payload.get("data"))
+        previous = payload.get("previous") or {}
+        if meta.get("entity_id") is not None: # v2, where meta.id is the event's
+            theId = int(meta["entity_id"])
+        else:
+            theId = meta.get("id") or (current or previous).get("id")
+        if action in ("deleted", "delete") or not current or RecentsSync.is_deleted(current):
+            current = None
+        return obj, action, theId, current
+
+    def submit(self, payload):
+        """
+        Queue a payload to be applied
+        :return: False if the queue stayed full for queue_timeout seconds
+        """
+        self._start_worker()
+        try:
+            self._queue.put(payload, timeout=self.queue_timeout)
+        except queue.Full:
+            with self._lock:
+                self.stats["refused"] += 1
+            log.warning("Webhook queue full, refusing %s", payload.get("event") or payload.get("meta"))
+            return False
+        with self._lock:
+            self.stats["received"] += 1
+        return True
+
+    def apply(self, payloads):
+        """
+        Apply payloads to the caches now, in order, keeping only the last for each entity
+        :return: the refreshed entities
+        """
+        latest = {}
+        for payload in payloads:
+            obj, action, theId, current = self.parse(payload)
+            entity_class = self.entity_classes.get(obj)
+            if entity_class is None or theId is None:
+                self._count("ignored")
+                continue
+            latest.pop((entity_class, theId), None) # Re-insert, so the batch is applied in arrival order
+            latest[(entity_class, theId)] = current
+        entities = []
+        for (entity_class, theId), current in latest.items():
+            if current is None:
+                entity_class.purge(theId)
+                self._count("deleted")
+            elif self._is_stale(entity_class, current):
+                self._count("stale")
+            else:
+                entities.append(entity_class.refresh_or_construct(current))
+                self._count("applied")
+        if Entity.store is not None:
+            Entity.store.flush() # One transaction per batch
+        return entities
+
+    def _is_stale(self, entity_class, current):
+        """
+        Pipedrive doesn't guarantee delivery order, don't go back to older data than is already cached
+        """
+        cached = entity_class.getCache().get(current["id"])
+        if cached is None or cached.stub:
+            return False
+        cached_time, update_time = cached.data.get("update_time"), current.get("update_time")
+        return bool(cached_time and update_time and update_time < cached_time)
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _start_worker(self):
+        with self._lock:
+            if self._worker is not None:
+                return
+            if self.client is not None:
+                self.client._ensure_custom_fields()
+            self._stopping.clear()
+            self._worker = threading.Thread(target=self._run, name="pipedrive-webhooks", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            try:
+                batch = [self._queue.get(timeout=self.batch_interval)]
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.batch_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(deadline - time.monotonic(), 0)))
+                except queue.Empty:
+                    break
+            try:
+                self.apply(batch)
+            except Exception:
+                log.exception("Failed to apply %s webhook payloads", len(batch))
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    def join(self):
+        """
+        Wait until every queued payload has been applied
+        """
+        self._queue.join()
+
+    def stop(self):
+        """
+        Apply what's queued and stop the worker
+        """
+        with self._lock:
+            worker, self._worker = self._worker, None
+        if worker is not None:
+            self._stopping.set()
+            worker.join()
+
+    def _authorized(self, authorization):
+        if self.username is None:
+            return True
+        expected = "Basic " + base64.b64encode("{0}:{1}".format(self.username, self.password).encode('UTF-8')).decode('UTF-8')
+        return hmac.compare_digest((authorization or "").encode('UTF-8'), expected.encode('UTF-8'))
+
+    def _receive(self, method, authorization, body):
+        """
+        :return: (HTTP status, response body)
+        """
+        if method != "POST":
+            return "405 Method Not Allowed", b""
+        if not self._authorized(authorization):
+            return "401 Unauthorized", b""
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return "400 Bad Request", b"Invalid json"
+        if not isinstance(payload, dict):
+            return "400 Bad Request", b"Expected a json object"
+        if not self.submit(payload):
+            return "503 Service Unavailable", b"Busy, retry later"
+        return "200 OK", b"OK"
+
+    def __call__(self, environ, start_response):
+        """
+        WSGI application
+        """
+        try:
+            length = int(environ.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            length = 0
+        body = environ["wsgi.input"].read(length) if length else b""
+        status, response = self._receive(environ["REQUEST_METHOD"], environ.get("HTTP_AUTHORIZATION"), body)
+        start_response(status, [("Content-Type", "text/plain"), ("Content-Length", str(len(response)))])
+        return [response]
+
+    async def asgi(self, scope, receive, send):
+        """
+        ASGI application, e.g. uvicorn.run(receiver.asgi)
+        """
+        if scope["type"] != "http":
+            return
+        body = b""
+        while True:
+            message = await receive()
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        headers = dict(scope.get("headers") or [])
+        authorization = headers.get(b"authorization")
+        submit = lambda: self._receive(scope["method"], authorization.decode('latin-1') if authorization else None, body)
+        status, response = await asyncio.get_running_loop().run_in_executor(None, submit) # submit can block for queue_timeout
+        await send({"type": "http.response.start", "status": int(status.split()[0]),
+                    "headers": [(b"content-type", b"text/plain"), (b"content-length", str(len(response)).encode())]})
+        await send({"type": "http.response.body", "body": response})
+
+    def serve(self, host="0.0.0.0", port=8080):
+        """
+        Run a standalone threaded HTTP server until interrupted
+        """
+        server = make_server(host, port, self, server_class=_ThreadingWSGIServer)
+        log.info("Receiving Pipedrive webhooks on %s:%s", host, port)
+        try:
+            server.serve_forever()
+        finally:
+            server.server_close()
+            self.stop()
@@ -18,4 +18,10 @@ setup(name='pipedrive-python-lib',
       install_requires=[
           'requests',
       ],
+      extras_require={
+          'async': ['aiohttp'],
+          'fast': ['orjson'],
+          'parquet': ['pyarrow'],
+          'numpy': ['numpy'],
+      },
       zip_safe=False)
@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "benchmarks"))
+from pipedrive.client import Entity, EntityWithCustomFields, Person, Organization, Deal, Note, Pipeline, Stage, \
+    User, Activity, Product
+from mock_server import MockPipedrive, SyntheticAccount
+
+
+def reset_entities():
+    """
+    Empty the caches and forget the custom fields, as a new process would start
+    """
+    for cls in (Person, Organization, Deal, Note, Pipeline, Stage, User, Activity, Product):
+        cls.clear_cache()
+    for cls in EntityWithCustomFields.__subclasses__():
+        if "custom_fields" in cls.__dict__:
+            del cls.custom_fields
+        if "standard_fields" in cls.__dict__:
+            del cls.standard_fields
+    Entity.fields_loader = None
+
+
+@pytest.fixture
+def server():
+    server = MockPipedrive(SyntheticAccount(persons=300, custom_fields=6)).start()
+    reset_entities()
+    yield server
+    server.stop()
+    reset_entities()
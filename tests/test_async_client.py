@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from pipedrive.client import Client, CustomFieldsCache, Deal, Person
+from pipedrive.response_cache import ResponseCache
+from pipedrive.async_client import AsyncClient
+
+
+def make_client(server, **kwargs):
+    client = AsyncClient(api_base_url=server.base_url, custom_fields_cache=CustomFieldsCache(directory=None), **kwargs)
+    client.set_token("test")
+    return client
+
+
+def field_requests(server):
+    return sum(n for endpoint, n in server.requests.items() if endpoint.endswith("Fields"))
+
+
+def test_init_matches_client(server):
+    client = make_client(server, page_workers=4, max_retries=5)
+    assert client.session is None # Created inside the loop on the first request
+    missing = set(vars(Client(api_base_url=server.base_url))) - set(vars(client))
+    assert missing == set()
+    assert client.page_workers == 4 and client.max_retries == 5 and not client.incremental_parsing
+
+
+def test_only_async_with(server):
+    with pytest.raises(TypeError):
+        with make_client(server):
+            pass
+
+    async def run():
+        async with make_client(server) as client:
+            await client.get_persons(limit=10)
+        return client.session
+    assert asyncio.run(run()).closed
+
+
+def test_paginates_and_loads_custom_fields_once(server):
+    async def run():
+        async with make_client(server) as client:
+            return await asyncio.gather(client.get_deals(limit=10 ** 9), client.get_persons(limit=10 ** 9))
+
+    deals, persons = asyncio.run(run())
+    assert len(deals) == len(server.account.entities["deals"])
+    assert len(persons) == len(server.account.entities["persons"])
+    assert field_requests(server) == 3 # One per class, however many requests wait for them
+    field = next(name for name, f in Deal.custom_fields.items() if "fields" in f)
+    data = server.account.entities["deals"][1]
+    assert getattr(Deal.get_by_id(1), field) == Deal.custom_fields[field]["fields"][str(data[Deal.custom_fields[field]["key"]])]
+
+
+def test_parallel_pages(server):
+    async def run():
+        async with make_client(server, page_workers=4) as client:
+            return await client.get_persons(limit=10 ** 9, page_workers=4)
+
+    server.max_page = 50
+    persons = asyncio.run(run())
+    assert sorted(p.id for p in persons) == sorted(server.account.entities["persons"])
+
+
+def test_custom_fields_retried_after_a_failure(server):
+    async def run():
+        async with make_client(server) as client:
+            with pytest.raises(Exception):
+                await client.get_persons(limit=10)
+            return await client.get_persons(limit=10)
+
+    server.fail("dealFields")
+    assert len(asyncio.run(run())) == 10
+    assert "custom_fields" in Deal.__dict__ and "custom_fields" in Person.__dict__
+
+
+def test_load_and_reload_custom_fields(server):
+    async def run():
+        async with make_client(server, response_cache=ResponseCache()) as client:
+            await client.load_custom_fields(Person)
+            assert "custom_fields" in Person.__dict__ and "custom_fields" not in Deal.__dict__
+            await client.load_custom_fields()
+            server.account.fields["deal"].append({"key": "f" * 40, "name": "Brand new"})
+            await client.reload_custom_fields(Deal)
+
+    asyncio.run(run())
+    assert "brand_new" in Deal.custom_fields
@@ -0,0 +1,28 @@
+from pipedrive.client import Client, CustomFieldsCache, Deal, Person
+from pipedrive.response_cache import ResponseCache
+
+
+def make_client(server, **kwargs):
+    client = Client(api_base_url=server.base_url, custom_fields_cache=CustomFieldsCache(directory=None), **kwargs)
+    client.set_token("test")
+    return client
+
+
+def field_requests(server):
+    return sum(n for endpoint, n in server.requests.items() if endpoint.endswith("Fields"))
+
+
+def test_loaded_on_first_use(server):
+    client = make_client(server)
+    client.get_deals(limit=10)
+    assert field_requests(server) == 1 # Only the deals' fields
+    assert "custom_fields" in Deal.__dict__ and "custom_fields" not in Person.__dict__
+
+
+def test_reload_bypasses_the_response_cache(server):
+    client = make_client(server, response_cache=ResponseCache())
+    client.load_custom_fields(Deal)
+    count = len(Deal.custom_fields)
+    server.account.fields["deal"].append({"key": "f" * 40, "name": "Brand new"})
+    client.reload_custom_fields(Deal)
+    assert len(Deal.custom_fields) == count + 1 and "brand_new" in Deal.custom_fields
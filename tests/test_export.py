@@ -0,0 +1,50 @@
+import csv
+import gzip
+import json
+import os
+
+import pytest
+
+from pipedrive.client import Client, CustomFieldsCache, Deal
+from pipedrive.export import Exporter
+
+
+def make_client(server):
+    client = Client(api_base_url=server.base_url, custom_fields_cache=CustomFieldsCache(directory=None))
+    client.set_token("test")
+    return client
+
+
+def option_field(server):
+    """
+    :return: the name Deal's first option custom field gets (as an attribute), its key and its labels by option id
+    """
+    field = next(f for f in server.account.fields["deal"] if "options" in f)
+    return field["name"].lower().replace(" ", "_"), field["key"], {str(o["id"]): o["label"] for o in field["options"]}
+
+
+def test_custom_fields_on_a_fresh_client(server, tmp_path):
+    name, key, labels = option_field(server)
+    result = Exporter(make_client(server)).export(Deal, str(tmp_path), columns=["id", "title", name, "org_id.name"])
+    rows = [json.loads(line) for part in result["parts"] for line in open(part)]
+    deals = server.account.entities["deals"]
+    assert len(rows) == len(deals)
+    for row in rows:
+        value = deals[row["id"]][key]
+        assert row[name] == (labels[str(value)] if value is not None else None)
+        assert row["org_id.name"] == deals[row["id"]]["org_id"]["name"]
+
+
+def test_csv_gzip_parts(server, tmp_path):
+    server.max_page = 50 # Parts end on page boundaries
+    exporter = Exporter(make_client(server), format="csv", compression="gzip", rows_per_file=100)
+    result = exporter.export(Deal, str(tmp_path), columns=["id", "value"], checkpoint=str(tmp_path / "checkpoint.json"))
+    rows = [row for part in result["parts"] for row in list(csv.reader(gzip.open(part, 'rt')))[1:]]
+    assert len(rows) == result["rows"] == len(server.account.entities["deals"])
+    assert len(result["parts"]) > 1
+
+
+def test_unknown_column(server, tmp_path):
+    with pytest.raises(Exception, match="lead_sorce"):
+        Exporter(make_client(server)).export(Deal, str(tmp_path), columns=["id", "lead_sorce"])
+    assert os.listdir(str(tmp_path)) == []
@@ -0,0 +1,56 @@
+import pytest
+
+from pipedrive.client import Client, CustomFieldsCache, Entity, Person
+
+
+def make_client(server):
+    client = Client(api_base_url=server.base_url, custom_fields_cache=CustomFieldsCache(directory=None))
+    client.set_token("test")
+    return client
+
+
+def test_unknown_name_does_not_fetch(server):
+    person = make_client(server).get_persons(limit=5, fields=["name"])[0]
+    assert not hasattr(person, "some_missing")
+    with pytest.raises(AttributeError):
+        person.nmae
+    assert server.requests["persons"] == 1 and person.partial
+
+
+def test_standard_field_fetches(server):
+    person = make_client(server).get_persons(limit=5, fields=["name"])[0]
+    assert person.phone is not None
+    assert server.requests["persons"] == 2 and not person.partial
+
+
+def test_email_address_fetches(server):
+    person = make_client(server).get_persons(limit=5, fields=["name"])[0]
+    assert person.email_address == "person{0}@example.com".format(person.id)
+    assert server.requests["persons"] == 2 and not person.partial
+
+
+def test_email_address_without_fetch_partial(server):
+    person = make_client(server).get_persons(limit=5, fields=["name"])[0]
+    Entity.fetch_partial = False
+    try:
+        with pytest.raises(AttributeError):
+            person.email_address
+    finally:
+        Entity.fetch_partial = True
+    assert server.requests["persons"] == 1
+
+
+def test_uncached_entity_loads_in_place(server):
+    client = make_client(server)
+    person = next(client.iter_persons(limit=5, fields=["name"], cache=False))
+    assert person.phone is not None and person.email_address
+    assert not person.partial and server.requests["persons"] == 2
+    assert Person.getCache().lookup(person.id) is None # Streamed uncached, still isn't
+
+
+def test_uncached_entity_custom_field(server):
+    client = make_client(server)
+    person = next(client.iter_persons(limit=5, fields=["name"], cache=False))
+    name = next(iter(Person.custom_fields))
+    getattr(person, name)
+    assert not person.partial and server.requests["persons"] == 2
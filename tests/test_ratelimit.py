@@ -0,0 +1,31 @@
+import time
+
+import pytest
+
+import pipedrive.client
+from pipedrive.client import Client, CustomFieldsCache
+from pipedrive.ratelimit import RateLimiter
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_429_pauses_the_bucket(server, tmp_path, monkeypatch, shared):
+    path = str(tmp_path / "rate.sqlite") if shared else None
+    server.rate_limit_every = 2
+    server.retry_after = 0.3
+    client = Client(api_base_url=server.base_url, custom_fields_cache=CustomFieldsCache(directory=None),
+                    rate_limiter=RateLimiter(path=path))
+    client.set_token("test")
+    waits = []
+
+    class Clock:
+        def __getattr__(self, name):
+            return getattr(time, name)
+
+        def sleep(self, seconds): # Only the client's, the mock server's thread still sleeps
+            if shared: # Another process with the same token waits too
+                waits.append(RateLimiter(path=path).for_token("test").reserve())
+            waits.append(seconds)
+    monkeypatch.setattr(pipedrive.client, "time", Clock())
+    client.get_persons(limit=10) # personFields, then persons gets the 429
+    assert server.rate_limited == 1
+    assert len(waits) == (2 if shared else 1) and min(waits) > 0.2
@@ -0,0 +1,61 @@
+import asyncio
+import time
+
+from pipedrive.async_client import AsyncClient
+from pipedrive.client import Client, CustomFieldsCache
+from pipedrive.response_cache import ResponseCache
+
+
+def make_client(server, response_cache):
+    client = Client(api_base_url=server.base_url, custom_fields_cache=CustomFieldsCache(directory=None),
+                    response_cache=response_cache)
+    client.set_token("test")
+    return client
+
+
+def test_etag_revalidation(server):
+    cache = ResponseCache(ttls={"stages": 0.05})
+    client = make_client(server, cache)
+    first = [stage.id for stage in client.get_stages()]
+    assert [stage.id for stage in client.get_stages()] == first # Fresh, not requested
+    time.sleep(0.1)
+    assert [stage.id for stage in client.get_stages()] == first
+    assert server.requests["stages"] == 2 and server.not_modified == 1 and cache.revalidated == 1
+
+
+def test_write_invalidates(server):
+    client = make_client(server, ResponseCache(ttls={"persons/{id}": 600}))
+    client.get_persons(person_id=1)
+    client.get_persons(person_id=1)
+    assert server.requests["persons"] == 1
+    client.update_person(1, name="Renamed")
+    assert client.get_persons(person_id=1).name == "Renamed"
+    assert server.requests["persons"] == 3
+
+
+class RacingCache(ResponseCache):
+    def store(self, endpoint, key, response):
+        if response.status_code == 304:
+            self.invalidate() # A write on another thread got in between the conditional GET and its 304
+        return super().store(endpoint, key, response)
+
+
+def test_entry_gone_before_the_304(server):
+    cache = RacingCache(ttls={"stages": 0.05})
+    client = make_client(server, cache)
+    first = [stage.id for stage in client.get_stages()]
+    time.sleep(0.1)
+    assert [stage.id for stage in client.get_stages()] == first
+    assert server.requests["stages"] == 3 and server.not_modified == 1
+
+
+def test_async_entry_gone_before_the_304(server):
+    async def run():
+        async with AsyncClient(api_base_url=server.base_url, custom_fields_cache=CustomFieldsCache(directory=None),
+                               response_cache=RacingCache(ttls={"stages": 0.05})) as client:
+            client.set_token("test")
+            first = [stage.id for stage in await client.get_stages()]
+            await asyncio.sleep(0.1)
+            assert [stage.id for stage in await client.get_stages()] == first
+    asyncio.run(run())
+    assert server.requests["stages"] == 3 and server.not_modified == 1
@@ -0,0 +1,59 @@
+from pipedrive.client import Client, CustomFieldsCache
+
+
+def make_client(server):
+    """
+    :return: a client streaming its pages, and the responses its session returned (each with a closed flag)
+    """
+    client = Client(api_base_url=server.base_url, incremental_parsing=True,
+                    custom_fields_cache=CustomFieldsCache(directory=None))
+    client.set_token("test")
+    client.load_custom_fields()
+    responses = []
+    request = client.session.request
+
+    def recording_request(*args, **kwargs):
+        response = request(*args, **kwargs)
+        close = response.close
+        response.closed = False
+
+        def recording_close():
+            response.closed = True
+            close()
+        response.close = recording_close
+        responses.append(response)
+        return response
+    client.session.request = recording_request
+    return client, responses
+
+
+def test_streamed_pages_closed(server):
+    server.max_page = 50
+    client, responses = make_client(server)
+    persons = list(client.iter_persons(limit=10 ** 9))
+    assert len(persons) == len(server.account.entities["persons"])
+    assert len(responses) > 1 and all(r.closed for r in responses)
+
+
+def test_closed_when_stopping_early(server):
+    server.max_page = 50
+    client, responses = make_client(server)
+    for i, person in enumerate(client.iter_persons(limit=10 ** 9)):
+        if i == 60: # Part way through the second page
+            break
+    assert len(responses) == 2 and all(r.closed for r in responses)
+
+    client, responses = make_client(server)
+    for page in client.iter_persons(limit=10 ** 9, pages=True):
+        break
+    assert len(responses) == 1 and all(r.closed for r in responses)
+
+
+def test_retried_responses_closed(server):
+    server.max_page = 50
+    server.rate_limit_every = 3
+    server.retry_after = 0.01
+    client, responses = make_client(server)
+    persons = list(client.iter_persons(limit=10 ** 9))
+    assert len(persons) == len(server.account.entities["persons"])
+    assert any(r.status_code == 429 for r in responses) and all(r.closed for r in responses)
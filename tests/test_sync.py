@@ -0,0 +1,29 @@
+import sqlite3
+
+from pipedrive.client import Client, CustomFieldsCache, Person
+from pipedrive.store import EntityStore
+from pipedrive.sync import RecentsSync
+
+
+def make_client(server):
+    client = Client(api_base_url=server.base_url, custom_fields_cache=CustomFieldsCache(directory=None))
+    client.set_token("test")
+    return client
+
+
+def test_deleted_without_id_is_skipped(server):
+    sync = RecentsSync(make_client(server), since_timestamp="2000-01-01 00:00:00")
+    assert sync.apply({"item": "person", "data": None}) is None
+
+
+def test_run_flushes_the_store(server, tmp_path):
+    path = str(tmp_path / "entities.db")
+    store = EntityStore(path, batch_size=100000).attach()
+    try:
+        sync = RecentsSync(make_client(server), since_timestamp="2000-01-01 00:00:00", items=["person"])
+        assert sync.run()["person"] == 300
+        with sqlite3.connect(path) as db:
+            assert db.execute("SELECT COUNT(*) FROM entities WHERE class = 'Person'").fetchone()[0] == 300
+    finally:
+        store.close()
+    assert Person.getCache().lookup(1) is not None
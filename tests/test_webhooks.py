@@ -0,0 +1,103 @@
+import base64
+import io
+import json
+
+import pytest
+
+from pipedrive.async_client import AsyncClient
+from pipedrive.client import Client, CustomFieldsCache, Deal, Person
+from pipedrive.webhooks import WebhookReceiver
+
+
+def post(receiver, payload, username="hook", password="secret"):
+    body = json.dumps(payload).encode('UTF-8')
+    environ = {"REQUEST_METHOD": "POST", "CONTENT_LENGTH": str(len(body)), "wsgi.input": io.BytesIO(body)}
+    if username is not None:
+        credentials = "{0}:{1}".format(username, password).encode('UTF-8')
+        environ["HTTP_AUTHORIZATION"] = "Basic " + base64.b64encode(credentials).decode('UTF-8')
+    statuses = []
+    receiver(environ, lambda status, headers: statuses.append(status))
+    return statuses[0]
+
+
+def make_receiver(server):
+    client = Client(api_base_url=server.base_url, custom_fields_cache=CustomFieldsCache(directory=None))
+    client.set_token("test")
+    return WebhookReceiver(client, batch_interval=0.05, username="hook", password="secret")
+
+
+def deal(theId, title, update_time="2024-01-01 00:00:00"):
+    return {"id": theId, "title": title, "value": 100, "currency": "EUR", "status": "open", "stage_id": 1,
+            "pipeline_id": 1, "update_time": update_time}
+
+
+def v1(event, theId, current, previous=None):
+    return {"event": event, "meta": {"id": theId, "object": event.split(".")[1], "action": event.split(".")[0], "v": 1},
+            "current": current, "previous": previous}
+
+
+def v2(action, entity, theId, data, previous=None):
+    return {"meta": {"action": action, "entity": entity, "entity_id": str(theId), "id": "6d6b2c0e-5d3a-4a3e-9f5e-%012d" % theId,
+                     "version": "2.0"}, "data": data, "previous": previous}
+
+
+def test_v1_create_update_delete(server):
+    receiver = make_receiver(server)
+    try:
+        assert post(receiver, v1("added.deal", 1001, deal(1001, "Created"))) == "200 OK"
+        assert post(receiver, v1("added.person", 1002, {"id": 1002, "name": "Someone"})) == "200 OK"
+        receiver.join()
+        assert Deal.getCache().get(1001).title == "Created"
+        assert Person.getCache().get(1002).name == "Someone"
+
+        post(receiver, v1("updated.deal", 1001, deal(1001, "Updated", "2024-01-02 00:00:00"), deal(1001, "Created")))
+        receiver.join()
+        assert Deal.getCache().get(1001).title == "Updated"
+
+        post(receiver, v1("deleted.deal", 1001, None, deal(1001, "Updated")))
+        receiver.join()
+        assert Deal.getCache().get(1001) is None
+        assert receiver.stats["applied"] == 3 and receiver.stats["deleted"] == 1
+    finally:
+        receiver.stop()
+
+
+def test_v2_create_update_delete(server):
+    receiver = make_receiver(server)
+    try:
+        post(receiver, v2("create", "deal", 3, deal(3, "Created")))
+        receiver.join()
+        assert Deal.getCache().get(3).title == "Created"
+
+        post(receiver, v2("change", "deal", 3, deal(3, "Changed", "2024-01-02 00:00:00"), {"title": "Created"}))
+        receiver.join()
+        assert Deal.getCache().get(3).title == "Changed"
+        assert list(Deal.getCache()) == [3] # Keyed by the entity id, not the event's
+
+        post(receiver, v2("delete", "deal", 3, None, deal(3, "Changed")))
+        receiver.join()
+        assert Deal.getCache().get(3) is None
+        assert receiver.stats["applied"] == 2 and receiver.stats["deleted"] == 1
+    finally:
+        receiver.stop()
+
+
+def test_stale_and_unauthorized(server):
+    receiver = make_receiver(server)
+    try:
+        post(receiver, v2("change", "deal", 4, deal(4, "New", "2024-01-02 00:00:00")))
+        receiver.join() # Within a batch only the last payload for an entity is applied
+        post(receiver, v2("change", "deal", 4, deal(4, "Old", "2024-01-01 00:00:00")))
+        receiver.join()
+        assert Deal.getCache().get(4).title == "New"
+        assert post(receiver, v1("deleted.deal", 4, None), password="wrong") == "401 Unauthorized"
+        assert post(receiver, v1("deleted.deal", 4, None), username=None) == "401 Unauthorized"
+        receiver.join()
+        assert Deal.getCache().get(4) is not None
+    finally:
+        receiver.stop()
+
+
+def test_async_client_rejected(server):
+    with pytest.raises(TypeError):
+        WebhookReceiver(AsyncClient(api_base_url=server.base_url))